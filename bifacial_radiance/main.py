@@ -56,6 +56,8 @@ LOGGER = logging.getLogger(__name__)
 LOGGER.setLevel(logging.DEBUG)
 
 import os, datetime
+import atexit
+import threading
 from subprocess import Popen, PIPE  # replacement for os.system()
 import pandas as pd
 import numpy as np 
@@ -86,12 +88,13 @@ def _missingKeyWarning(dictype, missingkey, newvalue): # prints warnings
 def _normRGB(r, g, b): #normalize by each color for human vision sensitivity
     return r*0.216+g*0.7152+b*0.0722
 
-def _popen(cmd, data_in, data_out=PIPE):
+def _popen(cmd, data_in, data_out=PIPE, decode=True):
     """
     Helper function subprocess.popen replaces os.system
     - gives better input/output process control
     usage: pass <data_in> to process <cmd> and return results
     based on rgbeimage.py (Thomas Bleicher 2010)
+    Set decode=False to get the raw bytes back (binary rtrace output).
     """
     if type(cmd) == str:
         cmd = str(cmd) # gets rid of unicode oddities
@@ -105,19 +108,576 @@ def _popen(cmd, data_in, data_out=PIPE):
     #    return 'message: '+err.strip()
     #if data:
     #    return data. in Python3 this is returned as `bytes` and needs to be decoded
+    if data and decode:
+        data = data.decode('latin1') #Py3 requires decoding
     if err:
         if data:
-            returntuple = (data.decode('latin1'), 'message: '+err.decode('latin1').strip())
+            returntuple = (data, 'message: '+err.decode('latin1').strip())
         else:
             returntuple = (None, 'message: '+err.decode('latin1').strip())
     else:
         if data:
-            returntuple = (data.decode('latin1'), None) #Py3 requires decoding
+            returntuple = (data, None)
         else:
             returntuple = (None, None)
 
     return returntuple
 
+
+class _RtraceWorker:
+    """
+    Long-lived rtrace process bound to one octree and one set of rtrace
+    options.  Sensor batches are written to stdin, followed by a ray with a
+    zero direction vector which makes rtrace flush its output. The results
+    are streamed back without closing the pipe, so the octree is only loaded
+    (and the ambient cache only built) once for all scans against it.
+
+    Parameters
+    ----------
+    cmd : str
+        Full rtrace command, e.g. "rtrace -i -ab 2 ... -h -oovs file.oct".
+        The octree must be the last argument. Binary input is supported 
+        through the -ff / -fd options.
+    """
+
+    def __init__(self, cmd):
+        self.cmd = cmd
+        self.octfile = cmd.split()[-1]
+        # input format from the -f option, so the flush ray matches it
+        fmt = [opt[2:] for opt in cmd.split() if opt[:2] == '-f' 
+               and 0 < len(opt[2:]) < 3 and set(opt[2:]) <= set('adf')]
+        infmt = fmt[-1][0] if fmt else 'a'
+        if infmt == 'a':
+            self._flushray = b'0 0 0 0 0 0\n'
+        else:
+            self._flushray = np.zeros(6, dtype=infmt).tobytes()
+        self._stamp = _octStamp(self.octfile)
+        self._errlines = []
+        self.p = Popen(cmd.split(), bufsize=-1, stdin=PIPE, stdout=PIPE,
+                       stderr=PIPE)
+        # drain stderr continuously so rtrace warnings can't fill the pipe
+        self._errthread = threading.Thread(target=self._readErr, daemon=True)
+        self._errthread.start()
+
+    def _readErr(self):
+        for line in self.p.stderr:
+            self._errlines.append(line.decode('latin1'))
+
+    def _write(self, data):
+        try:
+            self.p.stdin.write(data)
+            self.p.stdin.flush()
+        except (BrokenPipeError, OSError):
+            pass  # process died. error is picked up by trace()
+
+    def alive(self):
+        return self.p.poll() is None
+
+    def trace(self, linepts, nrays=None, recordsize=None):
+        """
+        Send linepts to the running rtrace and return (data, err) in the
+        same format as :py:func:`_popen`.
+
+        For binary input pass linepts as bytes together with nrays. For
+        binary output pass the size in bytes of one output record as 
+        recordsize; the raw bytes are returned instead of text.
+        """
+        if isinstance(linepts, str):
+            linepts = linepts.encode()
+        if nrays is None:
+            nrays = len(linepts.split()) // 6
+        # write on a separate thread so large batches can't deadlock on a
+        # full stdout pipe.
+        writer = threading.Thread(target=self._write,
+                                  args=(linepts + self._flushray,))
+        writer.start()
+        lines = []
+        if recordsize:
+            # fixed size records. one extra record for the flush ray
+            data = self.p.stdout.read((nrays + 1) * recordsize)
+            if len(data) == (nrays + 1) * recordsize:
+                lines = [data[:-recordsize], b'']
+        else:
+            for i in range(nrays + 1):  # one extra record for the flush ray
+                line = self.p.stdout.readline()
+                if not line:
+                    break
+                lines.append(line.decode('latin1'))
+            if len(lines) < nrays + 1:
+                lines = []
+        writer.join()
+
+        if not lines:
+            self.close()
+            self._errthread.join(timeout=1)
+            err = ''.join(self._errlines).strip()
+            return (None, 'message: '+ (err or 'rtrace worker exited unexpectedly'))
+        err = None
+        if self._errlines:
+            err = 'message: '+''.join(self._errlines).strip()
+            self._errlines.clear()
+        return (lines[0][:0].join(lines[:-1]) or None, err)
+
+    def close(self):
+        if self.p.stdin and not self.p.stdin.closed:
+            try:
+                self.p.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+        try:
+            self.p.wait(timeout=10)
+        except Exception:
+            self.p.kill()
+        self.p.stdout.close()
+
+
+_RTRACE_WORKERS = {}  # open _RtraceWorker processes, keyed by rtrace cmd
+
+def _octStamp(octfile):
+    # (mtime, size) of the octree so a rewritten octree gets a new worker
+    try:
+        st = os.stat(octfile)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def _getRtraceWorker(cmd):
+    """
+    Return a running :py:class:`_RtraceWorker` for this rtrace command,
+    starting a new one if none exists or if the octree has changed on disk.
+    """
+    worker = _RTRACE_WORKERS.get(cmd)
+    if worker is not None:
+        if worker.alive() and worker._stamp == _octStamp(worker.octfile):
+            return worker
+        worker.close()
+    worker = _RtraceWorker(cmd)
+    _RTRACE_WORKERS[cmd] = worker
+    return worker
+
+def closeRtraceWorkers(octfile=None):
+    """
+    Shut down persistent rtrace workers started with ``persistent=True``.
+
+    Parameters
+    ----------
+    octfile : str, optional
+        Only close workers for this octree. By default all workers are closed.
+    """
+    for cmd in list(_RTRACE_WORKERS):
+        worker = _RTRACE_WORKERS[cmd]
+        if octfile is None or worker.octfile == octfile:
+            worker.close()
+            del _RTRACE_WORKERS[cmd]
+
+atexit.register(closeRtraceWorkers)
+
+_AMBIENT_STATS = {'hits': 0, 'misses': 0}
+
+def _octDependencies(octfile):
+    # Scene files an octree depends on. Octrees made without oconv -f only
+    # store the file names (on the oconv line of the header), and rtrace 
+    # re-reads them, so a new sky written under the same name gives the same
+    # octree. Files called from '!' commands in them (e.g. the module .rad 
+    # in an xform line) are included too.
+    with open(octfile, 'rb') as f:
+        header = f.read(1 << 16).split(b'\n\n')[0].decode('latin1')
+    deps = []
+    for line in header.splitlines():
+        # octrees made with oconv -i also carry the header of their base
+        if line.split()[:1] == ['oconv']:
+            deps += [t for t in line.split()[1:] if os.path.isfile(t) and 
+                     not t.endswith('.oct') and t not in deps]
+    return _radDependencies(deps)
+
+def _radDependencies(radfiles):
+    # radfiles plus the files called from '!' commands in them (e.g. the 
+    # module .rad in an xform line)
+    deps = list(radfiles)
+    for dep in list(deps):
+        with open(dep, 'r', errors='ignore') as f:
+            for line in f:
+                if line.startswith('!'):
+                    deps += [t for t in line.split()[1:] 
+                             if os.path.isfile(t) and t not in deps]
+    return deps
+
+_OCTHASHES = {}  # octree path: (stamps, dependencies, hash) of _octHash
+
+def _octHash(octfile):
+    # sha1 of the octree and the contents of the scene files it depends on.
+    # Memoized per octree until the (mtime, size) of the octree or of one of
+    # its dependencies changes, so repeated scans of the same octree don't
+    # re-read and re-hash the whole scene.
+    import hashlib
+    memo = _OCTHASHES.get(os.path.abspath(octfile))
+    if memo is not None:
+        stamps, deps, octhash = memo
+        if [_octStamp(filename) for filename in [octfile] + deps] == stamps:
+            return octhash
+    deps = _octDependencies(octfile)
+    # stamps taken before reading, so a file changed meanwhile is re-hashed
+    stamps = [_octStamp(filename) for filename in [octfile] + deps]
+    h = hashlib.sha1()
+    for filename in [octfile] + deps:
+        h.update(filename.encode())
+        with open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    _OCTHASHES[os.path.abspath(octfile)] = (stamps, deps, h.hexdigest())
+    return h.hexdigest()
+
+def _ambientFile(octfile, opts, ambientdir='ambient', octhash=None):
+    """
+    Return the ambient (.amb) file for this octree and rtrace options, and
+    record whether it is a cache hit. Files are named after the octree, a 
+    hash of its contents (and of the scene files it reads) and a hash of the
+    rtrace options, so an ambient file is only reused for the exact same 
+    scene, sky and ambient parameters. Ambient files
+    left over from an older version of the same octree are removed.
+    Concurrent rtrace processes sharing the file rely on rtrace's own file
+    locking. octhash is the _octHash() of octfile, if the caller has it.
+    """
+    import hashlib, glob
+    if not os.path.exists(ambientdir):
+        os.makedirs(ambientdir, exist_ok=True)
+    octname = os.path.splitext(os.path.basename(octfile))[0]
+    if octhash is None:
+        octhash = _octHash(octfile)
+    octhash = octhash[:12]
+    opthash = hashlib.sha1(' '.join(opts.split()).encode()).hexdigest()[:8]
+    ambfile = os.path.join(ambientdir, '%s_%s_%s.amb' % (octname, octhash,
+                                                         opthash))
+    # invalidate ambient files of previous versions of this octree
+    for oldfile in glob.glob(os.path.join(ambientdir, octname+'_*_*.amb')):
+        oldname, oldhash, _ = os.path.basename(oldfile)[:-4].rsplit('_', 2)
+        if oldname == octname and oldhash != octhash:
+            try:
+                os.remove(oldfile)
+            except OSError:
+                pass
+    if os.path.exists(ambfile) and os.path.getsize(ambfile) > 0:
+        _AMBIENT_STATS['hits'] += 1
+    else:
+        _AMBIENT_STATS['misses'] += 1
+    return ambfile
+
+def ambientCacheStats(reset=False):
+    """
+    Hits and misses of the ambient file cache used with 
+    ``AnalysisObj(ambientcache=True)``. A hit is an rtrace call that started
+    from an existing ambient file.
+
+    Parameters
+    ----------
+    reset : bool
+        Set the counters back to zero after reading them.
+
+    Returns
+    -------
+    stats : dict
+        Keys 'hits', 'misses' and 'hitrate' (hits / total, None if no traces)
+    """
+    stats = dict(_AMBIENT_STATS)
+    total = stats['hits'] + stats['misses']
+    stats['hitrate'] = stats['hits'] / total if total else None
+    if reset:
+        _AMBIENT_STATS['hits'] = 0
+        _AMBIENT_STATS['misses'] = 0
+    return stats
+
+_OCTBASE_LOCK = threading.Lock()  # frozen base octrees built one at a time
+
+_ARTIFACT_STATS = {'hits': 0, 'misses': 0, 'evictions': 0}
+ARTIFACT_CACHE_MAXSIZE = 1e9  # bytes kept in each artifact cache directory
+
+def _artifactKey(kind, *inputs):
+    # sha1 of the artifact kind and of its generating inputs. str inputs that
+    # are existing files (and the files they call) are hashed by name and 
+    # content, bytes and other inputs by value.
+    import hashlib
+    h = hashlib.sha1(kind.encode())
+    for item in inputs:
+        if isinstance(item, bytes):
+            h.update(item)
+        elif isinstance(item, str) and os.path.isfile(item):
+            for filename in _radDependencies([item]):
+                h.update(filename.encode())
+                with open(filename, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        h.update(chunk)
+        else:
+            h.update(repr(item).encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+def _artifactFetch(cachedir, key, ext, target=None):
+    """
+    Look up an artifact in the content-addressed cache. On a hit, its
+    modification time is refreshed (the LRU order used by 
+    pruneArtifactCache) and it is copied to target, if given. Returns the
+    cache file name on a hit, None on a miss.
+    """
+    import shutil
+    cachefile = os.path.join(cachedir, key + ext)
+    if not os.path.isfile(cachefile):
+        _ARTIFACT_STATS['misses'] += 1
+        return None
+    _ARTIFACT_STATS['hits'] += 1
+    try:
+        os.utime(cachefile)
+    except OSError:
+        pass
+    if target is not None:
+        shutil.copyfile(cachefile, target)
+    return cachefile
+
+def _artifactStore(cachedir, key, ext, source=None, data=None):
+    # add a file (source), raw bytes or picklable data to the cache, then
+    # evict the least recently used artifacts over ARTIFACT_CACHE_MAXSIZE
+    import shutil, pickle
+    os.makedirs(cachedir, exist_ok=True)
+    cachefile = os.path.join(cachedir, key + ext)
+    tmpfile = '%s.%s.%s.tmp' % (cachefile, os.getpid(), threading.get_ident())
+    if source is not None:
+        shutil.copyfile(source, tmpfile)
+    elif isinstance(data, bytes):
+        with open(tmpfile, 'wb') as f:
+            f.write(data)
+    else:
+        with open(tmpfile, 'wb') as f:
+            pickle.dump(data, f)
+    os.replace(tmpfile, cachefile)
+    pruneArtifactCache(cachedir)
+    return cachefile
+
+def pruneArtifactCache(cachedir='cache', maxsize=None):
+    """
+    Remove the least recently used artifacts of the content-addressed cache
+    (``RadianceObj(artifactcache=True)``, ``AnalysisObj(artifactcache=True)``)
+    until it holds at most maxsize bytes. Called after each new artifact.
+
+    Parameters
+    ----------
+    cachedir : str
+        Cache directory. Default 'cache', in the RadianceObj path.
+    maxsize : numeric
+        Size limit in bytes. Default ARTIFACT_CACHE_MAXSIZE (1 GB).
+
+    Returns
+    -------
+    removed : int
+        Number of artifacts removed
+    """
+    if maxsize is None:
+        maxsize = ARTIFACT_CACHE_MAXSIZE
+    if not os.path.isdir(cachedir):
+        return 0
+    entries = []
+    for filename in os.listdir(cachedir):
+        path = os.path.join(cachedir, filename)
+        if filename.endswith('.tmp') or not os.path.isfile(path):
+            continue
+        st = os.stat(path)
+        entries.append((st.st_mtime, st.st_size, path))
+    total = sum(entry[1] for entry in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= maxsize:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    _ARTIFACT_STATS['evictions'] += removed
+    return removed
+
+def artifactCacheStats(reset=False, cachedir='cache'):
+    """
+    Hits, misses and evictions of the content-addressed artifact cache 
+    (octrees from ``RadianceObj(artifactcache=True)``, scan results from 
+    ``AnalysisObj(artifactcache=True)``), and its current size.
+
+    Parameters
+    ----------
+    reset : bool
+        Set the counters back to zero after reading them.
+    cachedir : str
+        Cache directory to report the size of. Default 'cache'.
+
+    Returns
+    -------
+    stats : dict
+        Keys 'hits', 'misses', 'evictions', 'hitrate' (hits / lookups, None
+        if no lookups), 'files' and 'size' (bytes) of cachedir.
+    """
+    stats = dict(_ARTIFACT_STATS)
+    total = stats['hits'] + stats['misses']
+    stats['hitrate'] = stats['hits'] / total if total else None
+    files = []
+    if os.path.isdir(cachedir):
+        files = [os.path.join(cachedir, f) for f in os.listdir(cachedir)
+                 if not f.endswith('.tmp')]
+    stats['files'] = len(files)
+    stats['size'] = sum(os.path.getsize(f) for f in files)
+    if reset:
+        for key in _ARTIFACT_STATS:
+            _ARTIFACT_STATS[key] = 0
+    return stats
+
+_WEATHERCACHE_VERSION = 1  # bump when the cached MetObj layout changes
+_METOBJ_COLUMNS = ['ghi', 'dhi', 'dni', 'albedo', 'dewpoint', 'pressure',
+                   'temp_air', 'wind_speed', 'meastracker_angle']
+
+def _tzSpec(tz):
+    # str for a fixed-offset tzinfo, turned back into the same kind of
+    # tzinfo by _tzFromSpec
+    if tz is None:
+        return ''
+    if isinstance(tz, datetime.timezone):
+        return 'timezone:%d' % (tz.utcoffset(None) // datetime.timedelta(minutes=1))
+    if getattr(tz, 'zone', None) is not None:
+        return 'zone:' + tz.zone
+    return 'pytz:%d' % (tz.utcoffset(None) // datetime.timedelta(minutes=1))
+
+def _tzFromSpec(spec):
+    import pytz
+    kind, _, value = spec.partition(':')
+    if kind == 'timezone':
+        return datetime.timezone(datetime.timedelta(minutes=int(value)))
+    if kind == 'zone':
+        return pytz.timezone(value)
+    return pytz.FixedOffset(int(value))
+
+def _datetimeFromI8(values, spec):
+    # DatetimeIndex from int64 ns since epoch (UTC) and a _tzSpec str
+    index = pd.DatetimeIndex(values.view('M8[ns]'))
+    if spec:
+        index = index.tz_localize('UTC').tz_convert(_tzFromSpec(spec))
+    return index
+
+def _metObjBytes(metdata, metfiles=None):
+    """
+    Columnar .npz image of a MetObj for the weather cache: one array per
+    weather column and per solpos / sunrisesetdata column (timestamps as
+    int64 ns), the location and the contents of the gencumsky temporary
+    weather files (metfiles, a file name or a list of them), in an
+    uncompressed npz that loads without pickle.
+    """
+    import io, json
+    arrays = {'datetime': metdata.datetimeindex.asi8}
+    spec = {'version': _WEATHERCACHE_VERSION,
+            'tz': _tzSpec(metdata.datetimeindex.tz), 'metfiles': metfiles,
+            'scalars': {key: getattr(metdata, key) for key in
+                        ['latitude', 'longitude', 'elevation', 'timezone',
+                         'city', 'label']},
+            'columns': [], 'frames': {}}
+    for key in _METOBJ_COLUMNS:
+        if getattr(metdata, key, None) is not None:
+            arrays[key] = np.asarray(getattr(metdata, key))
+            spec['columns'].append(key)
+    for name in ['solpos', 'sunrisesetdata']:
+        frame = getattr(metdata, name)
+        framespec = {'index': frame.index.name, 'columns': list(frame.columns),
+                     'tz': {}}
+        for col, values in [('__index__', frame.index)] + list(frame.items()):
+            if isinstance(values.dtype, pd.DatetimeTZDtype) or \
+                    np.issubdtype(values.dtype, np.datetime64):
+                values = pd.DatetimeIndex(values)
+                framespec['tz'][col] = _tzSpec(values.tz)
+                values = values.asi8
+            arrays['%s.%s' % (name, col)] = np.asarray(values)
+        spec['frames'][name] = framespec
+    if isinstance(metfiles, str):
+        metfiles = [metfiles]
+    for ii, metfile in enumerate(metfiles or []):
+        with open(metfile, 'rb') as f:
+            arrays['metfile%d' % ii] = np.frombuffer(f.read(), dtype=np.uint8)
+    arrays['spec'] = np.array(json.dumps(spec, default=lambda v: v.item()))
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+def _metObjLoad(cachefile):
+    """
+    Rebuild the MetObj saved by _metObjBytes without recomputing the sun
+    position. Returns the MetObj, the gencumsky temporary weather file
+    name(s) and a list of (file name, contents) to write them back.
+    """
+    import json
+    with np.load(cachefile, allow_pickle=False) as npz:
+        spec = json.loads(str(npz['spec']))
+        metdata = MetObj.__new__(MetObj)
+        scalars = spec['scalars']
+        for key in ['latitude', 'longitude', 'elevation', 'timezone', 'city']:
+            setattr(metdata, key, scalars[key])
+        datetimeindex = _datetimeFromI8(npz['datetime'], spec['tz'])
+        metdata.datetime = datetimeindex.tolist()
+        metdata.datetimeindex = datetimeindex
+        metdata._keyrows = None
+        for key in _METOBJ_COLUMNS:
+            setattr(metdata, key,
+                    npz[key] if key in spec['columns'] else None)
+        for name in ['solpos', 'sunrisesetdata']:
+            framespec = spec['frames'][name]
+            columns = {}
+            for col in ['__index__'] + framespec['columns']:
+                values = npz['%s.%s' % (name, col)]
+                if col in framespec['tz']:
+                    values = _datetimeFromI8(values, framespec['tz'][col])
+                columns[col] = values
+            index = pd.Index(columns.pop('__index__'), name=framespec['index'])
+            setattr(metdata, name, pd.DataFrame(
+                {col: pd.Series(values, index=index, copy=False) 
+                 for col, values in columns.items()}))
+        metdata.label = scalars['label']
+        metfiles = spec['metfiles']
+        filenames = [metfiles] if isinstance(metfiles, str) else metfiles or []
+        filedata = [(filename, npz['metfile%d' % ii].tobytes())
+                    for ii, filename in enumerate(filenames)]
+    return metdata, metfiles, filedata
+
+# rtrace options tried in turn by accuracy='adaptive', from 'low' up to more
+# ambient bounces and divisions than 'high'
+_ADAPTIVE_ACCURACY = ["-ab 2 -aa .1 -ar 256 -ad 2048 -as 256",
+                      "-ab 3 -aa .1 -ar 256 -ad 2048 -as 256",
+                      "-ab 4 -aa .08 -ar 512 -ad 4096 -as 512",
+                      "-ab 5 -aa .08 -ar 512 -ad 8192 -as 1024"]
+
+def _analysis1axisIndex(octfile, name, scene, accuracy, analysiskwargs,
+                        scankwargs):
+    # moduleAnalysis and analysis of a single trackerdict index. Module level
+    # so it can be sent to a process pool by analysis1axis(workers=N)
+    analysis = AnalysisObj(octfile, name, **analysiskwargs)
+    scankwargs = dict(scankwargs)
+    try:
+        if scankwargs.pop('fieldscan', False):
+            analysis.fieldAnalysis(octfile=octfile, scene=scene, name=name,
+                                   accuracy=accuracy, **scankwargs)
+            return analysis
+        frontscanind, backscanind = analysis.moduleAnalysis(scene=scene, 
+                                                            **scankwargs)
+        analysis.analysis(octfile=octfile, name=name, frontscan=frontscanind,
+                          backscan=backscanind, accuracy=accuracy)
+    finally:
+        if analysiskwargs.get('persistent'):
+            closeRtraceWorkers(octfile)
+    return analysis
+
+def _analysis1axisIndexProcess(*args):
+    # _analysis1axisIndex in a worker process. Also returns the ambient and
+    # artifact cache counts of this call so they can be added up in the main
+    # process.
+    before = dict(_AMBIENT_STATS)
+    artbefore = dict(_ARTIFACT_STATS)
+    analysis = _analysis1axisIndex(*args)
+    return analysis, ({key: _AMBIENT_STATS[key] - before[key] 
+                       for key in before},
+                      {key: _ARTIFACT_STATS[key] - artbefore[key] 
+                       for key in artbefore})
+
 def _interactive_load(title=None):
     # Tkinter file picker
     import tkinter
@@ -170,6 +730,25 @@ def _modDict(originaldict, moddict, relative=False):
     
     return newdict
 
+def _checkSensors(sensors):
+    # Checking Sensors input data for list or tuple. Returns the number of
+    # front and back sensors.
+    if (type(sensors)==tuple or type(sensors)==list):
+        try:
+            sensors_back = sensors[1]
+            sensors_front = sensors[0]
+        except IndexError: # only 1 value passed??
+            sensors_back = sensors_front = sensors[0]
+    elif (type(sensors)==int or type(sensors)==float):
+        # Ensure sensors are positive int values.
+        if int(sensors) < 1:
+            raise Exception('input sensorsy must be numeric >0')
+        sensors_back = sensors_front = int(sensors)
+    else:
+        print('Warning: invalid value passed for sensors. Setting = 1')
+        sensors_back = sensors_front = 1
+    return sensors_front, sensors_back
+
 def _heightCasesSwitcher(sceneDict, preferred='hub_height', nonpreferred='clearance_height',
                          suppress_warning=False):
         """
@@ -362,7 +941,7 @@ class RadianceObj(SuperClass):
     def __repr__(self):
         #return str(self.__dict__)  
         return str(type(self)) + ' : ' + str({key: self.__dict__[key] for key in self.columns if key != 'trackerdict'}) 
-    def __init__(self, name=None, path=None, hpc=False):
+    def __init__(self, name=None, path=None, hpc=False, artifactcache=False):
         '''
         initialize RadianceObj with path of Radiance materials and objects,
         as well as a basename to append to
@@ -374,6 +953,13 @@ class RadianceObj(SuperClass):
         hpc:  Keeps track if User is running simulation on HPC so some file 
               reading routines try reading a bit longer and some writing 
               routines (makeModule) that overwrite themselves are inactivated.
+        artifactcache: boolean or str, default False. Keep the octrees made
+              by makeOct, and the scan results of analysis1axis, in a 
+              content-addressed cache (the 'cache' folder in path, or the
+              folder passed) keyed by the contents of their input files and
+              parameters, and reuse them when a study is re-run with the 
+              same inputs. See 
+              :py:func:`~bifacial_radiance.main.artifactCacheStats`.
 
         Returns
         -------
@@ -395,6 +981,10 @@ class RadianceObj(SuperClass):
         #self.nMods = None        # number of modules per row
         #self.nRows = None        # number of rows per scene
         self.hpc = hpc           # HPC simulation is being run. Some read/write functions are modified
+        if artifactcache is True:
+            artifactcache = 'cache'
+        self._artifactcache = artifactcache or False
+        self._skytext = {}     # in-memory skies, {skyfile name: sky text}
         
         now = datetime.datetime.now()
         self.nowstr = str(now.date())+'_'+str(now.hour)+str(now.minute)+str(now.second)
@@ -824,7 +1414,8 @@ class RadianceObj(SuperClass):
         
     def readWeatherFile(self, weatherFile=None, starttime=None, 
                         endtime=None, label=None, source=None,
-                        coerce_year=None, tz_convert_val=None):
+                        coerce_year=None, tz_convert_val=None, cache=None,
+                        solposmethod='nrel_numpy'):
         """
         Read either a EPW or a TMY file, calls the functions 
         :py:class:`~bifacial_radiance.readTMY` or
@@ -860,6 +1451,19 @@ class RadianceObj(SuperClass):
         tz_convert_val : int 
             Convert timezone to this fixed value, following ISO standard 
             (negative values indicating West of UTC.)
+        cache : bool or str
+            Keep the parsed weather data (the MetObj columns, solpos and 
+            sunrise/sunset tables and the gencumsky temporary files) in an
+            .npz file of the artifact cache, keyed by the weather file 
+            contents and the other inputs above. Later reads of the same file
+            with the same options load it back in milliseconds instead of 
+            parsing it and recomputing the sun position. True uses the 
+            'cache' folder in the RadianceObj path, a str is the cache 
+            folder. Default None follows ``RadianceObj(artifactcache=...)``.
+        solposmethod : str
+            Solar position algorithm of the MetObj: 'nrel_numpy' (SPA, 
+            default), 'nrel_numba', 'ephemeris' or 'pyephem'. See 
+            :py:class:`~bifacial_radiance.MetObj`.
         """
         #from datetime import datetime
         import warnings
@@ -878,6 +1482,32 @@ class RadianceObj(SuperClass):
             if str(coerce_year).__len__() != 4:
                 warnings.warn('Incorrect coerce_year. Setting to None')
                 coerce_year = None
+
+        if cache is None:
+            cache = getattr(self, '_artifactcache', False)
+        elif cache is True:
+            cache = 'cache'
+        if cache:
+            import hashlib, pvlib
+            h = hashlib.sha1()
+            with open(weatherFile, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+            cachekey = _artifactKey('weather', h.digest(), source, label,
+                                    coerce_year, starttime, endtime, 
+                                    tz_convert_val, solposmethod,
+                                    pvlib.__version__, _WEATHERCACHE_VERSION)
+            cachefile = _artifactFetch(cache, cachekey, '.npz')
+            if cachefile:
+                metdata, metfiles, filedata = _metObjLoad(cachefile)
+                for filename, data in filedata:
+                    with open(filename, 'wb') as f:
+                        f.write(data)
+                if metfiles is not None:
+                    self.gencumsky_metfile = metfiles
+                print("Loaded %s from the artifact cache" % (weatherFile))
+                self.metdata = metdata
+                return self.metdata
                 
         
         def _parseTimes(t, hour, coerce_year):
@@ -988,13 +1618,22 @@ class RadianceObj(SuperClass):
                 coerce_year = None
         '''        
 
+        # gencumsky files written by this read, if any, are cached with it
+        oldmetfile = self.__dict__.pop('gencumsky_metfile', None)
         tmydata_trunc = self._saveTempTMY(metdata, filename=tempMetDatatitle, 
                                           starttime=starttime, endtime=endtime, 
                                           coerce_year=coerce_year,
                                           label=label)
+        metfiles = self.__dict__.get('gencumsky_metfile')
+        if metfiles is None and oldmetfile is not None:
+            self.gencumsky_metfile = oldmetfile
 
         if tmydata_trunc.__len__() > 0:
-            self.metdata = MetObj(tmydata_trunc, metadata, label = label)
+            self.metdata = MetObj(tmydata_trunc, metadata, label = label,
+                                  solposmethod=solposmethod)
+            if cache:
+                _artifactStore(cache, cachekey, '.npz', 
+                               data=_metObjBytes(self.metdata, metfiles))
         else:
             self.metdata = None
             raise Exception('Weather file returned zero points for the '
@@ -1404,7 +2043,7 @@ class RadianceObj(SuperClass):
         return tracker_theta
 
 
-    def gendaylit(self, timeindex, metdata=None, debug=False):
+    def gendaylit(self, timeindex, metdata=None, debug=False, inmemory=False):
         """
         Sets and returns sky information using gendaylit.
         Uses PVLIB for calculating the sun position angles instead of
@@ -1418,6 +2057,9 @@ class RadianceObj(SuperClass):
             MetObj object with list of dni, dhi, ghi and location
         debug : bool
             Flag to print output of sky DHI and DNI
+        inmemory : bool
+            If True, the sky is not written to /skies/. Its text is kept in 
+            memory under skyname, and makeOct sends it to oconv on stdin.
 
         Returns
         -------
@@ -1505,9 +2147,15 @@ class RadianceObj(SuperClass):
         filename = time.strftime('%Y-%m-%d_%H%M')
         skyname = os.path.join(sky_path,"sky2_%s_%s_%s.rad" %(lat, lon, filename))
 
-        skyFile = open(skyname, 'w')
-        skyFile.write(skyStr)
-        skyFile.close()
+        if not hasattr(self, '_skytext'):
+            self._skytext = {}
+        if inmemory:
+            self._skytext[skyname] = skyStr
+        else:
+            self._skytext.pop(skyname, None)
+            skyFile = open(skyname, 'w')
+            skyFile.write(skyStr)
+            skyFile.close()
 
         self.skyfiles = [skyname]
 
@@ -1745,7 +2393,8 @@ class RadianceObj(SuperClass):
             and list of csv metfile, and datetimes at that angle
             trackerdict[angle]['csvfile';'surf_azm';'surf_tilt';'UTCtime']
             - or -
-            trackerdict[time]['tracker_theta';'surf_azm';'surf_tilt']
+            trackerdict[time]['tracker_theta';'surf_azm';'surf_tilt';'timeindex']
+            where 'timeindex' is the row of the timestamp in metdata.
         """
 
         # Documentation check:
@@ -1788,8 +2437,117 @@ class RadianceObj(SuperClass):
 
         return trackerdict
 
+    def clusterTrackerdict(self, trackerdict=None, metdata=None, thetatol=2.0,
+                           suntol=5.0, kdtol=0.1):
+        """
+        Group the hours of a gendaylit trackerdict with a similar tracker
+        angle, sun position and diffuse fraction so only one representative
+        hour per cluster is simulated. Run after 
+        :py:class:`~bifacial_radiance.RadianceObj.set1axis` and before 
+        :py:class:`~bifacial_radiance.RadianceObj.gendaylit1axis`.
+        gendaylit1axis and makeOct1axis skip the other members, 
+        makeScene1axis gives them the representative's scene, and 
+        analysis1axis scales the representative's irradiance to each member 
+        hour by the ratio of their GHI. A member is only analyzed together 
+        with, or after, its representative.
+
+        Parameters
+        ------------
+        trackerdict : dictionary
+            Trackerdict with timestamp keys (gendaylit workflow). 
+            Default = self.trackerdict
+        metdata : :py:class:`~bifacial_radiance.MetObj`
+            Meteorological object used for set1axis. Default = self.metdata
+        thetatol : numeric
+            Tracker angle bin width in degrees. Default 2.
+        suntol : numeric
+            Sun altitude and azimuth bin width in degrees. Default 5.
+        kdtol : numeric
+            Diffuse fraction (DHI/GHI) bin width. Default 0.1.
+
+        Returns
+        -------
+        trackerdict
+            with the keys 'cluster' (representative timestamp) and 
+            'clusterscale' (GHI ratio to the representative) on every 
+            hour, and 'clustermembers' on the representatives.
+        RadianceObj.clusterReport : dict
+            'hours', 'clusters', and the estimated plane-of-array error of
+            the clustering from an isotropic sky model: 'annualerror' 
+            (relative error of the summed POA irradiance) and 'hourlyerror'
+            (mean absolute hourly error, relative to the mean POA)
+        """
+        import pvlib
+
+        if metdata is None:
+            metdata = self.metdata
+        if trackerdict is None:
+            try:
+                trackerdict = self.trackerdict
+            except AttributeError:
+                print('No trackerdict value passed or available in self')
+        if getattr(self, 'cumulativesky', False) is True:
+            print('clusterTrackerdict works on gendaylit trackerdicts. '+
+                  'Run set1axis with cumulativesky=False')
+            return trackerdict
+
+        keys = sorted(trackerdict.keys())
+        idx = np.array(metdata._trackerRows(trackerdict, keys))
+        theta = np.array([trackerdict[key]['theta'] for key in keys])
+        ghi = np.array([trackerdict[key]['ghi'] for key in keys])
+        dhi = np.array([trackerdict[key]['dhi'] for key in keys])
+        dni = np.array([trackerdict[key]['dni'] for key in keys])
+        sunalt = metdata.solpos['apparent_elevation'].values[idx]
+        sunaz = metdata.solpos['azimuth'].values[idx]
+        kd = np.clip(dhi / ghi, 0, 1)
+
+        features = np.column_stack([theta / thetatol, sunalt / suntol, 
+                                    sunaz / suntol, kd / kdtol])
+        bins = np.floor(features).astype(int)
+        _, labels = np.unique(bins, axis=0, return_inverse=True)
+        labels = labels.ravel()
+
+        reps = np.zeros(len(keys), dtype=int)
+        for label in np.unique(labels):
+            members = np.where(labels == label)[0]
+            # medoid: member closest to the center of its cluster
+            dist = np.sum((features[members] - 
+                           features[members].mean(axis=0))**2, axis=1)
+            rep = members[np.argmin(dist)]
+            reps[members] = rep
+            trackerdict[keys[rep]]['clustermembers'] = [keys[m] for m in members]
+        for i, key in enumerate(keys):
+            trackerdict[key]['cluster'] = keys[reps[i]]
+            trackerdict[key]['clusterscale'] = ghi[i] / ghi[reps[i]]
+
+        # expected error: isotropic POA of each hour vs. scaled representative
+        try:
+            albedo = np.mean(self.ground.ReflAvg)
+        except AttributeError:
+            albedo = 0.2
+        surf_tilt = np.array(metdata.surface_tilt)[idx]
+        surf_azm = np.array(metdata.surface_azimuth)[idx]
+        zenith = metdata.solpos['apparent_zenith'].values[idx]
+        poa = pvlib.irradiance.get_total_irradiance(surf_tilt, surf_azm, 
+                    zenith, sunaz, dni, ghi, dhi, albedo=albedo)['poa_global']
+        poa = np.nan_to_num(np.asarray(poa, dtype=float))
+        poaclustered = poa[reps] * ghi / ghi[reps]
+        annualerror = (poaclustered.sum() - poa.sum()) / poa.sum()
+        hourlyerror = np.mean(np.abs(poaclustered - poa)) / np.mean(poa)
+
+        nclusters = len(np.unique(reps))
+        self.clusterReport = {'hours':len(keys), 'clusters':nclusters,
+                              'annualerror':annualerror, 
+                              'hourlyerror':hourlyerror}
+        print('Clustered {} hours into {} simulations ({:.1f}x fewer). '
+              'Estimated POA error: {:.2%} annual, {:.2%} hourly'.format(
+                  len(keys), nclusters, len(keys)/nclusters, annualerror, 
+                  hourlyerror))
+        self.trackerdict = trackerdict
+        return trackerdict
+
     def gendaylit1axis(self, metdata=None, trackerdict=None, startdate=None,
-                       enddate=None, debug=False):
+                       enddate=None, debug=False, inmemory=False):
         """
         1-axis tracking implementation of gendaylit.
         Creates multiple sky files, one for each time of day.
@@ -1807,7 +2565,11 @@ class RadianceObj(SuperClass):
             Recommended to downselect metdata when reading Weather File.
         trackerdict : dictionary
             Dictionary with keys for tracker tilt angles (gencumsky) or timestamps (gendaylit)
-        
+        inmemory : bool
+            Keep the skies in memory instead of writing one file per hour
+            in /skies/. makeOct1axis streams them to oconv on stdin. See
+            :py:class:`~bifacial_radiance.RadianceObj.gendaylit`.
+
         Returns
         -------
         Updated trackerdict dictionary 
@@ -1841,11 +2603,9 @@ class RadianceObj(SuperClass):
 
         trackerdict2={}
         #for i in range(0, len(trackerdict.keys())):
-        for key in trackerdict.keys():
-            time_target = pd.to_datetime(key, format="%Y-%m-%d_%H%M").tz_localize(int(self.metdata.timezone*3600))
-            try:
-                i = metdata.datetime.index(time_target)
-            except IndexError:  #out of range error
+        keys = list(trackerdict.keys())
+        for key, i in zip(keys, metdata._trackerRows(trackerdict, keys)):
+            if i is None:  # not a timestamp of metdata
                 break  # 
             #filename = str(time)[5:-12].replace('-','_').replace(' ','_')
             self.name = key
@@ -1853,13 +2613,21 @@ class RadianceObj(SuperClass):
             #check for GHI > 0
             #if metdata.ghi[i] > 0:
             if (metdata.ghi[i] > 0) & (~np.isnan(metdata.tracker_theta[i])):  
-                skyfile = self.gendaylit(metdata=metdata, timeindex=i, debug=debug)
+                if trackerdict[key].get('cluster', key) != key:
+                    # clustered hour: simulated by its representative
+                    trackerdict2[key] = trackerdict[key]
+                    continue
+                skyfile = self.gendaylit(metdata=metdata, timeindex=i, debug=debug,
+                                         inmemory=inmemory)
                 # trackerdict2 reduces the dict to only the range specified.
                 trackerdict2[key] = trackerdict[key]  
                 trackerdict2[key]['skyfile'] = skyfile
                 count +=1
 
-        print('Created {} skyfiles in /skies/'.format(count))
+        if inmemory:
+            print('Created {} skies in memory'.format(count))
+        else:
+            print('Created {} skyfiles in /skies/'.format(count))
         self.trackerdict = trackerdict2
         return trackerdict2
 
@@ -1902,8 +2670,131 @@ class RadianceObj(SuperClass):
         self.trackerdict = trackerdict
         return trackerdict
 
+    def genDaylightMtx(self, metdata=None, mf=1, savefile=None):
+        """
+        Generate the sky matrices for the daylight coefficient method 
+        (:py:func:`~bifacial_radiance.RadianceObj.analysisDaylightMtx`).
+        The weather data is written as a .wea file in the EPWs folder, 
+        using the sun position timestamps of the MetObj, and gendaymtx
+        turns it into the radiance of each Reinhart sky patch for each 
+        timestamp.
+
+        Parameters
+        ----------
+        metdata : MetObj
+            MetObj with dni, dhi and solpos. Default self.metdata
+        mf : int
+            Reinhart sky subdivision. 1 (default) is the Tregenza sky of 145 
+            patches plus the ground, 2 gives 577, 4 gives 2305 patches.
+        savefile : str
+            Name of the .wea file. Default self.name
+
+        Returns
+        -------
+        daylightmtx : dict
+            'sky'     : array (patches, timestamps, 3) with the radiance of 
+                        each patch, including the sun spread into the 
+                        patches around it. Patch 0 is the ground.
+            'skysun'  : same, for the sun only
+            'dni'     : DNI of each timestamp
+            'sunalt', 'sunaz' : sun elevation and azimuth (pvlib convention)
+            'timestamps' : metdata.datetime 
+            'mf'      : mf
+        """
+        if metdata is None:
+            metdata = self.metdata
+        if savefile is None:
+            savefile = self.name
+        weafile = os.path.join('EPWs', savefile+'.wea')
+
+        # gendaymtx computes its own sun position, so the .wea uses the
+        # timestamps metdata.solpos was calculated at (label corrected)
+        times = metdata.solpos.index
+        weaStr = ("place %s\nlatitude %s\nlongitude %s\ntime_zone %s\n" 
+                  "site_elevation %s\nweather_data_file_units 1\n" 
+                  % (str(metdata.city).replace(' ', '_'), metdata.latitude,
+                     -metdata.longitude, -15*metdata.timezone, 
+                     metdata.elevation))
+        hours = times.hour + times.minute/60.0 + times.second/3600.0
+        weaStr += ''.join(['%d %d %.4f %s %s\n' % (m, d, h, dni, dhi) for 
+                           m, d, h, dni, dhi in zip(times.month, times.day, 
+                           hours, metdata.dni, metdata.dhi)])
+        with open(weafile, 'w') as f:
+            f.write(weaStr)
+
+        # ground reflectance of patch 0. Time-varying albedo is averaged.
+        try:
+            albedo = [self.ground._nonzeromean(refl) for refl in 
+                      (self.ground.Rrefl, self.ground.Grefl, self.ground.Brefl)]
+        except AttributeError:
+            raise Exception('Error: ground reflection not defined.  '
+                            'Run RadianceObj.setGround() first')
+        npatches = 144*mf*mf + 2
+        daylightmtx = {'mf':mf, 'timestamps':metdata.datetime, 
+                       'dni':np.array(metdata.dni, dtype=float),
+                       'sunalt':np.array(metdata.solpos['elevation']),
+                       'sunaz':np.array(metdata.solpos['azimuth'])}
+        for key, opt in [('sky', '-g %s %s %s' % tuple(albedo)), 
+                         ('skysun', '-d')]:
+            cmd = 'gendaymtx -O1 -h -od -m %s %s %s' % (mf, opt, weafile)
+            data, err = _popen(cmd, None, decode=False)
+            if data is None:
+                raise Exception('gendaymtx failed: %s' % (err))
+            if err is not None:
+                print(err)
+            daylightmtx[key] = np.frombuffer(data).reshape(npatches, -1, 3)
+
+        self.daylightmtx = daylightmtx
+        return daylightmtx
+
+    def _makeOctDaylightMtx(self, radfiles, octname, sunalt=None, sunaz=None):
+        """
+        Make the octrees for the daylight coefficient method. The first one
+        has the scene with a uniform glow sky and ground (modifier sky_glow) 
+        to be binned into patches. If sun positions are passed (only the 
+        timestamps with the sun up), a second one has the scene with one 
+        solar disc per position (modifiers solar0, solar1...), listed in a
+        .mod file for rcontrib -M.
 
-    def makeOct(self, filelist=None, octname=None):
+        Returns
+        -------
+        octfile, sunoctfile, sunmodfile
+        """
+        groundstring = self.ground._makeGroundString(cumulativesky=True)
+        groundstring = groundstring[groundstring.index('\nvoid plastic'):]
+        skyname = os.path.join('skies', 'dcsky_%s.rad' % (octname))
+        with open(skyname, 'w') as f:
+            f.write("void glow sky_glow\n0\n0\n4 1 1 1 0\n" + 
+                    "\nsky_glow source sky\n0\n0\n4 0 0 1 180\n" +
+                    "\nsky_glow source ground\n0\n0\n4 0 0 -1 180\n" +
+                    groundstring)
+        octfile = self.makeOct(self.materialfiles + [skyname] + radfiles,
+                               octname)
+        if sunalt is None:
+            return octfile, None, None
+
+        # suns at the exact solpos positions. Radiance: x east, y north
+        alt = np.radians(sunalt)
+        az = np.radians(sunaz)
+        sunname = os.path.join('skies', 'dcsuns_%s.rad' % (octname))
+        with open(sunname, 'w') as f:
+            f.write(''.join(['void light solar%s\n0\n0\n3 1 1 1\n' 
+                             '\nsolar%s source sun%s\n0\n0\n4 %s %s %s 0.533\n\n'
+                             % (i, i, i, dx, dy, dz) for i, (dx, dy, dz) in 
+                             enumerate(zip(np.sin(az)*np.cos(alt), 
+                                           np.cos(az)*np.cos(alt), 
+                                           np.sin(alt)))]))
+        sunmodfile = os.path.join('skies', 'dcsuns_%s.mod' % (octname))
+        with open(sunmodfile, 'w') as f:
+            f.write('\n'.join(['solar%s' % (i) for i in range(len(alt))]))
+        groundname = os.path.join('skies', 'dcground_%s.rad' % (octname))
+        with open(groundname, 'w') as f:
+            f.write(groundstring)
+        sunoctfile = self.makeOct(self.materialfiles + [groundname, sunname] 
+                                  + radfiles, octname+'_suns')
+        return octfile, sunoctfile, sunmodfile
+
+    def makeOct(self, filelist=None, octname=None, frozen=False):
         """
         Combine everything together into a .oct file
 
@@ -1913,6 +2804,16 @@ class RadianceObj(SuperClass):
             Files to include.  otherwise takes self.filelist
         octname : str
             filename (without .oct extension)
+        frozen : bool
+            If True, the files other than the sky (self.skyfiles and files
+            in the skies folder) are built once into a frozen base octree, 
+            shared by every octree with the same geometry, and the sky is
+            added to it with oconv -i. The base is kept in self.octbase.
+
+        With ``RadianceObj(artifactcache=True)``, an octree built before 
+        from the same files (names and contents) is copied from the cache
+        instead of running oconv. Skies made with ``inmemory=True`` are 
+        sent to oconv on stdin.
 
 
         Returns
@@ -1928,6 +2829,15 @@ class RadianceObj(SuperClass):
         if octname is None:
             octname = self.name
 
+        octfile, octbase = self._makeOct(filelist, octname, frozen)
+        self.octfile = octfile
+        if octbase is not None:
+            self.octbase = octbase
+        return octfile
+
+    def _makeOct(self, filelist, octname, frozen=False):
+        # body of makeOct. Returns (octfile, frozen base octree or None) 
+        # without setting self.octfile, so makeOct1axis can run it in threads
         debug = False
         #JSS. With the way that the break is handled now, this will wait the 10 for all the hours
         # that were not generated sky files.
@@ -1936,12 +2846,13 @@ class RadianceObj(SuperClass):
             time_to_wait = 10
             time_counter = 0
             for file in filelist:
+                if file in getattr(self, '_skytext', {}):
+                    continue
                 if debug:
                     print("HPC Checking for file %s" % (file))
                 if None in filelist:  # are we missing any files? abort!
                     print('Missing files, skipping...')
-                    self.octfile = None
-                    return None
+                    return None, None
                 #Filesky is being saved as 'none', so it crashes !
                 while not os.path.exists(file):
                     time.sleep(1)
@@ -1953,29 +2864,117 @@ class RadianceObj(SuperClass):
         #os.system('oconv '+ ' '.join(filelist) + ' > %s.oct' % (octname))
         if None in filelist:  # are we missing any files? abort!
             print('Missing files, skipping...')
-            self.octfile = None
-            return None
+            return None, None
+
+        # in-memory skies go to oconv on stdin, as a single '-' file
+        skytext = getattr(self, '_skytext', {})
+        memfiles = [f for f in filelist if f in skytext]
+        stdin = None
+        if memfiles:
+            stdin = ''.join(skytext[f] for f in memfiles)
+            filelist = [('-' if f == memfiles[0] else f) for f in filelist
+                        if f not in memfiles[1:]]
+
+        if frozen:
+            skyfiles = [f for f in filelist if f in getattr(self, 'skyfiles', []) 
+                        or os.path.normpath(f).split(os.sep)[0] == 'skies'
+                        or f == '-']
+            basefiles = [f for f in filelist if f not in skyfiles]
+            octfile, octbase = self._makeOctFrozen(basefiles, skyfiles, 
+                                                   octname, stdin)
+            if octfile is not None:
+                return octfile, octbase
+
+        artifactcache = getattr(self, '_artifactcache', False)
+        if artifactcache:
+            cachekey = _artifactKey('oct', *filelist, 
+                                    *([stdin] if stdin else []))
+            if _artifactFetch(artifactcache, cachekey, '.oct', 
+                              '%s.oct' % (octname)):
+                print("Created %s.oct from the artifact cache" % (octname))
+                return '%s.oct' % (octname), None
 
         #cmd = 'oconv ' + ' '.join(filelist)
-        filelist.insert(0,'oconv')
+        filelist = ['oconv'] + filelist
         with open('%s.oct' % (octname), "w") as f:
-            _,err = _popen(filelist, None, f)
+            _,err = _popen(filelist, stdin.encode() if stdin else None, f)
             #TODO:  exception handling for no sun up
             if err is not None:
                 if err[0:5] == 'error':
                     raise Exception(err[7:])
                 if err[0:7] == 'message':
                     warnings.warn(err[9:], Warning)
+        if artifactcache and (err is None or 'fatal' not in err):
+            _artifactStore(artifactcache, cachekey, '.oct', 
+                           source='%s.oct' % (octname))
                     
 
         #use rvu to see if everything looks good. 
         # use cmd for this since it locks out the terminal.
         #'rvu -vf views\side.vp -e .01 monopanel_test.oct'
         print("Created %s.oct" % (octname))
-        self.octfile = '%s.oct' % (octname)
-        return '%s.oct' % (octname)
+        return '%s.oct' % (octname), None
 
-    def makeOct1axis(self, trackerdict=None, singleindex=None, customname=None):
+    def _makeOctBase(self, basefiles, boundfiles=None, stdin=None):
+        """
+        Frozen (oconv -f) octree of the files that don't change from one hour
+        to the next (materials and scene). Its name is a hash of the contents
+        of basefiles and the files they call, so it is built only once per 
+        distinct geometry. The bounding cube also encloses boundfiles (the 
+        sky with its ground plane), so they can be added later with oconv -i.
+        stdin is the text of a '-' entry of boundfiles.
+        """
+        import hashlib
+
+        if boundfiles is None:
+            boundfiles = []
+        h = hashlib.sha1()
+        for filename in _radDependencies(basefiles):
+            with open(filename, 'rb') as f:
+                h.update(f.read())
+        baseoct = 'octbase_%s.oct' % (h.hexdigest()[:12])
+        with _OCTBASE_LOCK:  # one thread builds each base
+            if os.path.isfile(baseoct):
+                return baseoct
+
+            bbox, err = _popen(['getbbox', '-h'] + basefiles + boundfiles, 
+                               stdin.encode() if stdin else None)
+            if bbox is None:
+                print('getbbox failed: {}'.format(err))
+                return None
+            bbox = np.array(bbox.split(), dtype=float).reshape(3, 2)
+            size = np.max(bbox[:,1] - bbox[:,0]) * 1.02 + 0.01
+            origin = bbox.mean(axis=1) - size/2
+            cmd = ['oconv', '-f', '-b'] + ['%0.4f' % (v) for v in origin] + \
+                  ['%0.4f' % (size)] + basefiles
+            with open(baseoct, "w") as f:
+                _,err = _popen(cmd, None, f)
+            if err is not None and 'fatal' in err:
+                print('Frozen base octree failed: {}'.format(err))
+                os.remove(baseoct)
+                return None
+        print("Created frozen base %s" % (baseoct))
+        return baseoct
+
+    def _makeOctFrozen(self, basefiles, skyfiles, octname, stdin=None):
+        # octree from the frozen base of basefiles plus skyfiles (oconv -i).
+        # Returns (octfile, baseoct), or (None, None) if that fails so 
+        # makeOct can build the full octree.
+        baseoct = self._makeOctBase(basefiles, skyfiles, stdin)
+        if baseoct is None:
+            return None, None
+        with open('%s.oct' % (octname), "w") as f:
+            _,err = _popen(['oconv', '-i', baseoct] + skyfiles, 
+                           stdin.encode() if stdin else None, f)
+        if err is not None and 'fatal' in err:
+            print('oconv -i on frozen base failed, making the full octree: '
+                  '{}'.format(err))
+            return None, None
+        print("Created %s.oct from %s" % (octname, baseoct))
+        return '%s.oct' % (octname), baseoct
+
+    def makeOct1axis(self, trackerdict=None, singleindex=None, customname=None,
+                     frozen=False, workers=None, scratchdir=None):
         """
         Combine files listed in trackerdict into multiple .oct files
 
@@ -1988,11 +2987,25 @@ class RadianceObj(SuperClass):
             format 'YYYY-MM-DD_HHMM'.
         customname : str 
             Custom text string added to the end of the OCT file name.
+        frozen : bool
+            If True, build one frozen base octree (materials and scene) per
+            distinct geometry and derive each index's octree from it by 
+            adding the sky with oconv -i. See 
+            :py:class:`~bifacial_radiance.RadianceObj.makeOct`.
+        workers : int
+            Number of oconv runs at a time. Default None makes the octrees
+            one after the other.
+        scratchdir : str
+            Folder for the octrees instead of the working directory, e.g. a
+            node-local or tmpfs scratch disk. These octrees are temporary:
+            analysis1axis deletes each one as soon as its index is analyzed.
 
         Returns
         -------
         trackerdict
             Append 'octfile'  to the 1-axis dict with the location of the scene .octfile
+            and 'octbase' with the frozen base octree if frozen is True.
+            With scratchdir, 'octscratch' is True for the temporary octrees.
         """
 
         if customname is None:
@@ -2004,18 +3017,50 @@ class RadianceObj(SuperClass):
             except AttributeError:
                 print('No trackerdict value passed or available in self')
         if singleindex is None:   # loop through all values in the tracker dictionary
-            indexlist = trackerdict.keys()
+            # clustered hours are simulated by their representative
+            indexlist = [index for index in trackerdict 
+                         if trackerdict[index].get('cluster', index) == index]
         else:  # just loop through one single index in tracker dictionary
             indexlist = [singleindex]
 
-        print('\nMaking {} octfiles in root directory.'.format(indexlist.__len__()))
-        for index in sorted(indexlist):  # run through either entire key list of trackerdict, or just a single value
+        if scratchdir is None:
+            print('\nMaking {} octfiles in root directory.'.format(indexlist.__len__()))
+        else:
+            os.makedirs(scratchdir, exist_ok=True)
+            print('\nMaking {} octfiles in {}.'.format(len(indexlist), scratchdir))
+
+        def _makeOctIndex(index):
             try:
                 filelist = self.materialfiles + [trackerdict[index]['skyfile'], trackerdict[index]['radfile']]
-                octname = '1axis_%s%s'%(index, customname)
-                trackerdict[index]['octfile'] = self.makeOct(filelist, octname)
             except KeyError as e:
                 print('Trackerdict key error: {}'.format(e))
+                return None
+            octname = '1axis_%s%s'%(index, customname)
+            if scratchdir is not None:
+                octname = os.path.join(scratchdir, octname)
+            return self._makeOct(filelist, octname, frozen)
+
+        indexlist = sorted(indexlist) # run through either entire key list of trackerdict, or just a single value
+        if workers is not None and workers > 1 and len(indexlist) > 1:
+            # oconv runs as a subprocess, so threads are enough
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_makeOctIndex, indexlist))
+        else:
+            results = [_makeOctIndex(index) for index in indexlist]
+
+        for index, result in zip(indexlist, results):
+            if result is None:
+                continue
+            octfile, octbase = result
+            trackerdict[index]['octfile'] = octfile
+            if frozen:
+                trackerdict[index]['octbase'] = octbase
+                if octbase is not None:
+                    self.octbase = octbase
+            if scratchdir is not None and octfile is not None:
+                trackerdict[index]['octscratch'] = True
+            self.octfile = octfile
 
         return trackerdict
 
@@ -2138,7 +3183,7 @@ class RadianceObj(SuperClass):
         return modulenames
     
     def makeScene(self, module=None, sceneDict=None, radname=None,
-                  moduletype=None):
+                  moduletype=None, expandmodule=False, instance=False):
         """
         Create a SceneObj which contains details of the PV system configuration including
         tilt, row pitch, height, nMods per row, nRows in the system...
@@ -2157,6 +3202,18 @@ class RadianceObj(SuperClass):
         radname : str
             Gives a custom name to the scene file. Useful when parallelizing.
         moduletype: DEPRECATED. use the `module` kwarg instead.
+        expandmodule : bool
+            If True, the scene references a copy of the module expanded to
+            static primitives, made once per module definition, so oconv 
+            doesn't run the module's genbox / genrev commands again for 
+            every octree.
+        instance : bool
+            If True, the module is compiled once into its own frozen octree 
+            and placed with one Radiance `instance` per module, so the scene
+            octree size depends on the number of modules, not on the detail
+            of the module (cells, frames, omegas, torque tube). The material
+            names returned by the analysis then don't include the xform 
+            array prefix (e.g. 'a0.test-module.6457' for every module).
         
         Returns
         -------
@@ -2205,7 +3262,10 @@ class RadianceObj(SuperClass):
         #self.nMods = sceneDict['nMods']
         #self.nRows = sceneDict['nRows']
         sceneRAD = self.scene._makeSceneNxR(sceneDict=sceneDict,
-                                                 radname=radname)
+                                                 radname=radname,
+                                                 expandmodule=expandmodule,
+                                                 instance=instance,
+                                                 materialfiles=self.materialfiles)
 
         if 'appendRadfile' not in sceneDict:
             appendRadfile = False
@@ -2267,7 +3327,9 @@ class RadianceObj(SuperClass):
 
     
     def makeScene1axis(self, trackerdict=None, module=None, sceneDict=None,
-                       cumulativesky=None, moduletype=None):
+                       cumulativesky=None, moduletype=None, expandmodule=False,
+                       instance=False, angledelta=None, batch=False,
+                       dedup=False):
         """
         Creates a SceneObj for each tracking angle which contains details of the PV
         system configuration including row pitch, hub_height, nMods per row, nRows in the system...
@@ -2283,6 +3345,30 @@ class RadianceObj(SuperClass):
         cumulativesky : bool
             Defines if sky will be generated with cumulativesky or gendaylit.
         moduletype: DEPRECATED. use the `module` kwarg instead.
+        expandmodule : bool
+            If True, all scenes reference one copy of the module expanded to
+            static primitives, so oconv doesn't run the module's genbox / 
+            genrev commands again for every octree.
+        instance : bool
+            If True, all scenes place one frozen octree of the module with 
+            Radiance `instance` primitives instead of copying its geometry.
+            See :py:class:`~bifacial_radiance.RadianceObj.makeScene`.
+        angledelta : float
+            gendaylit only. Round the tracker angles to this increment 
+            (degrees) before building the scenes, so that with `dedup` more
+            timestamps share a geometry. Default None (exact angles).
+        batch : bool
+            If True, the tilts and clearance heights of all keys are 
+            calculated as arrays, and the module is loaded once. The scene 
+            texts (one per distinct geometry with `dedup`) are then written 
+            in one pass, without building a SceneObj per key. The trackerdict 'scene' is
+            a compact record that builds its SceneObj only when one of its 
+            attributes is used. Default False.
+        dedup : bool
+            gendaylit only. If True, timestamps with identical tilt, azimuth
+            and clearance height share one .rad file and SceneObj; only their
+            sky differs. Edits to the shared scene (e.g. appendtoScene) then
+            apply to all of them. Default False, one scene per timestamp.
 
         Returns
         --------
@@ -2291,7 +3377,8 @@ class RadianceObj(SuperClass):
                 'radfile'
                     directory where .rad scene file is stored
                 'scene'
-                    SceneObj for each tracker theta
+                    SceneObj for each tracker theta (shared by the timestamps
+                    with the same geometry with `dedup` or `batch`)
                 'clearance_height'
                     Calculated ground clearance based on
                     `hub height`, `tilt` angle and overall collector width `sceney`
@@ -2306,13 +3393,6 @@ class RadianceObj(SuperClass):
                   'and .pitch or .gcr')
             return
 
-        # If no nRows or nMods assigned on deprecated variable or dictionary,
-        # assign default.
-        if 'nRows' not in sceneDict:
-            sceneDict['nRows'] = 7
-        if 'nMods' not in sceneDict:
-            sceneDict['nMods'] = 20
-
         if trackerdict is None:
             try:
                 trackerdict = self.trackerdict
@@ -2343,32 +3423,13 @@ class RadianceObj(SuperClass):
                 self.printModules() #print available module types
                 return
 
-        if 'orientation' in sceneDict:
-            raise Exception('\n\n ERROR: Orientation format has been '
-                'deprecated since version 0.2.4. If you want to flip your '
-                'modules, on makeModule switch the x and y values.\n\n')
-       
-        # 1axis routine
-        # Preferred hub_height
-        sceneDict, use_clearanceheight = _heightCasesSwitcher(sceneDict, 
-                                                        preferred='hub_height', 
-                                                        nonpreferred='clearance_height')
-
-        if use_clearanceheight:
-            simplefix = 0
-            hubheight = sceneDict['clearance_height'] # Not really, but this is the fastest 
-            # to make it work with the simplefix as below the actual clearnace height
-            # gets calculated and the 0 sets the cosine correction to 0. 
-            # TODO CLEAN THIS UP.
-            
-        else:
-            #the hub height is the tracker height at center of rotation.
-            hubheight = sceneDict['hub_height']
-            simplefix = 1
-
-        # we no longer need sceneDict['hub_height'] - it'll be replaced by 'clearance_height' below
-        sceneDict.pop('hub_height',None)
-        if cumulativesky is True:        # cumulativesky workflow
+        sceneDict, hubheight, simplefix = self._sceneDict1axis(sceneDict)
+        if batch:
+            self._makeScene1axisBatch(trackerdict, module, sceneDict, 
+                                      hubheight, simplefix, cumulativesky,
+                                      expandmodule, instance, angledelta,
+                                      dedup)
+        elif cumulativesky is True:        # cumulativesky workflow
             print('\nMaking .rad files for cumulativesky 1-axis workflow')
             for theta in trackerdict:
                 scene = SceneObj(module)
@@ -2390,7 +3451,10 @@ class RadianceObj(SuperClass):
                                  'modulez' :  scene.module.z})
 
                 radfile = scene._makeSceneNxR(sceneDict=(sceneDict),
-                                             radname=radname, addhubheight=True)
+                                             radname=radname, addhubheight=True,
+                                             expandmodule=expandmodule,
+                                             instance=instance,
+                                             materialfiles=self.materialfiles)
                 trackerdict[theta]['radfile'] = radfile
                 trackerdict[theta]['scene'] = scene
 
@@ -2399,35 +3463,32 @@ class RadianceObj(SuperClass):
         else:  #gendaylit workflow
             print('\nMaking ~%s .rad files for gendaylit 1-axis workflow (this takes a minute..)' % (len(trackerdict)))
             count = 0
+            hours = 0
+            scenes = {} if dedup else None
             for time in trackerdict:
-                scene = SceneObj(module)
-
-                if trackerdict[time]['surf_azm'] >= 180:
-                    trackerdict[time]['surf_azm'] = trackerdict[time]['surf_azm']-180
-                    trackerdict[time]['surf_tilt'] = trackerdict[time]['surf_tilt']*-1
-                theta = trackerdict[time]['theta']
-                radname = '1axis%s_'%(time,)
-
-                # Calculating clearance height for this time.
-                height = hubheight - simplefix*0.5* math.sin(abs(theta) * math.pi / 180) \
-                        * scene.module.sceney + scene.module.offsetfromaxis \
-                        * math.sin(abs(theta)*math.pi/180)
-
-                if trackerdict[time]['ghi'] > 0:
-                    #trackerdict[time]['clearance_height'] = height
-
-                    sceneDict.update({'tilt' : trackerdict[time]['surf_tilt'],
-                                     'clearance_height' :  height,
-                                     'azimuth' : trackerdict[time]['surf_azm'],
-                                     'modulez' :  scene.module.z})
+                if trackerdict[time].get('cluster', time) != time:
+                    continue  # clustered hour, shares its representative's scene
+                made = self._makeScene1axisKey(trackerdict[time], time, module,
+                                               sceneDict, hubheight, simplefix,
+                                               expandmodule=expandmodule,
+                                               instance=instance, 
+                                               angledelta=angledelta,
+                                               scenes=scenes)
+                if made is not None:
+                    hours += 1
+                    count += made
+            if dedup:
+                print('{} Radfiles created in /objects/ for {} timestamps'.format(
+                      count, hours))
+            else:
+                print('{} Radfiles created in /objects/'.format(count))
 
-                    # if sceneDict isn't copied, it will change inside the SceneObj since dicts are mutable!
-                    radfile = scene._makeSceneNxR(sceneDict=(sceneDict),
-                                                 radname=radname, addhubheight=True)
-                    trackerdict[time]['radfile'] = radfile
-                    trackerdict[time]['scene'] = scene
-                    count+=1
-            print('{} Radfiles created in /objects/'.format(count))
+        # clustered hours share the scene of their representative
+        for time in trackerdict:
+            rep = trackerdict[time].get('cluster', time)
+            if rep != time and 'scene' in trackerdict.get(rep, {}):
+                trackerdict[time]['radfile'] = trackerdict[rep]['radfile']
+                trackerdict[time]['scene'] = trackerdict[rep]['scene']
 
         self.trackerdict = trackerdict
         #self.nMods = sceneDict['nMods']  #assign nMods and nRows to RadianceObj
@@ -2436,14 +3497,212 @@ class RadianceObj(SuperClass):
         
         return trackerdict
 
+    def _sceneDict1axis(self, sceneDict):
+        """
+        Defaults and height case of a makeScene1axis sceneDict. Returns the
+        sceneDict without 'hub_height', the hub height (or clearance height)
+        and simplefix (0 if the clearance height was given, 1 otherwise), 
+        used to calculate the clearance height of each tracker angle.
+        """
+        # If no nRows or nMods assigned on deprecated variable or dictionary,
+        # assign default.
+        if 'nRows' not in sceneDict:
+            sceneDict['nRows'] = 7
+        if 'nMods' not in sceneDict:
+            sceneDict['nMods'] = 20
+
+        if 'orientation' in sceneDict:
+            raise Exception('\n\n ERROR: Orientation format has been '
+                'deprecated since version 0.2.4. If you want to flip your '
+                'modules, on makeModule switch the x and y values.\n\n')
+       
+        # 1axis routine
+        # Preferred hub_height
+        sceneDict, use_clearanceheight = _heightCasesSwitcher(sceneDict, 
+                                                        preferred='hub_height', 
+                                                        nonpreferred='clearance_height')
+
+        if use_clearanceheight:
+            simplefix = 0
+            hubheight = sceneDict['clearance_height'] # Not really, but this is the fastest 
+            # to make it work with the simplefix as below the actual clearnace height
+            # gets calculated and the 0 sets the cosine correction to 0. 
+            # TODO CLEAN THIS UP.
+            
+        else:
+            #the hub height is the tracker height at center of rotation.
+            hubheight = sceneDict['hub_height']
+            simplefix = 1
+
+        # we no longer need sceneDict['hub_height'] - it'll be replaced by 'clearance_height' below
+        sceneDict.pop('hub_height',None)
+        return sceneDict, hubheight, simplefix
+
+    def _makeScene1axisKey(self, keydict, time, module, sceneDict, hubheight,
+                           simplefix, expandmodule=False, instance=False, 
+                           angledelta=None, scenes=None):
+        """
+        Scene of one gendaylit trackerdict key (keydict = trackerdict[time]),
+        stored in its 'radfile' and 'scene'. With a scenes dict, keys with 
+        the same (tilt, azimuth, clearance height) share the first one's 
+        scene. Returns 1 if a .rad file was written, 0 if a scene was 
+        shared and None if the key has no ghi.
+        """
+        import math
+
+        scene = SceneObj(module)
+
+        if keydict['surf_azm'] >= 180:
+            keydict['surf_azm'] = keydict['surf_azm']-180
+            keydict['surf_tilt'] = keydict['surf_tilt']*-1
+        theta = keydict['theta']
+        tilt = keydict['surf_tilt']
+        if angledelta:
+            theta = angledelta * round(theta / angledelta) + 0
+            tilt = angledelta * round(tilt / angledelta) + 0
+        radname = '1axis%s_'%(time,)
+
+        # Calculating clearance height for this time.
+        height = hubheight - simplefix*0.5* math.sin(abs(theta) * math.pi / 180) \
+                * scene.module.sceney + scene.module.offsetfromaxis \
+                * math.sin(abs(theta)*math.pi/180)
+
+        if not keydict['ghi'] > 0:
+            return None
+        geometry = (round(tilt, 6), round(keydict['surf_azm'], 6), 
+                    round(height, 6))
+        if scenes is not None and geometry in scenes:
+            keydict['radfile'], keydict['scene'] = scenes[geometry]
+            return 0
+
+        sceneDict.update({'tilt' : tilt,
+                         'clearance_height' :  height,
+                         'azimuth' : keydict['surf_azm'],
+                         'modulez' :  scene.module.z})
+
+        radfile = scene._makeSceneNxR(sceneDict=(sceneDict),
+                                     radname=radname, addhubheight=True,
+                                     expandmodule=expandmodule,
+                                     instance=instance,
+                                     materialfiles=self.materialfiles)
+        keydict['radfile'] = radfile
+        keydict['scene'] = scene
+        if scenes is not None:
+            scenes[geometry] = (radfile, scene)
+        return 1
+
+    def _makeScene1axisBatch(self, trackerdict, module, sceneDict, hubheight, 
+                             simplefix, cumulativesky, expandmodule, instance,
+                             angledelta, dedup=False):
+        """
+        Batch mode of makeScene1axis. Same scenes and trackerdict keys as the
+        loop over keys, but the geometry of all keys is calculated as arrays,
+        all scenes are written in one pass (each distinct geometry once with
+        dedup), and the trackerdict 'scene' entries are _SceneRecord views 
+        into a shared _SceneBatch.
+        """
+        from bifacial_radiance import ModuleObj
+
+        if type(module) == str:
+            module = ModuleObj(name=module)
+        template = SceneObj(module)
+        sceneDict = dict(sceneDict)
+        sceneDict.update({'modulez':module.z})
+        for key, default in [('azimuth', 180), ('axis_tilt', 0), 
+                             ('originx', 0), ('originy', 0)]:
+            sceneDict.setdefault(key, default)
+        if sceneDict.get('pitch', 0) > 0:
+            pitch = sceneDict['pitch']
+        elif 'gcr' in sceneDict:
+            pitch = np.round(module.sceney/sceneDict['gcr'], 3)
+        else:
+            raise Exception('No valid `pitch` or `gcr` in sceneDict')
+        if sceneDict['axis_tilt'] != 0:
+            print("Axis_Tilt is still under development. The sensors for the "
+                  "analysis might not fall in the correct surfaces.")
+
+        keys = list(trackerdict)
+        surf_azm = np.array([trackerdict[key]['surf_azm'] for key in keys], 
+                            dtype=float)
+        surf_tilt = np.array([trackerdict[key]['surf_tilt'] for key in keys],
+                             dtype=float)
+        flip = surf_azm >= 180
+        surf_azm[flip] -= 180
+        surf_tilt[flip] *= -1
+        for i in np.flatnonzero(flip):
+            trackerdict[keys[i]]['surf_azm'] = surf_azm[i]
+            trackerdict[keys[i]]['surf_tilt'] = surf_tilt[i]
+
+        if cumulativesky is True:
+            theta = np.array(keys, dtype=float)
+            tilt = surf_tilt
+            used = np.ones(len(keys), dtype=bool)
+        else:
+            theta = np.array([trackerdict[key]['theta'] for key in keys], 
+                             dtype=float)
+            tilt = surf_tilt
+            used = np.array([trackerdict[key]['ghi'] > 0 and 
+                             trackerdict[key].get('cluster', key) == key
+                             for key in keys])
+            if angledelta:
+                theta = angledelta * np.round(theta / angledelta) + 0
+                tilt = angledelta * np.round(tilt / angledelta) + 0
+        sintheta = np.sin(np.abs(theta) * np.pi / 180)
+        height = (hubheight - simplefix*0.5*sintheta*module.sceney + 
+                  module.offsetfromaxis*sintheta)
+
+        # one scene per key, or per distinct geometry (named after its first
+        # key) with dedup
+        usedkeys = np.flatnonzero(used)
+        if dedup:
+            geometry = np.round(np.stack([tilt, surf_azm, height], axis=1), 6)
+            _, first, inverse = np.unique(geometry[used], axis=0, 
+                                          return_index=True, 
+                                          return_inverse=True)
+        else:
+            first = inverse = np.arange(len(usedkeys))
+        first = usedkeys[first]
+        tilt, surf_azm, height = tilt[first], surf_azm[first], height[first]
+        sintilt = np.sin(np.abs(tilt) * np.pi / 180)
+        hubheights = height + (0.5*module.sceney - module.offsetfromaxis)*sintilt
+
+        if expandmodule:
+            modulefile = module._expandModule()
+        else:
+            modulefile = module.modulefile
+        if instance:
+            modulefile = module._instanceOctree(self.materialfiles)
+        radfiles = [os.path.join('objects', 
+                    f'1axis{keys[i]}__C_{c:0.2f}_rtr_{pitch:0.2f}_tilt_{t:0.0f}_'
+                    f'{sceneDict["nMods"]}modsx{sceneDict["nRows"]}rows_origin'
+                    f'{sceneDict["originx"]},{sceneDict["originy"]}.rad')
+                    for i, c, t in zip(first, height, tilt)]
+        batch = _SceneBatch(module, sceneDict, tilt, surf_azm, height, 
+                            hubheights, radfiles, pitch, modulefile, instance)
+        for i, radfile in enumerate(radfiles):
+            with open(radfile, 'wb') as f:
+                f.write(batch.text(template, i)[0].encode('ascii'))
+
+        records = [_SceneRecord(batch, i) for i in range(len(radfiles))]
+        for key, i in zip(usedkeys, np.ravel(inverse)):
+            trackerdict[keys[key]]['radfile'] = radfiles[i]
+            trackerdict[keys[key]]['scene'] = records[i]
+        print('{} Radfiles created in /objects/ for {} keys'.format(
+              len(radfiles), len(usedkeys)))
+        return trackerdict
+
 
     def analysis1axis(self, trackerdict=None, singleindex=None, accuracy='low',
                       customname=None, modWanted=None, rowWanted=None, 
                       sensorsy=9, sensorsx=1,  
                       modscanfront = None, modscanback = None, relative=False, 
-                      debug=False ):
+                      debug=False, persistent=False, binary=False,
+                      ambientcache=False, workers=None, fieldscan=False,
+                      tolerance=0.02, artifactcache=None):
         """
         Loop through trackerdict and runs linescans for each scene and scan in there.
+        Octrees made by makeOct1axis with a scratchdir are deleted as soon as
+        their index is analyzed.
 
         Parameters
         ----------------
@@ -2452,7 +3711,9 @@ class RadianceObj(SuperClass):
             For single-index mode, just the one index we want to run (new in 0.2.3).
             Example format '21_06_14_12_30' for 2021 June 14th 12:30 pm
         accuracy : str
-            'low' or 'high', resolution option used during _irrPlot and rtrace
+            'low' or 'high', resolution option used during _irrPlot and rtrace.
+            'adaptive' starts with 'low' and escalates only the sensors that 
+            haven't converged to the tolerance.
         customname : str
             Custom text string to be added to the file name for the results .CSV files
         modWanted : int 
@@ -2490,6 +3751,38 @@ class RadianceObj(SuperClass):
             Default is absolute value (relative=False)
         debug : Bool
             Activates internal printing of the function to help debugging.
+        persistent : Bool
+            Reuse one rtrace process for all scans of each octree. The
+            process is shut down once that trackerdict index is analyzed.
+        binary : Bool or str
+            Exchange sensors and results with rtrace as binary floats and 
+            parse them with NumPy. 'float64' (same as True) or 'float32'.
+        ambientcache : Bool or str
+            Reuse rtrace ambient files between scans of the same octree, e.g.
+            when re-running with a different modWanted or rowWanted. Saved in
+            the 'ambient' folder or the folder passed. The cache hit rate is
+            printed at the end of the run.
+        workers : int
+            Number of processes used to analyze the trackerdict indices in
+            parallel. Default None runs them one after the other. Results
+            are merged back in key order, so the cumulative values are the 
+            same as a serial run. Indices that fail are skipped and listed
+            in self.analysisFailures instead of stopping the run.
+        fieldscan : Bool
+            Sample every module of the field with 
+            :py:class:`~bifacial_radiance.AnalysisObj.fieldAnalysis` instead
+            of a single module. modWanted and rowWanted (int or list) select
+            modules and rows, default None samples all of them. modscanfront
+            and modscanback are not used. Wm2Front and Wm2Back are then the 
+            field average of each sensor.
+        tolerance : numeric
+            Relative convergence tolerance of the sensors with 
+            accuracy='adaptive'. Default 0.02.
+        artifactcache : Bool or str
+            Reuse the scan results of a previous run with the same octree
+            contents, rtrace options and sensors from the content-addressed
+            cache. Default None follows ``RadianceObj(artifactcache=...)``.
+            The cache hit rate is printed at the end of the run.
  
 
         Returns
@@ -2500,10 +3793,19 @@ class RadianceObj(SuperClass):
             'Wm2Front'     : list of front Wm-2 irradiances, len=sensorsy_back
             'Wm2Back'      : list of rear Wm-2 irradiances, len=sensorsy_back
             'backRatio'    : list of rear irradiance ratios, len=sensorsy_back
+            Hours grouped by clusterTrackerdict get the results of their 
+            representative hour scaled by 'clusterscale'.
+            'fieldWm2'     : with fieldscan, array of irradiances for
+                             (row, module, side, sensor)
         RadianceObj with new appended values: 
             'Wm2Front'     : np Array with front irradiance cumulative
             'Wm2Back'      : np Array with rear irradiance cumulative
             'backRatio'    : np Array with rear irradiance ratios
+            'fieldWm2'     : with fieldscan, array of irradiances for 
+                             (index, row, module, side, sensor), also
+                             saved in results/field_results_customname.npz
+            'fieldCoords'  : with fieldscan, dict with the coordinates
+                             'index', 'row', 'module', 'side', 'sensor'
         """
         
         import warnings
@@ -2522,6 +3824,9 @@ class RadianceObj(SuperClass):
         else:                   # run in single index mode.
             trackerkeys = [singleindex]
 
+        fieldkwargs = {'fieldscan':True, 'modWanted':modWanted, 
+                       'rowWanted':rowWanted, 'sensorsy':sensorsy, 
+                       'sensorsx':sensorsx}
         if modWanted == None:
             modWanted = round(trackerdict[trackerkeys[0]]['scene'].sceneDict['nMods'] / 1.99)
         if rowWanted == None:
@@ -2530,36 +3835,83 @@ class RadianceObj(SuperClass):
        
         frontWm2 = 0 # container for tracking front irradiance across module chord. Dynamically size based on first analysis run
         backWm2 = 0 # container for tracking rear irradiance across module chord.
-
-        for index in trackerkeys:   # either full list of trackerdict keys, or single index
-            name = '1axis_%s%s'%(index,customname)
-            octfile = trackerdict[index]['octfile']
-            scene = trackerdict[index]['scene']
-            if octfile is None:
-                continue  # don't run analysis if the octfile is none
-            try:  # look for missing data
-                analysis = AnalysisObj(octfile,name)
-                name = '1axis_%s%s'%(index,customname,)
-                frontscanind, backscanind = analysis.moduleAnalysis(scene=scene, modWanted=modWanted, 
-                                                rowWanted=rowWanted, 
-                                                sensorsy=sensorsy, 
-                                                sensorsx=sensorsx, 
-                                                modscanfront=modscanfront, modscanback=modscanback,
-                                                relative=relative, debug=debug)
-                analysis.analysis(octfile=octfile,name=name,frontscan=frontscanind,backscan=backscanind,accuracy=accuracy)                
-                trackerdict[index]['AnalysisObj'] = analysis
-            except Exception as e: # problem with file. TODO: only catch specific error types here.
-                warnings.warn('Index: {}. Problem with file. Error: {}. Skipping'.format(index,e), Warning)
-                return
+        ambstats = ambientCacheStats()
+        if artifactcache is None:
+            artifactcache = getattr(self, '_artifactcache', False)
+        artstats = dict(_ARTIFACT_STATS)
+
+        analysiskwargs = {'persistent':persistent, 'binary':binary,
+                          'ambientcache':ambientcache, 'tolerance':tolerance,
+                          'artifactcache':artifactcache}
+        scankwargs = {'modWanted':modWanted, 'rowWanted':rowWanted, 
+                      'sensorsy':sensorsy, 'sensorsx':sensorsx,
+                      'modscanfront':modscanfront, 'modscanback':modscanback,
+                      'relative':relative, 'debug':debug}
+        if fieldscan:
+            scankwargs = fieldkwargs
+        # don't run analysis if the octfile is none
+        runkeys = [index for index in trackerkeys 
+                   if trackerdict[index].get('octfile') is not None]
+        jobs = [(trackerdict[index]['octfile'], '1axis_%s%s'%(index,customname),
+                 trackerdict[index]['scene'], accuracy, analysiskwargs, 
+                 scankwargs) for index in runkeys]
+
+        def _removeScratch(index):
+            # temporary octree from makeOct1axis(scratchdir=...)
+            if trackerdict[index].pop('octscratch', False):
+                try:
+                    os.remove(trackerdict[index]['octfile'])
+                except OSError:
+                    pass
+
+        results = {}
+        if workers is not None and workers > 1 and len(jobs) > 1:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(_analysis1axisIndexProcess, *job):
+                           index for index, job in zip(runkeys, jobs)}
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        results[index], (ambdelta, artdelta) = future.result()
+                        for key in ambdelta:
+                            _AMBIENT_STATS[key] += ambdelta[key]
+                        for key in artdelta:
+                            _ARTIFACT_STATS[key] += artdelta[key]
+                    except Exception as e:
+                        results[index] = e
+                    finally:
+                        _removeScratch(index)
+        else:
+            for index, job in zip(runkeys, jobs):
+                try:  # look for missing data
+                    results[index] = _analysis1axisIndex(*job)
+                except Exception as e:
+                    results[index] = e
+                finally:
+                    _removeScratch(index)
+
+        # merge in key order so the cumulative sums don't depend on workers
+        failures = {}
+        for index in runkeys:
+            analysis = results[index]
+            if isinstance(analysis, Exception): # problem with file. TODO: only catch specific error types here.
+                warnings.warn('Index: {}. Problem with file. Error: {}. Skipping'.format(index,analysis), Warning)
+                failures[index] = analysis
+                continue
+            trackerdict[index]['AnalysisObj'] = analysis
 
             #combine cumulative front and back irradiance for each tracker angle
             try:  #on error, trackerdict[index] is returned empty
                 trackerdict[index]['Wm2Front'] = analysis.Wm2Front
                 trackerdict[index]['Wm2Back'] = analysis.Wm2Back
                 trackerdict[index]['backRatio'] = analysis.backRatio
+                if fieldscan:
+                    trackerdict[index]['fieldWm2'] = analysis.field['Wm2']
             except AttributeError as  e:  # no key Wm2Front.
                 warnings.warn('Index: {}. Trackerdict key not found: {}. Skipping'.format(index,e), Warning)
-                return
+                failures[index] = e
+                continue
 
             if np.sum(frontWm2) == 0:  # define frontWm2 the first time through
                 frontWm2 =  np.array(analysis.Wm2Front)
@@ -2570,6 +3922,33 @@ class RadianceObj(SuperClass):
             print('Index: {}. Wm2Front: {}. Wm2Back: {}'.format(index,
                   np.mean(analysis.Wm2Front), np.mean(analysis.Wm2Back)))
 
+        # clustered hours: scale the representative's results by GHI ratio
+        for index in trackerkeys:
+            rep = trackerdict[index].get('cluster', index)
+            if rep == index:
+                continue
+            if 'Wm2Front' not in trackerdict.get(rep, {}):
+                warnings.warn('Index: {}. Clustered with {}, which has no '
+                              'results. Analyze it first. Skipping'.format(
+                              index, rep), Warning)
+                continue
+            scale = trackerdict[index]['clusterscale']
+            trackerdict[index]['AnalysisObj'] = trackerdict[rep]['AnalysisObj']
+            trackerdict[index]['Wm2Front'] = list(np.array(trackerdict[rep]['Wm2Front'])*scale)
+            trackerdict[index]['Wm2Back'] = list(np.array(trackerdict[rep]['Wm2Back'])*scale)
+            trackerdict[index]['backRatio'] = trackerdict[rep]['backRatio']
+            if fieldscan:
+                trackerdict[index]['fieldWm2'] = trackerdict[rep]['fieldWm2']*scale
+            frontWm2 = frontWm2 + np.array(trackerdict[index]['Wm2Front'])
+            backWm2 = backWm2 + np.array(trackerdict[index]['Wm2Back'])
+
+        self.analysisFailures = failures
+        if failures:
+            print('analysis1axis: {} of {} indices failed: {}'.format(
+                len(failures), len(runkeys), list(failures)))
+        if failures and len(failures) == len(runkeys):
+            return trackerdict
+
         if np.sum(self.Wm2Front) == 0:
             self.Wm2Front = frontWm2   # these are accumulated over all indices passed in.
             self.Wm2Back = backWm2
@@ -2578,8 +3957,21 @@ class RadianceObj(SuperClass):
             self.Wm2Back += backWm2
         self.backRatio = np.mean(backWm2)/np.mean(frontWm2+.001)
 
+        if fieldscan:
+            fieldkeys = [index for index in trackerkeys 
+                         if 'fieldWm2' in trackerdict[index]]
+            field = trackerdict[fieldkeys[0]]['AnalysisObj'].field
+            self.fieldWm2 = np.stack([trackerdict[index]['fieldWm2'] 
+                                      for index in fieldkeys])
+            self.fieldCoords = {'index':fieldkeys, 'row':field['row'],
+                                'module':field['module'], 
+                                'side':field['side'], 'sensor':field['sensor']}
+            fieldfile = os.path.join('results', 'field_results_%s.npz'%(customname))
+            np.savez(fieldfile, Wm2=self.fieldWm2, **self.fieldCoords)
+            print('Saved: %s'%(fieldfile))
+
         # Save compiled results using _saveresults
-        if singleindex is None:
+        if singleindex is None and not fieldscan:
         
             print ("Saving a cumulative-results file in the main simulation folder." +
                    "This adds up by sensor location the irradiance over all hours " +
@@ -2640,6 +4032,371 @@ class RadianceObj(SuperClass):
                     cumanalysisobj._saveResultsCumulative(frontcum, rearcum, savefile=cumfilename)            
                 except:
                     print("Not able to save a cumulative result for this simulation.")
+        if ambientcache:
+            stats = ambientCacheStats()
+            hits = stats['hits'] - ambstats['hits']
+            total = hits + stats['misses'] - ambstats['misses']
+            if total:
+                print('Ambient cache: {} of {} rtrace runs reused an ambient '
+                      'file ({:.0%} hit rate)'.format(hits, total, hits/total))
+        if artifactcache:
+            hits = _ARTIFACT_STATS['hits'] - artstats['hits']
+            total = hits + _ARTIFACT_STATS['misses'] - artstats['misses']
+            if total:
+                print('Artifact cache: {} of {} scans read from the cache '
+                      '({:.0%} hit rate)'.format(hits, total, hits/total))
+        return trackerdict
+
+    def run1axis(self, trackerdict=None, module=None, sceneDict=None,
+                 metdata=None, accuracy='low', customname=None, 
+                 modWanted=None, rowWanted=None, sensorsy=9, sensorsx=1, 
+                 workers=2, queue=None, scratchdir=None, keepfiles=False,
+                 **kwargs):
+        """
+        Streaming version of gendaylit1axis, makeScene1axis, makeOct1axis 
+        and analysis1axis for the gendaylit workflow. Each trackerdict key 
+        goes through its own sky, scene, octree and rtrace, with at most
+        ``queue`` keys in flight, and its results are saved as soon as it is
+        done. Its sky (kept in memory), scene .rad file and octree are then
+        deleted, so disk and memory hold the intermediates of ``queue`` keys
+        instead of the whole run.
+
+        This is a generator, iterate over it to run the simulation::
+
+            for key, result in demo.run1axis(module='test-module', 
+                                             sceneDict=sceneDict):
+                print(key, np.mean(result['Wm2Front']))
+
+        Parameters
+        ----------
+        trackerdict
+            Timestamp trackerdict from set1axis(cumulativesky=False). 
+            Default self.trackerdict
+        module : str or ModuleObj
+            Default self.module
+        sceneDict : dict
+            As in makeScene1axis
+        metdata : MetObj
+            Default self.metdata
+        accuracy : str
+            'low', 'high' or 'adaptive', as in analysis1axis
+        customname : str
+            Added to the octree and results file names
+        modWanted, rowWanted, sensorsy, sensorsx :
+            Sensor position and density, as in analysis1axis
+        workers : int
+            Number of keys whose octree and rtrace run at the same time 
+            (threads, oconv and rtrace are subprocesses). Default 2
+        queue : int
+            Maximum number of keys in flight, including the ones waiting 
+            for a worker. Default 2*workers
+        scratchdir : str
+            Folder for the octrees, e.g. a node-local or tmpfs disk. 
+            Default the working directory.
+        keepfiles : bool
+            Keep the scene .rad files and octrees instead of deleting them.
+        kwargs
+            Passed to :py:class:`~bifacial_radiance.AnalysisObj` 
+            (persistent, binary, ambientcache, tolerance, artifactcache)
+
+        Yields
+        ------
+        key, trackerdict[key]
+            In the order keys finish, with the 'Wm2Front', 'Wm2Back', 
+            'backRatio' and 'AnalysisObj' of analysis1axis. Each one is also
+            appended to results/run1axis_<customname>.csv. Keys that fail 
+            are skipped and listed in self.analysisFailures. Once the 
+            generator is exhausted, self.Wm2Front and self.Wm2Back hold the
+            cumulative irradiance of all keys.
+        """
+        import warnings
+        from concurrent.futures import ThreadPoolExecutor, wait, \
+            FIRST_COMPLETED
+
+        if customname is None:
+            customname = ''
+        if trackerdict is None:
+            trackerdict = self.trackerdict
+        if metdata is None:
+            metdata = self.metdata
+        if module is None:
+            module = self.module
+        if queue is None:
+            queue = 2*workers
+        sceneDict, hubheight, simplefix = self._sceneDict1axis(dict(sceneDict))
+        if scratchdir is None:
+            scratchdir = ''
+        else:
+            os.makedirs(scratchdir, exist_ok=True)
+        timeindex = dict(zip(trackerdict, 
+                             metdata._trackerRows(trackerdict, trackerdict)))
+        analysiskwargs = {'artifactcache':getattr(self, '_artifactcache', 
+                                                  False)}
+        analysiskwargs.update(kwargs)
+        resultfile = os.path.join('results', 'run1axis_%s.csv'%(customname))
+        if os.path.exists(resultfile):
+            os.remove(resultfile)
+
+        def _prepare(key):
+            # sky and scene of one key, in the main thread
+            i = timeindex.get(key)
+            if i is None or not (metdata.ghi[i] > 0) or \
+                    np.isnan(metdata.tracker_theta[i]):
+                return None
+            skyfile = self.gendaylit(timeindex=i, metdata=metdata, 
+                                     inmemory=True)
+            if skyfile is None:
+                return None
+            trackerdict[key]['skyfile'] = skyfile
+            self._makeScene1axisKey(trackerdict[key], key, module, sceneDict,
+                                    hubheight, simplefix)
+            scene = trackerdict[key]['scene']
+            scankwargs = {'modWanted':modWanted, 'rowWanted':rowWanted,
+                          'sensorsy':sensorsy, 'sensorsx':sensorsx}
+            if modWanted is None:
+                scankwargs['modWanted'] = round(scene.sceneDict['nMods'] / 1.99)
+            if rowWanted is None:
+                scankwargs['rowWanted'] = round(scene.sceneDict['nRows'] / 1.99)
+            return (self.materialfiles + [skyfile, trackerdict[key]['radfile']],
+                    scene, scankwargs)
+
+        def _run(key, filelist, scene, scankwargs):
+            # octree and rtrace of one key, in a worker thread
+            name = '1axis_%s%s'%(key, customname)
+            octfile, _ = self._makeOct(filelist, os.path.join(scratchdir, name))
+            if octfile is None:
+                raise Exception('no octree made for {}'.format(key))
+            try:
+                return _analysis1axisIndex(octfile, name, scene, accuracy,
+                                           analysiskwargs, scankwargs)
+            finally:
+                if not keepfiles:
+                    os.remove(octfile)
+
+        failures = {}
+        donekeys = []
+        pending = {}
+        keys = iter(sorted(trackerdict))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                # top up the queue, then wait for the first key to finish
+                while len(pending) < queue:
+                    key = next(keys, None)
+                    if key is None:
+                        break
+                    job = _prepare(key)
+                    if job is not None:
+                        pending[executor.submit(_run, key, *job)] = key
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = pending.pop(future)
+                    self._skytext.pop(trackerdict[key]['skyfile'], None)
+                    if not keepfiles and os.path.isfile(trackerdict[key]['radfile']):
+                        os.remove(trackerdict[key]['radfile'])
+                    try:
+                        analysis = future.result()
+                        trackerdict[key]['AnalysisObj'] = analysis
+                        trackerdict[key]['Wm2Front'] = analysis.Wm2Front
+                        trackerdict[key]['Wm2Back'] = analysis.Wm2Back
+                        trackerdict[key]['backRatio'] = analysis.backRatio
+                    except Exception as e:
+                        warnings.warn('Index: {}. Problem with file. Error: {}.'
+                                      ' Skipping'.format(key, e), Warning)
+                        failures[key] = e
+                        continue
+                    row = pd.DataFrame.from_dict(
+                        {key:trackerdict[key]}, orient='index', 
+                        columns=['dhi', 'ghi', 'theta', 'surf_tilt', 'surf_azm',
+                                 'Wm2Front', 'Wm2Back', 'backRatio'])
+                    row.to_csv(resultfile, mode='a', 
+                               header=not os.path.exists(resultfile))
+                    print('Index: {}. Wm2Front: {}. Wm2Back: {}'.format(key,
+                          np.mean(analysis.Wm2Front), np.mean(analysis.Wm2Back)))
+                    donekeys.append(key)
+                    yield key, trackerdict[key]
+
+        self.analysisFailures = failures
+        donekeys = sorted(donekeys)
+        if donekeys:
+            self.Wm2Front = np.sum([trackerdict[key]['Wm2Front'] 
+                                    for key in donekeys], axis=0)
+            self.Wm2Back = np.sum([trackerdict[key]['Wm2Back'] 
+                                   for key in donekeys], axis=0)
+            self.backRatio = np.mean(self.Wm2Back)/np.mean(self.Wm2Front+.001)
+        print('run1axis: {} keys done, {} failed. Results in {}'.format(
+              len(donekeys), len(failures), resultfile))
+
+    def analysisDaylightMtx(self, trackerdict=None, scene=None, metdata=None,
+                            mf=1, sunpatch=True, accuracy='low', 
+                            angledelta=None, modWanted=None, rowWanted=None,
+                            sensorsy=9, sensorsx=1, customname=None):
+        """
+        Daylight coefficient (rcontrib) alternative to the hourly gendaylit
+        workflow (gendaylit1axis, makeOct1axis and analysis1axis). The sensors
+        are traced once per geometry with rcontrib to get the irradiance per 
+        unit radiance of each sky patch. The irradiance of each timestamp is 
+        then the product of these coefficients with the sky matrix of 
+        :py:func:`~bifacial_radiance.RadianceObj.genDaylightMtx`.
+
+        With sunpatch=True (default) the direct sun is not left spread over 
+        the sky patches: its direct contribution is replaced by a solar disc
+        at the exact solpos position of each timestamp, so shading of the 
+        direct beam is as sharp as with gendaylit. Reflected sunlight still
+        comes from the patches.
+
+        Parameters
+        ----------
+        trackerdict : dict
+            Tracker dictionary from set1axis(cumulativesky=False) and 
+            makeScene1axis. Timestamps are grouped by tracker angle 'theta' 
+            and each angle is traced only once. Default self.trackerdict
+        scene : SceneObj
+            For fixed tilt: scene from makeScene. All timestamps of metdata 
+            are calculated with it (and the other self.radfiles).
+        metdata : MetObj
+            Default self.metdata
+        mf : int
+            Reinhart sky subdivision. 1 (default) for 145 patches, 2 or 4 
+            for finer skies.
+        sunpatch : bool
+            Use the direct sun treatment described above. Default True
+        accuracy : str
+            'low' or 'high' rcontrib settings
+        angledelta : float
+            Round the tracker angles to this increment (degrees) so more
+            timestamps share a geometry. The scene of the timestamp closest 
+            to the rounded angle is used. Default None (exact angles).
+        modWanted, rowWanted, sensorsy, sensorsx :
+            Sensor position and density, as in analysis1axis
+        customname : str
+            Added to the names of the octrees and results file
+
+        Returns
+        -------
+        trackerdict with 'Wm2Front', 'Wm2Back' and 'backRatio' for each 
+        timestamp, or for fixed tilt a DataFrame with those columns indexed 
+        by timestamp. self.Wm2Front and self.Wm2Back get the cumulative
+        irradiance of each sensor, like in analysis1axis. The results are 
+        also saved in results/DaylightMtx_results<customname>.csv
+        """
+        import warnings
+
+        if customname is None:
+            customname = ''
+        if metdata is None:
+            metdata = self.metdata
+        daylightmtx = self.genDaylightMtx(metdata, mf=mf, 
+                                          savefile=self.name+customname)
+
+        # group timestamps by geometry: (name, scene, radfiles, keys)
+        groups = []
+        if scene is not None:
+            timeindex = metdata._keyRows()
+            groups.append(('fixed', scene, list(self.radfiles), 
+                           sorted(timeindex)))
+        else:
+            if trackerdict is None:
+                trackerdict = self.trackerdict
+            timeindex = dict(zip(trackerdict, 
+                                 metdata._trackerRows(trackerdict, 
+                                                      trackerdict)))
+            thetas = {}
+            for key in sorted(trackerdict):
+                if timeindex[key] is None:
+                    warnings.warn('Index: {}. Not a timestamp of metdata. '
+                                  'Skipping'.format(key), Warning)
+                    continue
+                theta = trackerdict[key]['theta']
+                if angledelta:
+                    theta = angledelta * round(theta / angledelta) + 0
+                thetas.setdefault(theta, []).append(key)
+            for theta in sorted(thetas):
+                keys = thetas[theta]
+                closest = min(keys, key=lambda k: 
+                              abs(trackerdict[k]['theta'] - theta))
+                groups.append(('%s' % (theta), trackerdict[closest]['scene'],
+                               [trackerdict[closest]['radfile']], keys))
+        if not groups:
+            raise ValueError('analysisDaylightMtx needs a fixed tilt scene or '
+                             'a timestamp trackerdict from '
+                             'set1axis(cumulativesky=False)')
+
+        sunomega = 2*np.pi*(1-np.cos(np.radians(0.533/2)))  # solar disc
+        analysis = AnalysisObj()
+        results = {}
+        for name, groupscene, radfiles, keys in groups:
+            print('Daylight coefficients for {}: {} timestamps'.format(
+                  name, len(keys)))
+            hours = [timeindex[key] for key in keys]
+            octname = 'DaylightMtx_%s%s' % (name, customname)
+            # solar discs only for the timestamps with the sun up
+            sunhours = np.flatnonzero((daylightmtx['sunalt'][hours] > 0) &
+                                      (daylightmtx['dni'][hours] > 0))
+            if sunpatch and len(sunhours):
+                octfile, sunoctfile, sunmodfile = self._makeOctDaylightMtx(
+                    radfiles, octname, daylightmtx['sunalt'][hours][sunhours], 
+                    daylightmtx['sunaz'][hours][sunhours])
+            else:
+                octfile, sunoctfile, sunmodfile = self._makeOctDaylightMtx(
+                    radfiles, octname)
+            frontscan, backscan = analysis.moduleAnalysis(scene=groupscene,
+                                                    modWanted=modWanted, 
+                                                    rowWanted=rowWanted, 
+                                                    sensorsy=sensorsy, 
+                                                    sensorsx=sensorsx)
+            dclist = analysis.daylightCoefficients(octfile, 
+                                                   [frontscan, backscan],
+                                                   mf=mf, accuracy=accuracy,
+                                                   sunoctfile=sunoctfile,
+                                                   sunmodfile=sunmodfile)
+            for side, dc in zip(['Wm2Front', 'Wm2Back'], dclist):
+                irr = np.einsum('spc,phc->hsc', dc['sky'], 
+                                daylightmtx['sky'][:, hours])
+                if sunpatch:
+                    irr -= np.einsum('spc,phc->hsc', dc['skydirect'], 
+                                     daylightmtx['skysun'][:, hours])
+                if sunpatch and len(sunhours):
+                    # one solar disc per sun-up timestamp, radiance DNI / 
+                    # solid angle, scattered back to its timestamp
+                    dni = daylightmtx['dni'][hours][sunhours]
+                    irr[sunhours] += (dc['sun'].transpose(1, 0, 2) * 
+                                      (dni / sunomega)[:, None, None])
+                irr = np.maximum(irr, 0).mean(axis=2)
+                for key, row in zip(keys, irr):
+                    results.setdefault(key, {})[side] = list(row)
+
+        frontWm2 = 0 
+        backWm2 = 0
+        for key in sorted(results):
+            front = np.array(results[key]['Wm2Front'])
+            back = np.array(results[key]['Wm2Back'])
+            if len(front) == len(back):
+                results[key]['backRatio'] = list(back / (front+.001))
+            else:
+                results[key]['backRatio'] = None
+            frontWm2 = frontWm2 + front
+            backWm2 = backWm2 + back
+            if trackerdict is not None and scene is None:
+                trackerdict[key].update(results[key])
+
+        if np.sum(self.Wm2Front) == 0:
+            self.Wm2Front = frontWm2   # these are accumulated over all timestamps
+            self.Wm2Back = backWm2
+        else:
+            self.Wm2Front += frontWm2 
+            self.Wm2Back += backWm2
+        self.backRatio = np.mean(backWm2)/np.mean(frontWm2+.001)
+
+        resultsDF = pd.DataFrame.from_dict(results, orient='index')
+        savefile = os.path.join('results', 
+                                'DaylightMtx_results%s.csv' % (customname))
+        resultsDF.to_csv(savefile)
+        print('Saved: %s' % (savefile))
+
+        if scene is not None:
+            return resultsDF
         return trackerdict
 
 
@@ -2891,7 +4648,8 @@ class SceneObj(SuperClass):
         else:
             self.name = name
 
-    def _makeSceneNxR(self, modulename=None, sceneDict=None, radname=None, addhubheight=False):
+    def _makeSceneNxR(self, modulename=None, sceneDict=None, radname=None, addhubheight=False,
+                      expandmodule=False, instance=False, materialfiles=None):
         """
         Arrange module defined in :py:class:`bifacial_radiance.SceneObj` into a N x R array.
         Returns a :py:class:`bifacial_radiance.SceneObj` which contains details 
@@ -2928,6 +4686,16 @@ class SceneObj(SuperClass):
         addhubheight : Bool, default False
             Add hubheight back to the sceneDict since it was stripped out 
             by makeScene1axis
+        expandmodule : Bool, default False
+            Reference the module expanded to static primitives (see 
+            ModuleObj._expandModule) instead of the module file with 
+            genbox / genrev commands.
+        instance : Bool, default False
+            Place a frozen octree of the module (see 
+            ModuleObj._instanceOctree) with one Radiance `instance` per 
+            module instead of copying its geometry with xform -a. 
+        materialfiles : list
+            Material files compiled into the module octree with instance.
 
 
         Returns
@@ -3018,22 +4786,6 @@ class SceneObj(SuperClass):
 
 
 
-        ''' INITIALIZE VARIABLES '''
-        text = '!xform '
-
-        text += '-rx %s -t %s %s %s ' %(tilt, 0, 0, hubheight)
-        
-        # create nMods-element array along x, nRows along y. 1cm module gap.
-        text += '-a %s -t %s 0 0 -a %s -t 0 %s 0 ' %(nMods, self.module.scenex, nRows, pitch)
-
-        # azimuth rotation of the entire shebang. Select the row to scan here based on y-translation.
-        # Modifying so center row is centered in the array. (i.e. 3 rows, row 2. 4 rows, row 2 too)
-        # Since the array is already centered on row 1, module 1, we need to increment by Nrows/2-1 and Nmods/2-1
-
-        text += (f'-i 1 -t {-self.module.scenex*(round(nMods/1.999)*1.0-1)} '
-                 f'{-pitch*(round(nRows / 1.999)*1.0-1)} 0 -rz {180-azimuth} '
-                 f'-t {originx} {originy} 0 ' )
-        
         #axis tilt only working for N-S trackers
         if axis_tilt != 0 and azimuth == 90:  
             print("Axis_Tilt is still under development. The scene will be "
@@ -3041,21 +4793,26 @@ class SceneObj(SuperClass):
                   "will consider the axis_tilt, but the sensors for the "
                   "analysis might not fall in the correct surfaces unless you"
                   " manually position them for this version. Sorry! :D ")
-                  
-            text += (f'-rx {axis_tilt} -t 0 0 %s ' %(
-                self.module.scenex*(round(nMods/1.99)*1.0-1)*np.sin(
-                        axis_tilt * np.pi/180) ) )
 
         filename = (f'{radname}_C_{title_clearance_height:0.2f}_rtr_{pitch:0.2f}_tilt_{tilt:0.0f}_'
                     f'{nMods}modsx{nRows}rows_origin{originx},{originy}.rad' )
         
+        if expandmodule:
+            modulefile = self.module._expandModule()
+        else:
+            modulefile = self.modulefile
+        if instance:
+            modulefile = self.module._instanceOctree(materialfiles)
         if self.hpc:
-            text += f'"{os.path.join(os.getcwd(), self.modulefile)}"'
+            modulefile = os.path.join(os.getcwd(), modulefile)
             radfile = os.path.join(os.getcwd(), 'objects', filename)
         else:
-            text += f'"{os.path.join(self.modulefile)}"'
             radfile = os.path.join('objects',filename)
 
+        text, layout = self._arrayText(tilt, hubheight, azimuth, pitch, nMods,
+                                       nRows, originx, originy, axis_tilt, 
+                                       modulefile, modulename, instance)
+
         # py2 and 3 compatible: binary write, encode text first
         with open(radfile, 'wb') as f:
             f.write(text.encode('ascii'))
@@ -3064,10 +4821,182 @@ class SceneObj(SuperClass):
         self.text = text
         self.radfiles = radfile
         self.sceneDict = sceneDict
+        # array transform of each module copy, used by cullScene
+        self._layout = layout
 #        self.hub_height = hubheight
         return radfile
+
+    def _arrayText(self, tilt, hubheight, azimuth, pitch, nMods, nRows, 
+                   originx, originy, axis_tilt, modulefile, modulename, 
+                   instance=False):
+        # Radiance text of the nMods x nRows array of the module, and the 
+        # transform of each module copy (used by cullScene). Shared by 
+        # _makeSceneNxR and the batch mode of makeScene1axis.
+
+        ''' INITIALIZE VARIABLES '''
+        text = '!xform '
+
+        text += '-rx %s -t %s %s %s ' %(tilt, 0, 0, hubheight)
+        
+        # create nMods-element array along x, nRows along y. 1cm module gap.
+        text += '-a %s -t %s 0 0 -a %s -t 0 %s 0 ' %(nMods, self.module.scenex, nRows, pitch)
+
+        # azimuth rotation of the entire shebang. Select the row to scan here based on y-translation.
+        # Modifying so center row is centered in the array. (i.e. 3 rows, row 2. 4 rows, row 2 too)
+        # Since the array is already centered on row 1, module 1, we need to increment by Nrows/2-1 and Nmods/2-1
+
+        xshift = -self.module.scenex*(round(nMods/1.999)*1.0-1)
+        yshift = -pitch*(round(nRows / 1.999)*1.0-1)
+        rotatetext = f'-rz {180-azimuth} -t {originx} {originy} 0 '
+        text += f'-i 1 -t {xshift} {yshift} 0 ' + rotatetext
+        
+        #axis tilt only working for N-S trackers
+        if axis_tilt != 0 and azimuth == 90:  
+            axistext = (f'-rx {axis_tilt} -t 0 0 %s ' %(
+                self.module.scenex*(round(nMods/1.99)*1.0-1)*np.sin(
+                        axis_tilt * np.pi/180) ) )
+            text += axistext
+            rotatetext += axistext
+
+        if instance:
+            # one instance of the module octree per module, with the same
+            # transform that the xform array above gives to that copy
+            text = ''
+            tilttext = '-rx %s -t %s %s %s ' %(tilt, 0, 0, hubheight)
+            for irow in range(nRows):
+                for imod in range(nMods):
+                    args = (f'{modulefile} {tilttext}-t '
+                            f'{imod*self.module.scenex + xshift} '
+                            f'{irow*pitch + yshift} 0 {rotatetext}').split()
+                    text += (f'\nvoid instance {modulename}.{imod}.{irow}\n'
+                             f'{len(args)} {" ".join(args)}\n0\n0\n')
+        else:
+            text += f'"{os.path.join(modulefile)}"'
+
+        layout = {'tilttext':'-rx %s -t %s %s %s ' %(tilt, 0, 0, hubheight),
+                  'xshift':xshift, 'yshift':yshift, 'pitch':pitch,
+                  'rotatetext':rotatetext, 'modulefile':modulefile,
+                  'modulename':modulename, 'instance':instance}
+        return text, layout
     
    
+    def cullScene(self, modWanted=None, rowWanted=None, radius=20, 
+                  proxy=True):
+        """
+        Write an analysis-specific copy of the scene that keeps only the 
+        modules within `radius` of the sampled module. Far modules are 
+        replaced by one low-detail box per row segment (proxy=True) or left
+        out. The kept modules are at the same positions as in the full 
+        scene, so the sensors of 
+        :py:class:`~bifacial_radiance.AnalysisObj.moduleAnalysis` on this 
+        SceneObj still apply.
+
+        The modules are parallel, so the cosine at both ends of any ray 
+        between the sampled module and a culled one is at most 
+        |dy| sin(tilt) / d, with dy the row offset and d the smallest 
+        distance between the two modules. The view factor of the culled 
+        modules is then at most the sum of A cos^2 / (pi d^2), with A the 
+        module area, ignoring the occlusion by the kept modules. This 
+        bounds the share of a sensor's irradiance that the culled modules
+        can block or reflect (not the shadows they cast on the ground). It
+        is kept in self.cullReport['viewfactor'] and printed.
+
+        Parameters
+        ----------
+        modWanted : int
+            Sampled module, counted from 1. Default: center of the row, as 
+            in moduleAnalysis
+        rowWanted : int
+            Sampled row, counted from 1. Default: center row
+        radius : numeric
+            Distance (meters) between module centers, in the plane of the 
+            array, under which modules are kept. Default 20.
+        proxy : bool
+            Replace the culled modules by a box of the module material per 
+            row segment (True), or leave them out (False).
+
+        Returns
+        -------
+        radfile : str
+            Filename of the culled .rad scene in /objects/
+        """
+        layout = self._layout
+        nMods = self.sceneDict['nMods']
+        nRows = self.sceneDict['nRows']
+        if modWanted is None:
+            modWanted = round(nMods / 1.99)
+        if rowWanted is None:
+            rowWanted = round(nRows / 1.99)
+        scenex = self.module.scenex
+        sceney = self.module.sceney
+        pitch = layout['pitch']
+        tilttext = layout['tilttext']
+        rotatetext = layout['rotatetext']
+
+        dx = (np.arange(nMods) - (modWanted-1)) * scenex
+        dy = (np.arange(nRows) - (rowWanted-1)) * pitch
+        dist = np.hypot(dx[None, :], dy[:, None])  # (row, module)
+        keep = dist <= radius
+
+        text = ''
+        for irow in range(nRows):
+            mods = np.flatnonzero(keep[irow])
+            y = irow*pitch + layout['yshift']
+            if len(mods):
+                m0, m1 = mods[0], mods[-1]
+                x = m0*scenex + layout['xshift']
+                if layout['instance']:
+                    for imod in range(m0, m1+1):
+                        args = (f"{layout['modulefile']} {tilttext}-t "
+                                f"{imod*scenex + layout['xshift']} {y} 0 "
+                                f"{rotatetext}").split()
+                        text += (f"\nvoid instance {layout['modulename']}."
+                                 f"{imod}.{irow}\n{len(args)} "
+                                 f"{' '.join(args)}\n0\n0\n")
+                else:
+                    text += (f'!xform {tilttext}-a {m1-m0+1} -t {scenex} 0 0 '
+                             f'-i 1 -t {x} {y} 0 {rotatetext}'
+                             f'"{layout["modulefile"]}"\n')
+                segments = [(0, m0-1), (m1+1, nMods-1)]
+            else:
+                segments = [(0, nMods-1)]
+            if not proxy:
+                continue
+            for s0, s1 in segments:
+                if s1 < s0:
+                    continue
+                length = (s1-s0)*scenex + self.module.x
+                text += (f'!genbox {self.module.modulematerial} '
+                         f'{self.module.name}_proxy.{s0}.{irow} {length} '
+                         f'{sceney} {self.module.z} | xform -t '
+                         f'{-self.module.x/2.0} {-sceney/2.0} '
+                         f'{self.module.offsetfromaxis} {tilttext}-t '
+                         f'{s0*scenex + layout["xshift"]} {y} 0 '
+                         f'{rotatetext}\n')
+
+        # view factor bound of the culled modules from the sampled module
+        area = self.module.x * sceney
+        gap = np.maximum(dist - np.hypot(scenex, sceney), 1e-6)
+        sintilt = abs(np.sin(np.radians(self.sceneDict['tilt'])))
+        cosine = np.minimum(np.abs(dy)[:, None] * sintilt / gap, 1)
+        viewfactor = min(float(np.sum((area * cosine**2 / 
+                                       (np.pi * gap**2))[~keep])), 1.0)
+        self.cullReport = {'radius':radius, 'modWanted':modWanted, 
+                           'rowWanted':rowWanted, 'proxy':proxy,
+                           'modules':int(keep.sum()), 
+                           'culled':int((~keep).sum()), 
+                           'viewfactor':viewfactor}
+        print('Culled scene: {} of {} modules kept within {} m, view factor '
+              'of the culled modules <= {:0.4f}'.format(
+                  keep.sum(), keep.size, radius, viewfactor))
+
+        radfile = '%s_cull%s_%s_r%s%s.rad' % (
+            os.path.splitext(self.radfiles)[0], modWanted, rowWanted, radius,
+            '_proxy' if proxy else '')
+        with open(radfile, 'wb') as f:
+            f.write(text.encode('ascii'))
+        return radfile
+
     def showScene(self):
         """ 
         Method to call objview on the scene included in self
@@ -3138,7 +5067,186 @@ class SceneObj(SuperClass):
 # end of SceneObj
 
 
+class _SceneBatch(object):
+    # Scene parameters written by the batch mode of makeScene1axis, as 
+    # arrays with one entry per distinct tracker geometry. _SceneRecord views
+    # index into it, and the full SceneObj of an entry is only built when 
+    # one of its attributes is used.
+
+    def __init__(self, module, sceneDict, tilt, azimuth, clearance, 
+                 hubheight, radfiles, pitch, modulefile, instance):
+        self.module = module
+        self.sceneDict = sceneDict
+        self.tilt = tilt
+        self.azimuth = azimuth
+        self.clearance = clearance
+        self.hubheight = hubheight
+        self.radfiles = radfiles
+        self.pitch = pitch
+        self.modulefile = modulefile
+        self.instance = instance
+        self.scenes = {}   # materialized SceneObj of each entry
+
+    def text(self, scene, i):
+        sceneDict = self.sceneDict
+        return scene._arrayText(self.tilt[i], self.hubheight[i], 
+                                self.azimuth[i], self.pitch, 
+                                sceneDict['nMods'], sceneDict['nRows'],
+                                sceneDict['originx'], sceneDict['originy'],
+                                sceneDict['axis_tilt'], self.modulefile, 
+                                self.module.name, self.instance)
+
+    def scene(self, i):
+        if i not in self.scenes:
+            scene = SceneObj(self.module)
+            sceneDict = dict(self.sceneDict)
+            sceneDict.update({'tilt':self.tilt[i], 
+                              'clearance_height':self.clearance[i],
+                              'azimuth':self.azimuth[i], 
+                              'modulez':self.module.z,
+                              'hub_height':np.round(self.hubheight[i], 3)})
+            scene.text, scene._layout = self.text(scene, i)
+            scene.gcr = self.module.sceney / self.pitch
+            scene.radfiles = self.radfiles[i]
+            scene.sceneDict = sceneDict
+            self.scenes[i] = scene
+        return self.scenes[i]
+
+
+class _SceneRecord(object):
+    """
+    Compact stand-in for the SceneObj of a trackerdict entry, made by 
+    makeScene1axis(batch=True). Attribute access builds the SceneObj of 
+    the record once and forwards to it, so it can be used like a SceneObj.
+    """
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+
+    def _scene(self):
+        return self._batch.scene(self._index)
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        return getattr(self._scene(), attr)
+
+    def __setattr__(self, attr, value):
+        if attr in _SceneRecord.__slots__:
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self._scene(), attr, value)
+
+    def __reduce__(self):
+        # pickled (e.g. for analysis1axis workers) as the full SceneObj
+        import copy
+        return (copy.copy, (self._scene(),))
+
+    def __repr__(self):
+        batch = self._batch
+        return "<SceneObj record: tilt %s, azimuth %s, clearance_height %s, %s>" % (
+            batch.tilt[self._index], batch.azimuth[self._index], 
+            batch.clearance[self._index], batch.radfiles[self._index])
+
+
         
+def _sunRiseSetTransit(datetimetz, lat, lon):
+    """
+    pvlib sun_rise_set_transit_spa for tz-aware datetimetz, calculated once
+    per local date and broadcast to all its timestamps. The result only
+    depends on the date, so it is the same DataFrame as calling pvlib on
+    every timestamp.
+    """
+    import pvlib
+    days = datetimetz.normalize().asi8
+    _, first, inverse = np.unique(days, return_index=True, return_inverse=True)
+    sunup = pvlib.irradiance.solarposition.sun_rise_set_transit_spa(
+        datetimetz[first], lat, lon) #new for pvlib >= 0.6.1
+    sunup = sunup.take(inverse)
+    sunup.index = datetimetz
+    return sunup
+
+# pvlib get_solarposition methods accepted by MetObj(solposmethod=...)
+SOLPOS_METHODS = ['nrel_numpy', 'nrel_numba', 'ephemeris', 'pyephem']
+SOLPOS_CACHE_MAXROWS = 2e6  # timestamps kept over all solar position tables
+_SOLPOS_TABLES = {}  # {(lat, lon, elev, method): solpos by UTC ns}, LRU order
+_SOLPOS_STATS = {'hits': 0, 'misses': 0}
+_SOLPOS_LOCK = threading.Lock()
+
+def _solarPosition(times, lat, lon, elev, method='nrel_numpy'):
+    """
+    pvlib get_solarposition of the tz-aware times with the given method,
+    through a table per site and method shared by all MetObj of this
+    process. Timestamps already in the table (another weather file of the
+    same site, the same file with other start / end times...) are sliced
+    from it and only the others are calculated. Same DataFrame as calling
+    get_solarposition directly.
+    """
+    import pvlib
+    if method not in SOLPOS_METHODS:
+        raise ValueError('Invalid solposmethod %s. Valid options: %s'
+                         % (method, ', '.join(SOLPOS_METHODS)))
+    times = pd.DatetimeIndex(times)
+    ns = times.asi8
+    key = (float(lat), float(lon), float(elev), method)
+    with _SOLPOS_LOCK:
+        table = _SOLPOS_TABLES.pop(key, None)
+        if table is None:
+            missing = np.unique(ns)
+        else:
+            missing = np.setdiff1d(ns, table.index.values)
+        if len(missing):
+            utctimes = pd.DatetimeIndex(missing.view('M8[ns]')).tz_localize('UTC')
+            new = pvlib.solarposition.get_solarposition(utctimes, lat, lon,
+                                                        elev, method=method)
+            new.index = missing
+            table = new if table is None else pd.concat([table, new]).sort_index()
+        _SOLPOS_STATS['misses'] += len(missing)
+        _SOLPOS_STATS['hits'] += len(ns) - len(missing)
+        _SOLPOS_TABLES[key] = table
+        # drop the least recently used sites over SOLPOS_CACHE_MAXROWS
+        while len(_SOLPOS_TABLES) > 1 and \
+                sum(map(len, _SOLPOS_TABLES.values())) > SOLPOS_CACHE_MAXROWS:
+            del _SOLPOS_TABLES[next(iter(_SOLPOS_TABLES))]
+    solpos = table.iloc[np.searchsorted(table.index.values, ns)]
+    solpos.index = times
+    return solpos
+
+def solposCacheStats(reset=False, clear=False):
+    """
+    Hits and misses of the solar position tables shared by all
+    :py:class:`~bifacial_radiance.MetObj`, counted in timestamps. A hit is
+    a timestamp whose solar position was already calculated for the same
+    site (latitude, longitude, elevation) and ``solposmethod``.
+
+    Parameters
+    ----------
+    reset : bool
+        Set the counters back to zero after reading them.
+    clear : bool
+        Also empty the tables to free their memory.
+
+    Returns
+    -------
+    stats : dict
+        Keys 'hits', 'misses', 'hitrate' (hits / total, None if no
+        timestamps), 'sites' (number of tables) and 'rows' (timestamps kept)
+    """
+    with _SOLPOS_LOCK:
+        stats = dict(_SOLPOS_STATS)
+        total = stats['hits'] + stats['misses']
+        stats['hitrate'] = stats['hits'] / total if total else None
+        stats['sites'] = len(_SOLPOS_TABLES)
+        stats['rows'] = sum(map(len, _SOLPOS_TABLES.values()))
+        if reset:
+            _SOLPOS_STATS['hits'] = 0
+            _SOLPOS_STATS['misses'] = 0
+        if clear:
+            _SOLPOS_TABLES.clear()
+    return stats
+
 class MetObj(SuperClass):
     """
     Meteorological data from EPW file.
@@ -3161,6 +5269,17 @@ class MetObj(SuperClass):
         example, TMY3 data is right-labeled, so 11 AM data represents data from
         10 to 11, and sun position should be calculated at 10:30 AM.  Currently
         SAM and PVSyst use left-labeled interval data and NSRDB uses centered.
+    solposmethod : str
+        pvlib ``get_solarposition`` method for ``MetObj.solpos``: 
+        'nrel_numpy' (SPA, default), 'nrel_numba' (SPA compiled with numba, 
+        falls back to 'nrel_numpy' if numba is not installed), 'ephemeris'
+        (about 8 times faster. With the sun up, zenith and elevation are
+        within 0.02 degrees of SPA and azimuth within 0.02 / sin(zenith)
+        degrees. Apparent zenith differs by up to 0.35 degrees at the
+        horizon, where the refraction models differ) or 'pyephem' (needs
+        ephem). Solar positions are kept in a table per site and method and
+        reused by later MetObj, see 
+        :py:func:`~bifacial_radiance.main.solposCacheStats`.
 
     """
     @property
@@ -3187,7 +5306,8 @@ class MetObj(SuperClass):
         return f"<class 'bifacial_radiance.main.MetObj'>.metadata:\n"\
             f"{self.metadata}\n<class 'bifacial_radiance.main.MetObj'>.tmydata:\n {tmyinfo}\n"
 
-    def __init__(self, tmydata, metadata, label = 'right'):
+    def __init__(self, tmydata, metadata, label = 'right', 
+                 solposmethod='nrel_numpy'):
 
         import pytz
         import pvlib
@@ -3209,6 +5329,10 @@ class MetObj(SuperClass):
             self.city = metadata['city'] # pvlib version
         #self.location.state_province_region = metadata['State'] # unecessary
         self.datetime = tmydata.index.tolist() # this is tz-aware.
+        # the same time axis as a DatetimeIndex. Trackerdict keys are looked
+        # up in _keyRows() instead of searching the self.datetime list.
+        self.datetimeindex = pd.DatetimeIndex(tmydata.index)
+        self._keyrows = None
         self.ghi = np.array(tmydata.GHI)
         self.dhi = np.array(tmydata.DHI)
         self.dni = np.array(tmydata.DNI)
@@ -3258,7 +5382,7 @@ class MetObj(SuperClass):
             
             
         #v0.2.5: initialize MetObj with solpos, sunrise/set and corrected time
-        datetimetz = pd.DatetimeIndex(self.datetime)
+        datetimetz = self.datetimeindex  # not rebuilt from the datetime list
         try:  # make sure the data is tz-localized.
             datetimetz = datetimetz.tz_localize(pytz.FixedOffset(self.timezone*60))#  use pytz.FixedOffset (in minutes)
         except TypeError:  # data is tz-localized already. Just put it in local time.
@@ -3271,9 +5395,9 @@ class MetObj(SuperClass):
             print ("WARNING: TMY interval was unable to be defined, so setting it to 1h.")
         # TODO:  Refactor this into a subfunction. first calculate minutedelta 
         # based on label and interval (-30, 0, +30, +7.5 etc) then correct all.        
+        sunup = _sunRiseSetTransit(datetimetz, lat, lon)
         if label.lower() == 'center':
             print("Calculating Sun position for center labeled data, at exact timestamp in input Weather File")
-            sunup= pvlib.irradiance.solarposition.sun_rise_set_transit_spa(datetimetz, lat, lon) #new for pvlib >= 0.6.1
             sunup['corrected_timestamp'] = datetimetz
         else:
             if interval== pd.Timedelta('1h'):
@@ -3281,7 +5405,6 @@ class MetObj(SuperClass):
                 if label.lower() == 'right':
                     print("Calculating Sun position for Metdata that is right-labeled ", 
                           "with a delta of -30 mins. i.e. 12 is 11:30 sunpos")
-                    sunup= pvlib.irradiance.solarposition.sun_rise_set_transit_spa(datetimetz, lat, lon) #new for pvlib >= 0.6.1
                     sunup['minutedelta']= int(interval.seconds/2/60) # default sun angle 30 minutes before timestamp
                     # vector update of minutedelta at sunrise
                     sunrisemask = sunup.index.hour-1==sunup['sunrise'].dt.hour
@@ -3295,7 +5418,6 @@ class MetObj(SuperClass):
                 elif label.lower() == 'left':        
                     print("Calculating Sun position for Metdata that is left-labeled ",
                           "with a delta of +30 mins. i.e. 12 is 12:30 sunpos.")
-                    sunup= pvlib.irradiance.solarposition.sun_rise_set_transit_spa(datetimetz, lat, lon) 
                     sunup['minutedelta']= int(interval.seconds/2/60) # default sun angle 30 minutes after timestamp
                     # vector update of minutedelta at sunrise
                     sunrisemask = sunup.index.hour==sunup['sunrise'].dt.hour
@@ -3314,10 +5436,10 @@ class MetObj(SuperClass):
                       "readWeatherFile( label='center').")
                 #datetimetz=datetimetz-pd.Timedelta(minutes = minutedelta)   # This doesn't check for Sunrise or Sunset
                 #sunup= pvlib.irradiance.solarposition.get_sun_rise_set_transit(datetimetz, lat, lon) # deprecated in pvlib 0.6.1
-                sunup= pvlib.irradiance.solarposition.sun_rise_set_transit_spa(datetimetz, lat, lon) #new for pvlib >= 0.6.1
                 sunup['corrected_timestamp'] = sunup.index-pd.Timedelta(minutes = minutedelta)
     
-        self.solpos = pvlib.irradiance.solarposition.get_solarposition(sunup['corrected_timestamp'],lat,lon,elev)
+        self.solpos = _solarPosition(sunup['corrected_timestamp'], lat, lon, 
+                                     elev, method=solposmethod)
         self.sunrisesetdata=sunup
         self.label = label
 
@@ -3415,13 +5537,14 @@ class MetObj(SuperClass):
             # trackerdict uses timestamp as keys. return azimuth
             # and tilt for each timestamp
             #times = [str(i)[5:-12].replace('-','_').replace(' ','_') for i in self.datetime]
-            times = [i.strftime('%Y-%m-%d_%H%M') for i in self.datetime]
+            times = self._keyRows()
             #trackerdict = dict.fromkeys(times)
             trackerdict = {}
-            for i,time in enumerate(times) :
+            for time, i in times.items():
                 # remove NaN tracker theta from trackerdict
                 if (self.ghi[i] > 0) & (~np.isnan(self.tracker_theta[i])):
                     trackerdict[time] = {
+                                        'timeindex':i,
                                         'surf_azm':self.surface_azimuth[i],
                                         'surf_tilt':self.surface_tilt[i],
                                         'theta':self.tracker_theta[i],
@@ -3435,6 +5558,35 @@ class MetObj(SuperClass):
         return trackerdict
 
 
+    def _keyRows(self):
+        # {trackerdict key ('%Y-%m-%d_%H%M') : row of the time axis}, built 
+        # once from self.datetimeindex. A duplicated key maps to its first
+        # row, as the former list.index() lookup did.
+        if getattr(self, '_keyrows', None) is None:
+            keys = pd.Index(self.datetimeindex.strftime('%Y-%m-%d_%H%M'))
+            first = np.flatnonzero(~keys.duplicated(keep='first'))
+            self._keyrows = dict(zip(keys[first], first.tolist()))
+        return self._keyrows
+
+    def _trackerRows(self, trackerdict, keys):
+        # rows of the time axis for the trackerdict keys (None if the key is
+        # not a timestamp of this MetObj). The 'timeindex' stored by set1axis
+        # is only a hint: the trackerdict may come from another MetObj, so
+        # it is used when that row of this time axis is the same key, 
+        # otherwise the key is looked up in _keyRows().
+        rows = []
+        keyrows = None
+        n = len(self.datetimeindex)
+        for key in keys:
+            i = trackerdict[key].get('timeindex')
+            if i is None or not 0 <= i < n or \
+                    self.datetimeindex[i].strftime('%Y-%m-%d_%H%M') != key:
+                if keyrows is None:
+                    keyrows = self._keyRows()
+                i = keyrows.get(key)
+            rows.append(i)
+        return rows
+
     def _getTrackingAngles(self, azimuth=180, limit_angle=45,
                            angledelta=None, axis_tilt=0, backtrack=True,
                            gcr = 1.0/3.0, fixed_tilt_angle=None,
@@ -3569,54 +5721,61 @@ class MetObj(SuperClass):
                   *csvfile:  name of csv met data file saved in /EPWs/
         '''
 
-        dt = pd.to_datetime(self.datetime)
-
-        trackerdict = dict.fromkeys(theta_list)
-
-        for theta in sorted(trackerdict):  
-            trackerdict[theta] = {}
-            csvfile = os.path.join('EPWs', '1axis_{}.csv'.format(theta))
-            tempdata = trackingdata[trackingdata['theta_round'] == theta]
+        from concurrent.futures import ThreadPoolExecutor
 
+        dt = pd.to_datetime(self.datetime)
+        thetas = sorted(theta_list)
+        nthetas = len(thetas)
+
+        # bin of each tracking timestamp, matched to the weather timestamps 
+        # on their local time strings: mask[angle, timestamp]
+        trackingtimes = trackingdata.index.strftime('%Y-%m-%d %H:%M:%S')
+        bins = pd.Index(thetas).get_indexer(trackingdata['theta_round'])
+        tracking = pd.DataFrame({'time':trackingtimes, 'bin':bins})
+        weather = pd.DataFrame({'time':dt.strftime('%Y-%m-%d %H:%M:%S'),
+                                'row':np.arange(len(dt))})
+        pairs = weather.merge(tracking[tracking['bin'] >= 0].drop_duplicates(),
+                              on='time')
+        mask = np.zeros((nthetas, len(dt)), dtype=bool)
+        mask[pairs['bin'].values, pairs['row'].values] = True
+
+        # GHI and DHI columns of all angles, masked out at the times that 
+        # belong to a different bin, in the gencumulativesky 8760 format
+        ghi = np.where(mask, np.asarray(self.ghi, dtype=float), 0.0)
+        dhi = np.where(mask, np.asarray(self.dhi, dtype=float), 0.0)
+        savedata = pd.DataFrame(np.concatenate([ghi, dhi]).T,
+                                index = self.datetime).tz_localize(None)
+        # Fill partial year. Requires 2021 measurement year.
+        savedata = _subhourlydatatoGencumskyformat(savedata, 
+                                                   label=self.label)
+        surf_azm = trackingdata.groupby('theta_round')['surface_azimuth'].median()
+
+        trackerdict = {}
+        for theta in theta_list:
             #Set up trackerdict output for each value of theta
-            trackerdict[theta]['csvfile'] = csvfile
-            trackerdict[theta]['surf_azm'] = tempdata['surface_azimuth'].median()
-            trackerdict[theta]['surf_tilt'] = abs(theta)
-            datetimetemp = tempdata.index.strftime('%Y-%m-%d %H:%M:%S') #local time
-            trackerdict[theta]['datetime'] = datetimetemp
-            trackerdict[theta]['count'] = datetimetemp.__len__()
-            #Create new temp csv file with zero values for all times not equal to datetimetemp
-            # write 8760 2-column csv:  GHI,DHI
-            dni_temp = []
-            ghi_temp = []
-            dhi_temp = []
-            for g, d, time in zip(self.ghi, self.dhi,
-                                  dt.strftime('%Y-%m-%d %H:%M:%S')):
-
-                # is this time included in a particular theta_round angle?
-                if time in datetimetemp:
-                    ghi_temp.append(g)
-                    dhi_temp.append(d)
-                else:
-                    # mask out irradiance at this time, since it
-                    # belongs to a different bin
-                    ghi_temp.append(0.0)
-                    dhi_temp.append(0.0)
+            datetimetemp = trackingtimes[bins == thetas.index(theta)] #local time
+            trackerdict[theta] = {
+                'csvfile':os.path.join('EPWs', '1axis_{}.csv'.format(theta)),
+                'surf_azm':surf_azm[theta],
+                'surf_tilt':abs(theta),
+                'datetime':datetimetemp,
+                'count':datetimetemp.__len__()}
+
+        def _saveTrackerCSV(i):
             # save in 2-column GHI,DHI format for gencumulativesky -G
-            savedata = pd.DataFrame({'GHI':ghi_temp, 'DHI':dhi_temp},
-                                    index = self.datetime).tz_localize(None)
-            # Fill partial year. Requires 2021 measurement year.
-            savedata = _subhourlydatatoGencumskyformat(savedata, 
-                                                       label=self.label)
+            data = savedata[[i, nthetas + i]]
+            data.columns = ['GHI', 'DHI']
+            data.to_csv(trackerdict[thetas[i]]['csvfile'],
+                        index=False,
+                        header=False,
+                        sep=' ',
+                        columns=['GHI','DHI'])
+
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(_saveTrackerCSV, range(nthetas)))
+        for theta in thetas:
             print('Saving file {}, # points: {}'.format(
-                  trackerdict[theta]['csvfile'], datetimetemp.__len__()))
-
-            savedata.to_csv(csvfile,
-                            index=False,
-                            header=False,
-                            sep=' ',
-                            columns=['GHI','DHI'])
-
+                  trackerdict[theta]['csvfile'], trackerdict[theta]['count']))
 
         return trackerdict
 
@@ -3638,7 +5797,9 @@ class AnalysisObj(SuperClass):
                        
     def __repr__(self):
         return str(type(self)) + ' : ' +  str({key:  self.__printval__(key) for key in self.columns})  
-    def __init__(self, octfile=None, name=None, hpc=False):
+    def __init__(self, octfile=None, name=None, hpc=False, persistent=False,
+                 binary=False, ambientcache=False, tolerance=0.02,
+                 artifactcache=False):
         """
         Initialize AnalysisObj by pointing to the octfile.  Scan information
         is defined separately by passing scene details into AnalysisObj.moduleAnalysis()
@@ -3650,11 +5811,67 @@ class AnalysisObj(SuperClass):
         name    :
         hpc     : boolean, default False. Waits for octfile for a
                   longer time if parallel processing.
+        persistent : boolean, default False. Keep one rtrace process running 
+                  per octree and reuse it for every scan (front, back, 
+                  analyzeRow modules, custom scans) instead of starting a 
+                  new rtrace for each one. Call closeRtrace() when done.
+        binary  : boolean or str, default False. Exchange sensor points and
+                  results with rtrace as binary floats instead of text, and
+                  parse them with NumPy. 'float64' (same as True) or 
+                  'float32'. Results are returned as NumPy arrays.
+        ambientcache : boolean or str, default False. Save the rtrace ambient
+                  values to an .amb file (-af) per octree and rtrace 
+                  parameters, and reuse it in later scans of the same octree.
+                  Files go in the 'ambient' folder, or in the folder passed.
+                  See :py:func:`~bifacial_radiance.main.ambientCacheStats`.
+        tolerance : numeric, default 0.02. Relative change of a sensor's
+                  irradiance between two rtrace accuracy levels under which 
+                  it is considered converged, with accuracy='adaptive'.
+        artifactcache : boolean or str, default False. Keep the results of
+                  each rtrace call in a content-addressed cache (the 'cache'
+                  folder, or the folder passed) keyed by the octree contents,
+                  rtrace parameters and sensor points, and return them 
+                  without tracing when the same scan is run again. See 
+                  :py:func:`~bifacial_radiance.main.artifactCacheStats`.
         """
 
         self.octfile = octfile
         self.name = name
         self.hpc = hpc
+        self._persistent = persistent
+        if binary is True:
+            binary = 'float64'
+        if binary not in (False, None, 'float64', 'float32'):
+            raise ValueError("binary must be False, True, 'float64' or "
+                             "'float32'")
+        self._binary = binary or False
+        if ambientcache is True:
+            ambientcache = 'ambient'
+        self._ambientcache = ambientcache or False
+        self._tolerance = tolerance
+        if artifactcache is True:
+            artifactcache = 'cache'
+        self._artifactcache = artifactcache or False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.closeRtrace()
+
+    def closeRtrace(self, octfile=None):
+        """
+        Shut down persistent rtrace workers started by ``persistent=True``.
+
+        Parameters
+        ----------
+        octfile : str, optional
+            Octree whose workers should be closed. Default: self.octfile 
+        """
+        if octfile is None:
+            octfile = self.octfile
+        if octfile is not None:
+            closeRtraceWorkers(octfile)
 
     def makeImage(self, viewfile, octfile=None, name=None):
         """
@@ -3771,27 +5988,43 @@ class AnalysisObj(SuperClass):
                             a['Nx'],a['Ny'],a['Nz'],a['orient'])
         return linepts
 
+    def _linePtsMakeArray(self, linePtsDict):
+        # NumPy version of _linePtsMakeDict for binary rtrace input.
+        # Returns an (N, 6) array of x, y, z, dx, dy, dz in the same order.
+        a = linePtsDict
+        Nx = int(a['Nx'])
+        Ny = int(a['Ny'])
+        Nz = int(a['Nz'])
+        iz, ix, iy = np.meshgrid(np.arange(Nz), np.arange(Nx), np.arange(Ny),
+                                 indexing='ij')
+        ix = ix.ravel()
+        iy = iy.ravel()
+        pts = np.empty((ix.size, 6))
+        pts[:,0] = a['xstart'] + iy*a['xinc'] + ix*a['sx_xinc']
+        pts[:,1] = a['ystart'] + iy*a['yinc'] + ix*a['sx_yinc']
+        pts[:,2] = a['zstart'] + iy*a['zinc'] + ix*a['sx_zinc']
+        pts[:,3:] = [float(i) for i in str(a['orient']).split()]
+        return pts
+
     def _linePtsMake3D(self, xstart, ystart, zstart, xinc, yinc, zinc,
                        sx_xinc, sx_yinc, sx_zinc,
                       Nx, Ny, Nz, orient):
         #create linepts text input with variable x,y,z.
         #If you don't want to iterate over a variable, inc = 0, N = 1.
+        # The lines are joined once at the end, not appended one at a time.
 
-        linepts = ""
         # make sure Nx, Ny, Nz are ints.
         Nx = int(Nx)
         Ny = int(Ny)
         Nz = int(Nz)
 
-
-        for iz in range(0,Nz):
-            for ix in range(0,Nx):
-                for iy in range(0,Ny):
-                    xpos = xstart+iy*xinc+ix*sx_xinc
-                    ypos = ystart+iy*yinc+ix*sx_yinc
-                    zpos = zstart+iy*zinc+ix*sx_zinc
-                    linepts = linepts + str(xpos) + ' ' + str(ypos) + \
-                          ' '+str(zpos) + ' ' + orient + " \r"
+        linepts = ''.join([str(xstart+iy*xinc+ix*sx_xinc) + ' ' + 
+                           str(ystart+iy*yinc+ix*sx_yinc) + ' ' + 
+                           str(zstart+iy*zinc+ix*sx_zinc) + ' ' + orient + 
+                           " \r"
+                           for iz in range(0,Nz) 
+                           for ix in range(0,Nx) 
+                           for iy in range(0,Ny)])
         return(linepts)
 
     def _irrPlot(self, octfile, linepts, mytitle=None, plotflag=None,
@@ -3829,6 +6062,46 @@ class AnalysisObj(SuperClass):
         if mytitle is None:
             mytitle = octfile[:-4]
 
+        out = self._irrPlotScans(octfile, [linepts], [mytitle], 
+                                 plotflag=plotflag, accuracy=accuracy)
+        if out is None or out == {}:
+            return out
+        return out[0]
+
+    def _irrPlotScans(self, octfile, lineptslist, titles, plotflag=None,
+                      accuracy='low'):
+        """
+        Run several linepts scans through a single rtrace invocation and 
+        split the results back per scan, so the octree is loaded and the
+        ambient values are computed only once for all of them.
+
+        Parameters
+        ------------
+        octfile : string
+            Filename and extension of .oct file
+        lineptslist : list
+            List of outputs from 
+            :py:class:`bifacial_radiance.AnalysisObj._linePtsMake3D`, or
+            (N, 6) arrays from _linePtsMakeArray in binary mode.
+        titles : list
+            Title of each scan, to append to results files
+        plotflag : Boolean
+            Include plot of resulting irradiance
+        accuracy : string
+            Either 'low' (default - faster), 'high' (better for low light)
+            or 'adaptive' (escalate the sensors that haven't converged, see
+            _irrPlotScansAdaptive)
+
+        Returns
+        -------
+        outlist : list
+            One dictionary per scan with the same keys returned by 
+            :py:class:`bifacial_radiance.AnalysisObj._irrPlot`, plus the
+            rtrace options used for each sensor in 'accuracy' with 
+            accuracy='adaptive'. Values are NumPy arrays in binary mode. 
+            None if rtrace returned an error.
+        """
+
         if plotflag is None:
             plotflag = False
 
@@ -3848,27 +6121,95 @@ class AnalysisObj(SuperClass):
             print('Analysis aborted. octfile = None' )
             return None
 
-        keys = ['Wm2','x','y','z','r','g','b','mattype']
-        out = {key: [] for key in keys}
         #out = dict.fromkeys(['Wm2','x','y','z','r','g','b','mattype','title'])
-        out['title'] = mytitle
-        print ('Linescan in process: %s' %(mytitle))
+        for mytitle in titles:
+            print ('Linescan in process: %s' %(mytitle))
         #rtrace ambient values set for 'very accurate':
         #cmd = "rtrace -i -ab 5 -aa .08 -ar 512 -ad 2048 -as 512 -h -oovs "+ octfile
 
         if accuracy == 'low':
             #rtrace optimized for faster scans: (ab2, others 96 is too coarse)
-            cmd = "rtrace -i -ab 2 -aa .1 -ar 256 -ad 2048 -as 256 -h -oovs "+ octfile
+            opts = "-ab 2 -aa .1 -ar 256 -ad 2048 -as 256"
         elif accuracy == 'high':
             #rtrace ambient values set for 'very accurate':
-            cmd = "rtrace -i -ab 5 -aa .08 -ar 512 -ad 2048 -as 512 -h -oovs "+ octfile
+            opts = "-ab 5 -aa .08 -ar 512 -ad 2048 -as 512"
+        elif accuracy == 'adaptive':
+            outlist = self._irrPlotScansAdaptive(octfile, lineptslist, titles)
         else:
-            print('_irrPlot accuracy options: "low" or "high"')
+            print('_irrPlot accuracy options: "low", "high" or "adaptive"')
             return({})
 
+        if accuracy != 'adaptive':
+            outlist = self._traceScans(octfile, lineptslist, titles, opts)
+        if outlist is None:
+            return None   # return empty if error message.
+        if plotflag is True:
+            for out in outlist:
+                self._plotScan(out)
+        return(outlist)
 
+    def _traceScans(self, octfile, lineptslist, titles, opts):
+        """
+        Trace the scans in lineptslist with the rtrace options opts, in one 
+        rtrace call, and split the output back into one dictionary per scan.
+        Called by _irrPlotScans once the accuracy options are set. Points
+        can be _linePtsMake3D text or (N, 6) arrays in both modes. With
+        artifactcache, a scan traced before on the same octree contents, 
+        options and points is read back from the cache.
+        """
+        import io, pickle
 
-        temp_out,err = _popen(cmd,linepts.encode())
+        keys = ['Wm2','x','y','z','r','g','b','mattype']
+
+        artifactcache = getattr(self, '_artifactcache', False)
+        ambientcache = getattr(self, '_ambientcache', False)
+        if artifactcache or ambientcache:
+            # one memoized octree hash for the scan key and the ambient file
+            octhash = _octHash(octfile)
+        if artifactcache:
+            cachekey = _artifactKey('scan', octhash, 
+                                    ' '.join(opts.split()), 
+                                    getattr(self, '_binary', False),
+                                    *[linepts.encode() if 
+                                      isinstance(linepts, str) else 
+                                      np.asarray(linepts, dtype=float).tobytes()
+                                      for linepts in lineptslist])
+            cachefile = _artifactFetch(artifactcache, cachekey, '.pkl')
+            if cachefile is not None:
+                with open(cachefile, 'rb') as f:
+                    outlist = pickle.load(f)
+                for out, mytitle in zip(outlist, titles):
+                    out['title'] = mytitle
+                return outlist
+
+        if ambientcache:
+            opts += ' -af ' + _ambientFile(octfile, opts, ambientcache, 
+                                           octhash)
+
+        if getattr(self, '_binary', False):
+            outlist = self._irrPlotScansBinary(octfile, lineptslist, titles, 
+                                               opts)
+            if artifactcache and outlist is not None:
+                _artifactStore(artifactcache, cachekey, '.pkl', data=outlist)
+            return outlist
+
+        cmd = "rtrace -i "+ opts + " -h -oovs "+ octfile
+
+        textlist = []
+        for linepts in lineptslist:
+            if not isinstance(linepts, str):
+                buf = io.StringIO()
+                np.savetxt(buf, np.reshape(linepts, (-1, 6)), fmt='%0.6f')
+                linepts = buf.getvalue()
+            textlist.append(linepts)
+        # number of sensor points in each scan, to split the output back up
+        npoints = [len(linepts.split()) // 6 for linepts in textlist]
+        linepts = ''.join(textlist)
+
+        if getattr(self, '_persistent', False):
+            temp_out,err = _getRtraceWorker(cmd).trace(linepts)
+        else:
+            temp_out,err = _popen(cmd,linepts.encode())
         if err is not None:
             if err[0:5] == 'error':
                 raise Exception(err[7:])
@@ -3876,8 +6217,16 @@ class AnalysisObj(SuperClass):
                 print(err)
 
         # when file errors occur, temp_out is None, and err message is printed.
-        if temp_out is not None:
-            for line in temp_out.splitlines():
+        if temp_out is None:
+            return None   # return empty if error message.
+
+        lines = temp_out.splitlines()
+        outlist = []
+        start = 0
+        for mytitle, n in zip(titles, npoints):
+            out = {key: [] for key in keys}
+            out['title'] = mytitle
+            for line in lines[start:start+n]:
                 temp = line.split('\t')
                 out['x'].append(float(temp[0]))
                 out['y'].append(float(temp[1]))
@@ -3887,20 +6236,274 @@ class AnalysisObj(SuperClass):
                 out['b'].append(float(temp[5]))
                 out['mattype'].append(temp[6])
                 out['Wm2'].append(sum([float(i) for i in temp[3:6]])/3.0)
+            start += n
+            outlist.append(out)
+
+        if artifactcache:
+            _artifactStore(artifactcache, cachekey, '.pkl', data=outlist)
+        return(outlist)
+
+    def _irrPlotScansAdaptive(self, octfile, lineptslist, titles):
+        """
+        accuracy='adaptive' version of _irrPlotScans. All sensors are traced
+        with the first two levels of _ADAPTIVE_ACCURACY. Sensors whose 
+        irradiance changed by more than self._tolerance between the last two
+        levels are traced again with the next level, until all of them
+        converge or the last level is reached. The options used for each 
+        sensor are returned in the 'accuracy' key of each scan.
+        """
+        pts = []
+        for linepts in lineptslist:
+            if isinstance(linepts, str):
+                linepts = np.array(linepts.split(), dtype=float)
+            pts.append(np.asarray(linepts, dtype=float).reshape(-1, 6))
+        npoints = [len(p) for p in pts]
+        pts = np.concatenate(pts)
+        keys = ['x','y','z','r','g','b','Wm2','mattype']
+        # irradiance under this value (W/m2) only needs to converge in 
+        # absolute terms, so shaded or dark sensors don't escalate for nothing
+        floor = 1.0
+
+        active = np.arange(len(pts))
+        level = np.zeros(len(pts), dtype=int)
+        result = None
+        for i, opts in enumerate(_ADAPTIVE_ACCURACY):
+            out = self._traceScans(octfile, [pts[active]], ['adaptive'], opts)
+            if out is None:
+                return None
+            out = out[0]
+            if result is None:
+                result = {key: np.array(out[key], dtype=object if 
+                                        key == 'mattype' else float) 
+                          for key in keys}
+                continue
+            change = np.abs(np.asarray(out['Wm2']) - result['Wm2'][active])
+            for key in keys:
+                result[key][active] = out[key]
+            level[active] = i
+            converged = change <= self._tolerance * np.maximum(
+                result['Wm2'][active], floor)
+            active = active[~converged]
+            print('Adaptive accuracy: {} of {} sensors not converged with '
+                  '"{}"'.format(len(active), len(pts), opts))
+            if len(active) == 0:
+                break
+
+        self.adaptiveLevels = {opts: int(np.sum(level == i)) for i, opts 
+                               in enumerate(_ADAPTIVE_ACCURACY)}
+        accuracy = np.array(_ADAPTIVE_ACCURACY, dtype=object)[level]
+        outlist = []
+        start = 0
+        for mytitle, n in zip(titles, npoints):
+            out = {key: result[key][start:start+n] for key in keys}
+            out['accuracy'] = accuracy[start:start+n]
+            if not getattr(self, '_binary', False):
+                out = {key: list(out[key]) for key in out}
+            out['title'] = mytitle
+            start += n
+            outlist.append(out)
+        return outlist
+
+    def _irrPlotScansBinary(self, octfile, lineptslist, titles, opts):
+        """
+        Binary version of _traceScans. Sensor points are sent to rtrace as
+        float32 / float64 (-ff / -fd) and the values are read back with 
+        np.frombuffer instead of splitting text. Material names come from a
+        separate cast-only pass (-os without -i), which is cheap since no
+        ambient calculation is done.
+        """
+        if self._binary == 'float32':
+            dtype, fmt = 'f4', 'f'
+        else:
+            dtype, fmt = 'f8', 'd'
+        
+        pts = []
+        for linepts in lineptslist:
+            if isinstance(linepts, str):
+                linepts = np.array(linepts.split(), dtype=float)
+            pts.append(np.asarray(linepts, dtype=float).reshape(-1, 6))
+        npoints = [len(p) for p in pts]
+        pts = np.concatenate(pts).astype(dtype)
+        nrays = len(pts)
+        data_in = pts.tobytes()
+
+        cmd = "rtrace -i "+ opts + " -h -f"+fmt+fmt+" -oov "+ octfile
+        namecmd = "rtrace -h -f"+fmt+"a -os "+ octfile
+        recdtype = np.dtype([(key, dtype) for key in 
+                             ['x', 'y', 'z', 'r', 'g', 'b']])
+
+        results = []
+        for c, recordsize in [(cmd, recdtype.itemsize), (namecmd, None)]:
+            if getattr(self, '_persistent', False):
+                temp_out,err = _getRtraceWorker(c).trace(data_in, nrays, 
+                                                         recordsize)
+            else:
+                temp_out,err = _popen(c, data_in, decode=recordsize is None)
+            if err is not None:
+                if err[0:5] == 'error':
+                    raise Exception(err[7:])
+                else:
+                    print(err)
+            if temp_out is None:
+                return None   # return empty if error message.
+            results.append(temp_out)
+
+        res = np.frombuffer(results[0], dtype=recdtype)
+        names = np.array([line.split('\t')[0] for line in 
+                          results[1].splitlines()])
+        if len(res) != nrays or len(names) != nrays:
+            print('Warning: rtrace returned %s values and %s names for %s '
+                  'sensors' % (len(res), len(names), nrays))
+            return None
+
+        outlist = []
+        start = 0
+        for mytitle, n in zip(titles, npoints):
+            sub = res[start:start+n]
+            out = {key: sub[key].astype(float) for key in recdtype.names}
+            out['mattype'] = names[start:start+n]
+            out['Wm2'] = (out['r'] + out['g'] + out['b']) / 3.0
+            out['title'] = mytitle
+            start += n
+            outlist.append(out)
+
+        return(outlist)
+
+    def _plotScan(self, out):
+        import matplotlib.pyplot as plt
+        plt.figure()
+        plt.plot(out['Wm2'])
+        plt.ylabel('Wm2 irradiance')
+        plt.xlabel('variable')
+        plt.title(out['title'])
+        plt.show()
+
+    def analyzeScans(self, octfile, scans, titles=None, plotflag=False, 
+                     accuracy='low'):
+        """
+        Raytrace any number of scan dictionaries (front, back, ground, or
+        custom scans) together in a single rtrace call. All points share the 
+        loaded octree and its ambient cache, and the output is split back 
+        into one result per scan.
+
+        Parameters
+        ------------
+        octfile : string
+            Filename and extension of .oct file
+        scans : list of dict or arrays
+            Scan dictionaries, e.g. the frontscan and backscan returned by
+            :py:class:`~bifacial_radiance.AnalysisObj.moduleAnalysis`, with 
+            keys 'xstart', 'ystart', 'zstart', 'xinc', 'yinc', 'zinc', 
+            'sx_xinc', 'sx_yinc', 'sx_zinc', 'Nx', 'Ny', 'Nz', 'orient'.
+            Or (N, 6) arrays of x, y, z, dx, dy, dz, e.g. from 
+            :py:class:`~bifacial_radiance.AnalysisObj.moduleAnalysisArray`.
+        titles : list of str, optional
+            Title for each scan. Default: 'scan_0', 'scan_1', ...
+        plotflag : boolean
+            Include plot of resulting irradiance
+        accuracy : string 
+            Either 'low' (default - faster), 'high' (better for low light) or
+            'adaptive' (escalate only the sensors that haven't converged)
+
+        Returns
+        -------
+        results : list of dict
+            One result dictionary per scan with keys 'x', 'y', 'z', 'r', 
+            'g', 'b', 'Wm2', 'mattype' and 'title'. None if the raytrace
+            failed.
+        """
+        if titles is None:
+            titles = ['scan_%s' % (i) for i in range(len(scans))]
+        if len(titles) != len(scans):
+            raise ValueError('analyzeScans: number of titles must match '
+                             'number of scans')
+        binary = getattr(self, '_binary', False)
+        lineptslist = []
+        for scan in scans:
+            if not isinstance(scan, dict):
+                linepts = np.asarray(scan, dtype=float).reshape(-1, 6)
+                if not binary:
+                    linepts = ''.join(['%r %r %r %r %r %r \r' % tuple(p) 
+                                       for p in linepts.tolist()])
+            elif binary:
+                linepts = self._linePtsMakeArray(scan)
+            else:
+                linepts = self._linePtsMakeDict(scan)
+            lineptslist.append(linepts)
+        return self._irrPlotScans(octfile, lineptslist, titles,
+                                  plotflag=plotflag, accuracy=accuracy)
+
+    def daylightCoefficients(self, octfile, scans, mf=1, accuracy='low',
+                             sunoctfile=None, sunmodfile=None):
+        """
+        Daylight coefficients of the scans with rcontrib: the irradiance 
+        at each sensor per unit radiance of each Reinhart sky patch, to be 
+        multiplied with the sky matrices of 
+        :py:func:`~bifacial_radiance.RadianceObj.genDaylightMtx`. Sensors
+        are traced like in :py:func:`~bifacial_radiance.AnalysisObj.analysis`
+        (irradiance at the surface each sensor ray hits).
 
+        Parameters
+        ------------
+        octfile : string
+            Octree with the scene and a sky_glow sky and ground, from 
+            RadianceObj._makeOctDaylightMtx
+        scans : list of dict
+            Scan dictionaries, e.g. frontscan and backscan from moduleAnalysis
+        mf : int
+            Reinhart sky subdivision, same as the sky matrix
+        accuracy : string
+            Either 'low' (default - faster) or 'high'
+        sunoctfile, sunmodfile : string, optional
+            Octree with one solar disc per timestamp and the file listing 
+            their modifiers. If passed, direct sun coefficients are also 
+            calculated.
 
-            if plotflag is True:
-                import matplotlib.pyplot as plt
-                plt.figure()
-                plt.plot(out['Wm2'])
-                plt.ylabel('Wm2 irradiance')
-                plt.xlabel('variable')
-                plt.title(mytitle)
-                plt.show()
+        Returns
+        -------
+        dclist : list of dict
+            One dictionary per scan with arrays of shape 
+            (sensors, patches or suns, 3): 'sky' for all light paths, 
+            'skydirect' for the patches seen directly from the sensors and
+            'sun' for the direct solar discs (None without sunoctfile).
+        """
+        if accuracy == 'low':
+            opts = "-ad 2048 -lw 5e-4"
+            ab = 2
+        elif accuracy == 'high':
+            opts = "-ad 8192 -lw 1e-5"
+            ab = 5
         else:
-            out = None   # return empty if error message.
+            print('daylightCoefficients accuracy options: "low" or "high"')
+            return None
 
-        return(out)
+        pts = [self._linePtsMakeArray(scan) for scan in scans]
+        npoints = [len(p) for p in pts]
+        pts = np.concatenate(pts)
+        rcontrib = "rcontrib -h -fdd -i+ "
+        reinhart = "-e MF:%s -f reinhart.cal -b rbin -bn Nrbins -m sky_glow " % (mf)
+        cmds = {'sky':rcontrib + "-ab %s %s %s %s" % (ab, opts, reinhart, octfile),
+                'skydirect':rcontrib + "-ab 1 %s %s %s" % (opts, reinhart, octfile)}
+        if sunoctfile is not None:
+            cmds['sun'] = rcontrib + "-ab 0 -dc 1 -dt 0 -dj 0 -M %s %s" % (
+                sunmodfile, sunoctfile)
+
+        dc = {}
+        for key, cmd in cmds.items():
+            data, err = _popen(cmd, pts.tobytes(), decode=False)
+            if data is None:
+                raise Exception('rcontrib failed: %s' % (err))
+            if err is not None:
+                print(err)
+            dc[key] = np.frombuffer(data).reshape(len(pts), -1, 3)
+
+        dclist = []
+        start = 0
+        for n in npoints:
+            dclist.append({key:(dc[key][start:start+n] if key in dc else None)
+                           for key in ['sky', 'skydirect', 'sun']})
+            start += n
+        return dclist
 
     def _saveResults(self, data=None, reardata=None, savefile=None, RGB = False):
         """
@@ -4087,24 +6690,6 @@ class AnalysisObj(SuperClass):
         #           height for single-axis tracked systems.
         #   Single axis tracked systems will consider the offset to calculate the final height.
         
-        def _checkSensors(sensors):
-            # Checking Sensors input data for list or tuple
-            if (type(sensors)==tuple or type(sensors)==list):
-                try:
-                    sensors_back = sensors[1]
-                    sensors_front = sensors[0]
-                except IndexError: # only 1 value passed??
-                    sensors_back = sensors_front = sensors[0]
-            elif (type(sensors)==int or type(sensors)==float):
-                # Ensure sensors are positive int values.
-                if int(sensors) < 1:
-                    raise Exception('input sensorsy must be numeric >0')
-                sensors_back = sensors_front = int(sensors)
-            else:
-                print('Warning: invalid value passed for sensors. Setting = 1')
-                sensors_back = sensors_front = 1
-            return sensors_front, sensors_back
-            
         sensorsy_front, sensorsy_back = _checkSensors(sensorsy)
         sensorsx_front, sensorsx_back = _checkSensors(sensorsx)
         
@@ -4380,10 +6965,181 @@ class AnalysisObj(SuperClass):
                 
         return frontscan2, backscan2 
       
+    def moduleAnalysisArray(self, scene, tilt=None, azimuth=None, height=None,
+                            modWanted=None, rowWanted=None, sensorsy=9, 
+                            sensorsx=1, frontsurfaceoffset=0.001, 
+                            backsurfaceoffset=0.001):
+        """
+        Vectorized version of 
+        :py:class:`~bifacial_radiance.AnalysisObj.moduleAnalysis`. The sensor
+        positions and directions of many module orientations, for example 
+        every key of a trackerdict, are calculated at once as NumPy arrays
+        instead of one scan dictionary at a time.
+
+        `tilt`, `azimuth`, `height`, `modWanted` and `rowWanted` are 
+        broadcast against each other, one value per orientation K. The 
+        module, pitch, number of modules and rows and origin come from 
+        `scene`. Sensors are ordered like the scans of moduleAnalysis, and 
+        the directions are rounded to 3 decimals like its 'orient' string, 
+        so the same points are traced.
+
+        Parameters
+        ------------
+        scene : ``SceneObj``
+            Generated with :py:class:`~bifacial_radiance.RadianceObj.makeScene`
+            or makeScene1axis. Any of the trackerdict scenes for a 1-axis 
+            sweep.
+        tilt : numeric or array
+            Module tilt of each orientation, e.g. the trackerdict 
+            'surf_tilt'. Default scene.sceneDict['tilt']
+        azimuth : numeric or array
+            Module azimuth of each orientation, e.g. the trackerdict 
+            'surf_azm'. Default scene.sceneDict['azimuth']
+        height : numeric or array
+            Hub height of each orientation. Default the scene's 'hub_height',
+            or the hub height of its 'clearance_height' at each tilt.
+        modWanted : int or array
+            Module wanted to sample. If none, defaults to center module (rounding down)
+        rowWanted : int or array
+            Row wanted to sample. If none, defaults to center row (rounding down)
+        sensorsy : int or list 
+            Number of 'sensors' or scanning points along the collector width 
+            (CW) of the module(s). If multiple values are passed, first value
+            represents number of front sensors, second value is number of back sensors
+        sensorsx : int or list 
+            Number of 'sensors' or scanning points along the length, the side perpendicular 
+            to the collector width (CW) of the module(s) for the back side of the module. 
+            If multiple values are passed, first value represents number of 
+            front sensors, second value is number of back sensors.
+
+        Returns
+        -------
+        frontpts : numpy array
+            Shape (K, sensorsx*sensorsy, 6) of x, y, z, dx, dy, dz for the 
+            front sensors. frontpts[k] is C-contiguous float64, so 
+            ``memoryview(frontpts[k])`` is the `rtrace -fd` stdin of the 
+            orientation without a copy, and frontpts[k] can be passed to 
+            :py:class:`~bifacial_radiance.AnalysisObj.analyzeScans`.
+        backpts : numpy array
+            Same for the back sensors.
+        """
+        sceneDict = scene.sceneDict
+        dtor = np.pi/180.0
+        sensorsy_front, sensorsy_back = _checkSensors(sensorsy)
+        sensorsx_front, sensorsx_back = _checkSensors(sensorsx)
+        nMods = sceneDict['nMods']
+        nRows = sceneDict['nRows']
+        offset = scene.module.offsetfromaxis
+        sceney = scene.module.sceney
+        scenex = scene.module.scenex
+        x = scene.module.x
+        modulez = getattr(scene.module, 'z', 0.02)
+        axis_tilt = sceneDict.get('axis_tilt', 0)
+        if 'pitch' in sceneDict:
+            pitch = sceneDict['pitch']
+        elif 'gcr' in sceneDict:
+            pitch = sceney / sceneDict['gcr']
+        else:
+            raise Exception("Error: no 'pitch' or 'gcr' passed in sceneDict" )
+
+        if tilt is None:
+            tilt = sceneDict['tilt']
+        if azimuth is None:
+            azimuth = sceneDict['azimuth']
+        if modWanted is None:
+            modWanted = round(nMods / 1.99)
+        if rowWanted is None:
+            rowWanted = round(nRows / 1.99)
+        tilt, azimuth, modWanted, rowWanted = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(tilt, dtype=float)), 
+            np.asarray(azimuth, dtype=float), 
+            np.maximum(modWanted, 1), np.maximum(rowWanted, 1))
+        st, ct = np.sin(tilt*dtor), np.cos(tilt*dtor)
+        sz, cz = np.sin(azimuth*dtor), np.cos(azimuth*dtor)
+        if height is None:
+            heightDict, use_clearanceheight = _heightCasesSwitcher(
+                dict(sceneDict), preferred='hub_height', 
+                nonpreferred='clearance_height', suppress_warning=True)
+            if use_clearanceheight:
+                height = heightDict['clearance_height'] + \
+                    (0.5*sceney - offset) * np.abs(st)
+            else:
+                height = heightDict['hub_height']
+        height = np.broadcast_to(height, tilt.shape)
+
+        # center of the module on the axis of rotation
+        x0 = (modWanted-1)*scenex - (scenex*(round(nMods/1.99)*1.0-1))
+        y0 = (rowWanted-1)*pitch - (pitch*(round(nRows / 1.99)*1.0-1))
+        center = np.empty(tilt.shape + (3,))
+        center[:, 0] = x0 * np.cos((180-azimuth)*dtor) - \
+            y0 * np.sin((180-azimuth)*dtor) + sceneDict['originx']
+        center[:, 1] = x0 * np.sin((180-azimuth)*dtor) + \
+            y0 * np.cos((180-azimuth)*dtor) + sceneDict['originy']
+        center[:, 2] = height
+        if axis_tilt != 0:
+            center[:, 2] += np.where(azimuth == 90, 
+                                     (modWanted-1)*scenex * 
+                                     np.sin(axis_tilt*dtor), 0)
+
+        # module normal, and unit vectors along the collector width and the 
+        # module length (sensorsy and sensorsx directions)
+        normal = np.stack([st*sz, st*cz, ct], axis=-1)
+        ydir = np.stack([-ct*sz, -ct*cz, st], axis=-1)
+        xdir = np.stack([-cz, sz, np.zeros_like(sz)], axis=-1)
+        edge = center - (sceney/2.0)*ydir
+        startfront = edge + (offset + modulez + frontsurfaceoffset)*normal
+        startback = edge + (offset - backsurfaceoffset)*normal
+
+        cellModule = getattr(scene.module, 'cellModule', None)
+        if cellModule and sensorsy_back == cellModule.numcellsy:
+            ycell = cellModule.ycell
+            inc_back = inc_front = ((sceney - ycell) / 
+                                    (cellModule.numcellsy-1)) * ydir
+            firstfront = startfront + ycell/2 * ydir
+            firstback = startback + ycell/2 * ydir
+            sx_back = sx_front = np.zeros_like(ydir)
+        else:
+            inc_back = (sceney/(sensorsy_back + 1.0)) * ydir
+            inc_front = (sceney/(sensorsy_front + 1.0)) * ydir
+            # sensors don't line up with the gaps in between cellModule cells
+            firstfront = startfront + inc_front
+            if cellModule and sensorsy_front == cellModule.numcellsy-1:
+                firstfront[:, 1:] -= inc_front[:, 1:]/2
+            firstback = startback + inc_back
+            if cellModule and sensorsy_back == cellModule.numcellsy-1:
+                firstback[:, 1:] -= inc_back[:, 1:]/2
+            sx_back = np.zeros_like(ydir)
+            if sensorsx_back > 1:
+                sx_back = (x/(sensorsx_back+1.0)) * xdir
+                firstback = firstback - (x/2.0)*xdir + sx_back
+            sx_front = np.zeros_like(ydir)
+            if sensorsx_front > 1:
+                sx_front = (x/(sensorsx_front+1.0)) * xdir
+                # same first sensor as moduleAnalysis
+                firstfront = firstfront - (x/2.0)*xdir + sx_back
+
+        out = []
+        for first, inc, sx, Nx, Ny, orient in [
+                (firstfront, inc_front, sx_front, sensorsx_front, 
+                 sensorsy_front, -normal), 
+                (firstback, inc_back, sx_back, sensorsx_back, sensorsy_back,
+                 normal)]:
+            # first + iy*inc + ix*sx for all orientations in one matmul
+            ix, iy = np.divmod(np.arange(int(Nx)*int(Ny)), int(Ny))
+            coeffs = np.stack([np.ones(ix.size), iy, ix], axis=-1)
+            pts = np.empty((len(tilt), ix.size, 6))
+            np.matmul(coeffs, np.stack([first, inc, sx], axis=1), 
+                      out=pts[..., :3])
+            pts[..., 3:] = np.round(orient, 3)[:, None, :] + 0.0
+            out.append(pts)
+        return out[0], out[1]
+
     def analyzeRow(self, octfile, scene, rowWanted=None, name=None, 
-                   sensorsy=None, sensorsx=None ):
+                   sensorsy=None, sensorsx=None, tidy=False, saveresults=True,
+                   rowfile=False):
         '''
-        Function to Analyze every module in the row. 
+        Function to Analyze every module in the row. The sensors of all the
+        modules are traced together in a single rtrace call.
 
         Parameters
         ----------
@@ -4393,6 +7149,8 @@ class AnalysisObj(SuperClass):
             Generated with :py:class:`~bifacial_radiance.RadianceObj.makeScene`.
         rowWanted : int
             Row wanted to sample. If none, defaults to center row (rounding down)
+        name : string
+            Name to append to output files
         sensorsy : int or list 
             Number of 'sensors' or scanning points along the collector width 
             (CW) of the module(s). If multiple values are passed, first value
@@ -4402,53 +7160,209 @@ class AnalysisObj(SuperClass):
             to the collector width (CW) of the module(s) for the back side of the module. 
             If multiple values are passed, first value represents number of 
             front sensors, second value is number of back sensors.
+        tidy : Bool
+            If True, return one line per module, side and sensor instead of 
+            one line per module.
+        saveresults : Bool
+            If True (default), save the results of each module in 
+            `\\results\\irr_name_Module_#.csv`, as 
+            :py:class:`~bifacial_radiance.AnalysisObj.analysis` does.
+        rowfile : Bool
+            If True, save the tidy results of the whole row in a single file,
+            `\\results\\irr_name_Row#.csv`, instead of one file per module.
+            Default False.
 
         Returns
         -------
         df_row : dataframe
-            Dataframe with all values sampled for the row.
+            Dataframe with all values sampled for the row. One line per module 
+            with lists of the sensor values, or with tidy=True the columns 
+            'module' (same numbering as modWanted), 'side' ('Front' or 
+            'Back'), 'sensor', 'x', 'y', 'z', 'mattype' and 'Wm2'.
+            None if the raytrace failed.
 
         '''
-        #allfront = []
-        #allback = []
         
         nMods = scene.sceneDict['nMods']
         
         if rowWanted == None:
             rowWanted = round(scene.sceneDict['nRows']/ 1.99)
-        df_dict_row = {}
-        row_keys = ['x','y','z','rearZ','mattype','rearMat','Wm2Front','Wm2Back','Back/FrontRatio']
-        dict_row = df_dict_row.fromkeys(row_keys)
-        df_row = pd.DataFrame(dict_row, index = [j for j in range(nMods)])
-        
+        if name is None:
+            name = scene.name
+
+        frontscans = []
+        backscans = []
         for i in range (nMods):
-            temp_dict = {}
             frontscan, backscan = self.moduleAnalysis(scene, sensorsy=sensorsy, 
                                         sensorsx=sensorsx, modWanted = i+1, 
                                         rowWanted = rowWanted) 
-            allscan = self.analysis(octfile, name+'_Module_'+str(i), frontscan, backscan) 
-            front_dict = allscan[0]
-            back_dict = allscan[1]
-            temp_dict['x'] = front_dict['x']
-            temp_dict['y'] = front_dict['y']
-            temp_dict['z'] = front_dict['z']
-            temp_dict['rearZ'] = back_dict['z']
-            temp_dict['mattype'] = front_dict['mattype']
-            temp_dict['rearMat'] = back_dict['mattype']
-            temp_dict['Wm2Front'] = front_dict['Wm2']
-            temp_dict['Wm2Back'] = back_dict['Wm2']
-            temp_dict['Back/FrontRatio'] = list(np.array(front_dict['Wm2'])/np.array(back_dict['Wm2']))
-            df_row.iloc[i] = temp_dict
-            #allfront.append(front)
+            frontscans.append(frontscan)
+            backscans.append(backscan)
+        titles = ['%s_Module_%s_%s'%(name, i, side) for side in ['Front', 'Back'] 
+                  for i in range(nMods)]
+        scans = self.analyzeScans(octfile, frontscans+backscans, titles)
+        if not scans:  # rtrace error (None) or invalid accuracy ({})
+            return None
+        fronts = scans[:nMods]
+        backs = scans[nMods:]
+
+        row_keys = ['x','y','z','rearZ','mattype','rearMat','Wm2Front','Wm2Back','Back/FrontRatio']
+        df_row = pd.DataFrame([[list(front['x']), list(front['y']), 
+                                list(front['z']), list(back['z']), 
+                                list(front['mattype']), list(back['mattype']),
+                                list(front['Wm2']), list(back['Wm2']),
+                                list(np.array(front['Wm2'])/np.array(back['Wm2']))]
+                               for front, back in zip(fronts, backs)],
+                              columns=row_keys)
+
+        df_tidy = pd.concat([pd.DataFrame({'module':i+1, 'side':side,
+                                           'sensor':np.arange(len(scan['Wm2'])),
+                                           'x':scan['x'], 'y':scan['y'],
+                                           'z':scan['z'], 
+                                           'mattype':scan['mattype'],
+                                           'Wm2':scan['Wm2']})
+                             for side, sidescans in [('Front', fronts), ('Back', backs)]
+                             for i, scan in enumerate(sidescans)], 
+                            ignore_index=True)
+
+        # set attributes of analysis to the last module, as _saveResults does
+        last = (df_tidy.module == nMods)
+        rowattrs = {'x':'x', 'y':'y', 'z':'z', 'mattype':'mattype', 'Wm2':'Wm2Front'}
+        for key in rowattrs:
+            setattr(self, rowattrs[key], list(df_tidy.loc[last & (df_tidy.side=='Front'), key]))
+        rowattrs = {'z':'rearZ', 'mattype':'rearMat', 'Wm2':'Wm2Back'}
+        for key in rowattrs:
+            setattr(self, rowattrs[key], list(df_tidy.loc[last & (df_tidy.side=='Back'), key]))
+
+        if saveresults and rowfile:
+            savefile = os.path.join('results', 'irr_%s_Row%s.csv'%(name, rowWanted))
+            df_tidy.to_csv(savefile, sep=',', index=False, float_format='%0.3f')
+            print('Saved: %s'%(savefile))
+        elif saveresults:
+            for i, (front, back) in enumerate(zip(fronts, backs)):
+                self._saveScanPair(front, back, '%s_Module_%s'%(name, i))
+
+        if tidy:
+            return df_tidy
         return df_row
 
+    def fieldAnalysis(self, octfile, scene, rowWanted=None, modWanted=None,
+                      sensorsy=9, sensorsx=1, accuracy='low', name=None):
+        """
+        Sample every module of the field, or the selected rows and modules,
+        in a single rtrace call. The sensor positions of the first module of 
+        the first row are calculated with 
+        :py:class:`~bifacial_radiance.AnalysisObj.moduleAnalysis` and shifted 
+        to all other modules and rows at once with NumPy.
+
+        Parameters
+        ------------
+        octfile : string
+            Filename and extension of .oct file
+        scene : ``SceneObj``
+            Generated with :py:class:`~bifacial_radiance.RadianceObj.makeScene`.
+        rowWanted : int or list
+            Rows to sample, starting at 1. Default None samples all rows.
+        modWanted : int or list
+            Modules to sample, starting at 1. Default None samples all modules.
+        sensorsy : int or list 
+            Number of 'sensors' or scanning points along the collector width 
+            (CW) of the module(s). If multiple values are passed, first value
+            represents number of front sensors, second value is number of back sensors
+        sensorsx : int or list 
+            Number of 'sensors' or scanning points along the length, the side perpendicular 
+            to the collector width (CW) of the module(s) for the back side of the module. 
+            If multiple values are passed, first value represents number of 
+            front sensors, second value is number of back sensors.
+        accuracy : string 
+            Either 'low' (default - faster), 'high' (better for low light) or
+            'adaptive' (escalate only the sensors that haven't converged)
+        name : string
+            Name used in the rtrace progress message. Default scene.name
+
+        Returns
+        -------
+        field : dict
+            'Wm2', 'x', 'y', 'z' and 'mattype' arrays of shape 
+            (row, module, side, sensor), and their coordinates 'row', 
+            'module', 'side' (['Front', 'Back']) and 'sensor'. If front and 
+            back have a different number of sensors, the shorter side is 
+            padded with NaN. None if the raytrace failed.
+        AnalysisObj.field : dict
+            The same dictionary.
+        AnalysisObj.Wm2Front, AnalysisObj.Wm2Back, AnalysisObj.backRatio
+            Irradiance of each sensor averaged over the sampled modules.
+        """
+        sceneDict = scene.sceneDict
+        if name is None:
+            name = scene.name
+        if rowWanted is None:
+            rowWanted = range(1, sceneDict['nRows']+1)
+        if modWanted is None:
+            modWanted = range(1, sceneDict['nMods']+1)
+        rows = np.atleast_1d(rowWanted)
+        mods = np.atleast_1d(modWanted)
+
+        frontscan, backscan = self.moduleAnalysis(scene, modWanted=1, rowWanted=1,
+                                                  sensorsy=sensorsy, 
+                                                  sensorsx=sensorsx)
+
+        # moduleAnalysis only translates the sensors from one module to the next
+        dtor = np.pi/180.0
+        azimuth = sceneDict['azimuth']
+        scenex = scene.module.scenex
+        if 'pitch' in sceneDict:
+            pitch = sceneDict['pitch']
+        else:
+            pitch = scene.module.sceney / sceneDict['gcr']
+        x0 = ((mods-1)*scenex)[np.newaxis, :]
+        y0 = ((rows-1)*pitch)[:, np.newaxis]
+        shift = np.zeros((len(rows), len(mods), 1, 6))
+        shift[..., 0, 0] = x0 * np.cos((180-azimuth)*dtor) - y0 * np.sin((180-azimuth)*dtor)
+        shift[..., 0, 1] = x0 * np.sin((180-azimuth)*dtor) + y0 * np.cos((180-azimuth)*dtor)
+        axis_tilt = sceneDict.get('axis_tilt', 0)
+        if axis_tilt != 0 and azimuth == 90:
+            shift[..., 0, 2] = x0 * np.sin(axis_tilt*dtor)
+
+        lineptslist = []
+        for scan in [frontscan, backscan]:
+            lineptslist.append((self._linePtsMakeArray(scan) + shift).reshape(-1, 6))
+        scans = self._irrPlotScans(octfile, lineptslist, 
+                                   [name+'_Field_Front', name+'_Field_Back'],
+                                   accuracy=accuracy)
+        if not scans:  # rtrace error (None) or invalid accuracy ({})
+            return None
+
+        nsensors = max(len(scan['Wm2']) for scan in scans) // (len(rows)*len(mods))
+        field = {'row':rows, 'module':mods, 'side':['Front', 'Back'], 
+                 'sensor':np.arange(nsensors)}
+        for key in ['Wm2', 'x', 'y', 'z', 'mattype']:
+            if key == 'mattype':
+                cube = np.full((len(rows), len(mods), 2, nsensors), '', dtype=object)
+            else:
+                cube = np.full((len(rows), len(mods), 2, nsensors), np.nan)
+            for side, scan in enumerate(scans):
+                values = np.asarray(scan[key]).reshape(len(rows), len(mods), -1)
+                cube[:, :, side, :values.shape[-1]] = values
+            field[key] = cube
+
+        # field average of each sensor, as analysis() does for one module
+        front, back = [np.asarray(scan['Wm2'], dtype=float).reshape(
+            len(rows)*len(mods), -1).mean(axis=0) for scan in scans]
+        self.Wm2Front = list(front)
+        self.Wm2Back = list(back)
+        self.backRatio = np.mean(back) / (np.mean(front) + .001)
+        self.field = field
+        return field
+
     def analysis(self, octfile, name, frontscan, backscan,
                  plotflag=False, accuracy='low', RGB=False):
         """
         General analysis function, where linepts are passed in for calling the
-        raytrace routine :py:class:`~bifacial_radiance.AnalysisObj._irrPlot` 
+        raytrace routine :py:class:`~bifacial_radiance.AnalysisObj.analyzeScans` 
         and saved into results with 
         :py:class:`~bifacial_radiance.AnalysisObj._saveResults`.
+        Front and back scans are traced together in a single rtrace call.
 
         
         Parameters
@@ -4466,7 +7380,8 @@ class AnalysisObj(SuperClass):
         plotflag : boolean
             Include plot of resulting irradiance
         accuracy : string 
-            Either 'low' (default - faster) or 'high' (better for low light)
+            Either 'low' (default - faster), 'high' (better for low light) or
+            'adaptive' (escalate only the sensors that haven't converged)
         RGB : Bool
             If the raytrace is a spectral raytrace and information for the three channe
             wants to be saved, set RGB to True.
@@ -4481,14 +7396,20 @@ class AnalysisObj(SuperClass):
         if octfile is None:
             print('Analysis aborted - no octfile \n')
             return None, None
-        linepts = self._linePtsMakeDict(frontscan)
-        frontDict = self._irrPlot(octfile, linepts, name+'_Front',
-                                    plotflag=plotflag, accuracy=accuracy)
-
-        #bottom view.
-        linepts = self._linePtsMakeDict(backscan)
-        backDict = self._irrPlot(octfile, linepts, name+'_Back',
-                                   plotflag=plotflag, accuracy=accuracy)
+        # front and bottom view traced together in a single rtrace call
+        scans = self.analyzeScans(octfile, [frontscan, backscan], 
+                                  [name+'_Front', name+'_Back'],
+                                  plotflag=plotflag, accuracy=accuracy)
+        if not scans:  # rtrace error (None) or invalid accuracy ({})
+            return None, None
+        frontDict, backDict = scans
+        self._saveScanPair(frontDict, backDict, name, RGB=RGB)
+
+        return frontDict, backDict
+
+    def _saveScanPair(self, frontDict, backDict, name, RGB=False):
+        # save a front and back scan in results/irr_name.csv, or in 
+        # irr_name_Front.csv and irr_name_Back.csv if their sizes differ
         # don't save if _irrPlot returns an empty file.
         if frontDict is not None:
             if len(frontDict['Wm2']) != len(backDict['Wm2']):
@@ -4500,8 +7421,6 @@ class AnalysisObj(SuperClass):
             else:
                 self._saveResults(frontDict, backDict,'irr_%s.csv'%(name), RGB=RGB)
 
-        return frontDict, backDict
-
 
 def quickExample(testfolder=None):
     """
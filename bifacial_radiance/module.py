@@ -315,6 +315,83 @@ class ModuleObj(SuperClass):
             with open(self.modulefile, 'wb') as f:
                 f.write(self.text.encode('ascii'))
             
+    def _expandModule(self):
+        """
+        Expand the generator commands of the module text (genbox, genrev, 
+        xform) into static Radiance primitives with xform, so oconv doesn't 
+        run them again for every octree. The expanded file is named after a
+        hash of the module text and only made once per module definition.
+
+        Returns
+        -------
+        expandedfile : str
+            Path of the expanded .rad file in /objects/, or self.modulefile
+            if the expansion failed.
+        """
+        import hashlib
+
+        texthash = hashlib.sha1(self.text.encode('ascii')).hexdigest()[:12]
+        expandedfile = os.path.join('objects', '%s_expanded_%s.rad' % 
+                                    (self.name, texthash))
+        if os.path.isfile(expandedfile):
+            return expandedfile
+
+        data, err = _popen(['xform'], self.text.encode('ascii'))
+        if data is None or (err is not None and 'fatal' in err):
+            print('Module expansion failed, using {}: {}'.format(
+                self.modulefile, err))
+            return self.modulefile
+        # write and rename, so parallel scenes don't read a partial file
+        tempfile = expandedfile + '.%s.tmp' % (os.getpid())
+        with open(tempfile, 'wb') as f:
+            f.write(data.encode('ascii'))
+        os.replace(tempfile, expandedfile)
+        return expandedfile
+
+    def _instanceOctree(self, materialfiles=None):
+        """
+        Frozen octree of the module and its materials, to be placed in a 
+        scene with Radiance `instance` primitives. Named after a hash of the
+        module text and the material files, and only made once for each.
+
+        Parameters
+        ----------
+        materialfiles : list
+            Material files with the module materials. Default: the .rad 
+            files in /materials/
+
+        Returns
+        -------
+        octfile : str
+            Path of the module octree in /objects/
+        """
+        import hashlib
+        import glob
+
+        if materialfiles is None:
+            materialfiles = sorted(glob.glob(os.path.join('materials', '*.rad')))
+        h = hashlib.sha1(self.text.encode('ascii'))
+        for filename in materialfiles:
+            with open(filename, 'rb') as f:
+                h.update(f.read())
+        octfile = os.path.join('objects', '%s_instance_%s.oct' % 
+                               (self.name, h.hexdigest()[:12]))
+        if os.path.isfile(octfile):
+            return octfile
+
+        if self.modulefile is None or not os.path.isfile(self.modulefile):
+            self._saveModule(self.getDataDict(), json=False, 
+                             rewriteModulefile=False)
+        tempfile = octfile + '.%s.tmp' % (os.getpid())
+        with open(tempfile, 'wb') as f:
+            _,err = _popen(['oconv', '-f'] + materialfiles + [self.modulefile],
+                           None, f)
+        if err is not None and 'fatal' in err:
+            os.remove(tempfile)
+            raise Exception('Module octree failed: {}'.format(err))
+        os.replace(tempfile, octfile)
+        return octfile
+
     def showModule(self):
         """ 
         Method to call objview and render the module object 
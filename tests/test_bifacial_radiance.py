@@ -19,6 +19,7 @@ import pytest
 import os
 import datetime
 import pandas as pd
+import copy
 
 # try navigating to tests directory so tests run from here.
 try:
@@ -39,6 +40,29 @@ MET_FILENAME4="SOLARGIS_Almeria_Spain_20210331.csv"
 # custom 1 year TMY3 datafile with an added "Tracker Angle (degrees)" column 
 MET_FILENAME5="Custom_WeatherFile_TMY3format_60mins_2021_wTrackerAngles_BESTFieldData.csv"
 
+SCENEDICT = {'tilt':20, 'pitch':5, 'clearance_height':1, 'nMods':3, 'nRows':3}
+TRACKERSCENEDICT = {'gcr':0.35, 'hub_height':1.5, 'nMods':3, 'nRows':3}
+
+
+def _setupDemo(name, starttime=None, endtime=None, **kwargs):
+    # RadianceObj with a 0.2 albedo ground, the Boulder weather file (from
+    # starttime to endtime) and a 2 x 1 m 'test-module'
+    demo = bifacial_radiance.RadianceObj(name, **kwargs)
+    demo.setGround(0.2)
+    metdata = demo.readWeatherFile(MET_FILENAME, starttime=starttime,
+                                   endtime=endtime, coerce_year=2001)
+    module = demo.makeModule(name='test-module', y=2, x=1)
+    return demo, metdata, module
+
+def _setupScene(name, sceneDict=SCENEDICT, **kwargs):
+    # _setupDemo plus a fixed tilt scene under the June 17th noon sky, and
+    # its octree
+    demo, metdata, module = _setupDemo(name, **kwargs)
+    demo.gendaylit(4020)
+    scene = demo.makeScene(module, dict(sceneDict))
+    octfile = demo.makeOct(demo.getfilelist())
+    return demo, scene, octfile
+
 
 #def test_quickExample():
 #    results = bifacial_radiance.main.quickExample(TESTDIR)
@@ -57,6 +81,92 @@ def test_RadianceObj_set1axis():
     trackerdict = demo.set1axis()
     assert trackerdict[0]['count'] == 78 #80
     assert trackerdict[45]['count'] == 822 #
+
+def test_trackerdict_timeindex():
+    # trackerdict keys carry their metdata row, found without list searches
+    demo = bifacial_radiance.RadianceObj("_test_trackerdict_timeindex")
+    demo.setGround(0.2)
+    metdata = demo.readWeatherFile(MET_FILENAME, starttime='2001-06-20_0500',
+                                   endtime='2001-06-20_2000', coerce_year=2001)
+    assert isinstance(metdata.datetimeindex, pd.DatetimeIndex)
+    assert list(metdata.datetimeindex) == metdata.datetime
+    trackerdict = demo.set1axis(metdata, cumulativesky=False)
+    for key in trackerdict:
+        i = trackerdict[key]['timeindex']
+        assert metdata.datetime[i].strftime('%Y-%m-%d_%H%M') == key
+        assert trackerdict[key]['ghi'] == metdata.ghi[i]
+    # gendaylit1axis reads the stored rows: the key lookup isn't rebuilt
+    metdata._keyrows = None
+    trackerdict = demo.gendaylit1axis(inmemory=True)
+    assert len(trackerdict) == len(demo._skytext) == 15
+    assert metdata._keyrows is None
+    # without 'timeindex', a duplicated key falls back to its first row
+    key = sorted(trackerdict)[3]
+    i = trackerdict[key].pop('timeindex')
+    metdata.datetimeindex = metdata.datetimeindex.insert(
+        0, metdata.datetimeindex[i])
+    assert metdata._trackerRows(trackerdict, [key]) == [0]
+    assert metdata._keyRows()[key] == 0
+
+def test_trackerdict_timeindex_othermetdata():
+    # a trackerdict reused with a shorter MetObj finds its rows by key
+    demo = bifacial_radiance.RadianceObj("_test_timeindex_othermetdata")
+    demo.setGround(0.2)
+    metdata = demo.readWeatherFile(MET_FILENAME, starttime='2001-01-01_0000', 
+                                   endtime='2001-01-02_2300', coerce_year=2001)
+    trackerdict = demo.set1axis(metdata, cumulativesky=False)
+    trackerdict = {key:trackerdict[key] for key in trackerdict 
+                   if key.startswith('2001-01-02')}
+    metdata2 = demo.readWeatherFile(MET_FILENAME, starttime='2001-01-02_0000', 
+                                    endtime='2001-01-02_2300', coerce_year=2001)
+    demo.set1axis(metdata2, cumulativesky=False)
+    skies = demo.gendaylit1axis(metdata=metdata2, trackerdict=trackerdict)
+    assert sorted(skies) == sorted(trackerdict)
+    key = sorted(skies)[4]
+    with open(skies[key]['skyfile']) as f:
+        skytext = f.read()
+    i = metdata2._keyRows()[key]
+    assert trackerdict[key]['timeindex'] != i
+    with open(demo.gendaylit(metdata=metdata2, timeindex=i)) as f:
+        assert f.read() == skytext
+
+
+def test_clusterTrackerdict():
+    # clustered hours are not simulated, but scaled from their representative
+    name = "_test_clusterTrackerdict"
+    demo, metdata, module = _setupDemo(name, '2001-06-17_1100', '2001-06-17_1400')
+    sceneDict = dict(TRACKERSCENEDICT)
+    trackerdict = demo.set1axis(metdata, cumulativesky=False)
+    trackerdict = demo.clusterTrackerdict(thetatol=100, suntol=100, kdtol=1)
+    keys = sorted(trackerdict)
+    reps = sorted(set(trackerdict[key]['cluster'] for key in keys))
+    assert demo.clusterReport['hours'] == 4
+    assert demo.clusterReport['clusters'] == len(reps)
+    assert len(reps) < 4
+    trackerdict = demo.gendaylit1axis()
+    trackerdict = demo.makeScene1axis(trackerdict, module='test-module',
+                                      sceneDict=sceneDict)
+    # one scene file per cluster, shared by its hours
+    assert len(set(trackerdict[key]['radfile'] for key in keys)) == len(reps)
+    for key in keys:
+        rep = trackerdict[key]['cluster']
+        assert trackerdict[key]['scene'] is trackerdict[rep]['scene']
+    trackerdict = demo.makeOct1axis()
+    assert sorted(key for key in keys if 'octfile' in trackerdict[key]) == reps
+    trackerdict = demo.analysis1axis(trackerdict, sensorsy=2)
+    for key in keys:
+        rep = trackerdict[key]['cluster']
+        assert trackerdict[key]['Wm2Front'] == pytest.approx(
+            list(np.array(trackerdict[rep]['Wm2Front'])*trackerdict[key]['clusterscale']))
+    assert list(demo.Wm2Front) == pytest.approx(
+        list(np.sum([trackerdict[key]['Wm2Front'] for key in keys], axis=0)))
+    # a clustered hour alone can't be analyzed without its representative
+    member = [key for key in keys if trackerdict[key]['cluster'] != key][0]
+    del trackerdict[member]['Wm2Front']
+    del trackerdict[trackerdict[member]['cluster']]['Wm2Front']
+    with pytest.warns(Warning, match='which has no results'):
+        demo.analysis1axis(trackerdict, singleindex=member, sensorsy=2)
+    assert 'Wm2Front' not in trackerdict[member]
    
 def test_RadianceObj_fixed_tilt_end_to_end():
     # just run the demo example.  Rear irradiance fraction roughly 11.8% for 0.95m landscape panel
@@ -187,6 +297,204 @@ def test_RadianceObj_1axis_gendaylit_end_to_end():
     demo.exportTrackerDict(savefile = 'results\exportedTrackerDict.csv', reindex=True)
 """
 
+def test_makeScene1axis_sharedGeometry():
+    # gendaylit hours with the same tracker geometry share one scene
+    name = "_test_sharedGeometry"
+    demo, metdata, module = _setupDemo(name, '2001-06-17_0600', '2001-06-17_1900')
+    sceneDict = dict(TRACKERSCENEDICT)
+    trackerdict = demo.set1axis(metdata, cumulativesky=False)
+    trackerdict = demo.gendaylit1axis()
+    trackerdict = demo.makeScene1axis(trackerdict, module='test-module',
+                                      sceneDict=sceneDict.copy())
+    keys = sorted(trackerdict)
+    # default: one scene per timestamp
+    assert len(set(trackerdict[key]['radfile'] for key in keys)) == len(keys)
+    trackerdict = demo.makeScene1axis(trackerdict, module='test-module',
+                                      sceneDict=sceneDict.copy(), dedup=True)
+    limit = [key for key in keys if trackerdict[key]['surf_tilt'] == 45]
+    assert len(limit) > 1
+    assert len(set(trackerdict[key]['radfile'] for key in limit)) == 1
+    assert trackerdict[limit[0]]['scene'] is trackerdict[limit[-1]]['scene']
+    exact = len(set(trackerdict[key]['radfile'] for key in keys))
+    assert exact < len(keys)
+    trackerdict = demo.makeScene1axis(trackerdict, module='test-module',
+                                      sceneDict=sceneDict.copy(), dedup=True,
+                                      angledelta=10)
+    assert len(set(trackerdict[key]['radfile'] for key in keys)) < exact
+    assert trackerdict[keys[5]]['scene'].sceneDict['tilt'] == 20
+
+
+def test_makeScene1axis_batch():
+    # batch scenes match the per-key scenes, built on demand
+    name = "_test_makeScene1axis_batch"
+    demo, metdata, module = _setupDemo(name, '2001-06-20_0500', '2001-06-20_2000')
+    sceneDict = dict(TRACKERSCENEDICT)
+    trackerdict = demo.set1axis(metdata, cumulativesky=False)
+    reference = demo.makeScene1axis(copy.deepcopy(trackerdict),
+                                    module='test-module',
+                                    sceneDict=dict(sceneDict))
+    trackerdict = demo.makeScene1axis(trackerdict, module='test-module',
+                                      sceneDict=dict(sceneDict), batch=True)
+    keys = [key for key in reference if 'scene' in reference[key]]
+    assert keys == [key for key in trackerdict if 'scene' in trackerdict[key]]
+    scene = trackerdict[keys[3]]['scene']
+    assert type(scene).__name__ == '_SceneRecord'
+    for key in keys:
+        assert trackerdict[key]['radfile'] == reference[key]['radfile']
+        assert trackerdict[key]['scene'].sceneDict == pytest.approx(
+            reference[key]['scene'].sceneDict)
+    assert scene.radfiles == reference[keys[3]]['radfile']
+    shared = demo.makeScene1axis(copy.deepcopy(trackerdict),
+                                 module='test-module',
+                                 sceneDict=dict(sceneDict), dedup=True)
+    sharedbatch = demo.makeScene1axis(copy.deepcopy(trackerdict),
+                                      module='test-module',
+                                      sceneDict=dict(sceneDict), dedup=True,
+                                      batch=True)
+    for key in keys:
+        assert sharedbatch[key]['radfile'] == shared[key]['radfile']
+    trackerdict = demo.makeScene1axis(trackerdict, module='test-module',
+                                      sceneDict=dict(sceneDict), batch=True)
+    trackerdict = demo.gendaylit1axis()
+    trackerdict = demo.makeOct1axis(singleindex=keys[3])
+    trackerdict = demo.analysis1axis(singleindex=keys[3], sensorsy=2)
+    assert np.mean(trackerdict[keys[3]]['Wm2Front']) > 100
+
+
+def test_makeOct1axis_scratch():
+    # in-memory skies piped to oconv, octrees made in parallel in a scratch
+    # folder and deleted once analyzed
+    name = "_test_makeOct1axis_scratch"
+    demo, metdata, module = _setupDemo(name, '2001-06-19_1100', '2001-06-19_1300')
+    sceneDict = dict(TRACKERSCENEDICT)
+    trackerdict = demo.set1axis(metdata, cumulativesky=False)
+    trackerdict = demo.gendaylit1axis(inmemory=True)
+    keys = sorted(trackerdict)
+    assert not any(os.path.exists(trackerdict[key]['skyfile']) for key in keys)
+    trackerdict = demo.makeScene1axis(trackerdict, module='test-module',
+                                      sceneDict=sceneDict)
+    trackerdict = demo.makeOct1axis(workers=2, scratchdir='scratch')
+    octfiles = [trackerdict[key]['octfile'] for key in keys]
+    assert all(octfile.startswith('scratch') and os.path.isfile(octfile)
+               for octfile in octfiles)
+    trackerdict = demo.analysis1axis(trackerdict, sensorsy=2)
+    assert not any(os.path.exists(octfile) for octfile in octfiles)
+    assert len(demo.Wm2Front) == 2
+    assert np.mean(trackerdict[keys[1]]['Wm2Front']) > 500
+
+
+def test_makeOct_frozen():
+    # hourly octrees derived from one frozen base per geometry
+    name = "_test_makeOct_frozen"
+    demo, metdata, module = _setupDemo(name, '2001-06-17_1100',
+                                       '2001-06-17_1300')
+    scene = demo.makeScene(module, dict(SCENEDICT))
+    demo.gendaylit(1)
+    octfile = demo.makeOct(demo.getfilelist(), name+'_full')
+    octfrozen = demo.makeOct(demo.getfilelist(), frozen=True)
+    octbase = demo.octbase
+    analysis = bifacial_radiance.AnalysisObj(octfile, name)
+    frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=3)
+    full = analysis.analyzeScans(octfile, [frontscan, backscan])
+    frozen = analysis.analyzeScans(octfrozen, [frontscan, backscan])
+    assert np.mean(frozen[0]['Wm2']) == pytest.approx(np.mean(full[0]['Wm2']), rel=0.02)
+    assert np.mean(frozen[1]['Wm2']) == pytest.approx(np.mean(full[1]['Wm2']), rel=0.1)
+    demo.gendaylit(2)
+    demo.makeOct(demo.getfilelist(), frozen=True)
+    assert demo.octbase == octbase
+    # tracker: trackerdict records the base of each index
+    trackerdict = demo.set1axis(metdata, cumulativesky=False)
+    trackerdict = demo.gendaylit1axis()
+    trackerdict = demo.makeScene1axis(trackerdict, module='test-module',
+                                      sceneDict=dict(TRACKERSCENEDICT))
+    trackerdict = demo.makeOct1axis(frozen=True)
+    for key in trackerdict:
+        assert os.path.isfile(trackerdict[key]['octbase'])
+        assert trackerdict[key]['octfile'] == '1axis_%s.oct' % (key)
+
+
+def test_analysis1axis_workers():
+    # parallel analysis1axis merges results in key order and collects failures
+    name = "_test_analysis1axis_workers"
+    demo, metdata, module = _setupDemo(name, '2001-06-17_1100', '2001-06-17_1400')
+    sceneDict = dict(TRACKERSCENEDICT)
+    trackerdict = demo.set1axis(metdata, cumulativesky=False)
+    trackerdict = demo.gendaylit1axis()
+    trackerdict = demo.makeScene1axis(trackerdict, module='test-module',
+                                      sceneDict=sceneDict)
+    trackerdict = demo.makeOct1axis()
+    keys = sorted(trackerdict)
+    trackerdict[keys[1]]['octfile'] = 'notanoctfile.oct'
+    trackerdict = demo.analysis1axis(trackerdict, sensorsy=2, workers=2)
+    assert list(demo.analysisFailures) == [keys[1]]
+    okkeys = [key for key in keys if key != keys[1]]
+    frontsum = 0
+    for key in okkeys:
+        assert trackerdict[key]['AnalysisObj'].name == '1axis_%s' % (key)
+        frontsum = frontsum + np.array(trackerdict[key]['Wm2Front'])
+    assert list(demo.Wm2Front) == list(frontsum)
+
+
+def test_run1axis():
+    # each key streamed through sky, scene, octree and rtrace
+    name = "_test_run1axis"
+    demo, metdata, module = _setupDemo(name, '2001-06-20_1100', '2001-06-20_1300')
+    sceneDict = dict(TRACKERSCENEDICT)
+    trackerdict = demo.set1axis(metdata, cumulativesky=False)
+    results = dict(demo.run1axis(sceneDict=sceneDict, sensorsy=2, workers=2,
+                                 queue=2))
+    assert sorted(results) == sorted(trackerdict)
+    assert all(len(results[key]['Wm2Front']) == 2 for key in results)
+    assert not any(os.path.exists(trackerdict[key]['radfile'])
+                   for key in results)
+    assert len(demo._skytext) == 0
+    df = pd.read_csv(os.path.join('results', 'run1axis_.csv'), index_col=0)
+    assert sorted(df.index) == sorted(trackerdict)
+    assert list(demo.Wm2Front) == pytest.approx(list(np.sum(
+        [results[key]['Wm2Front'] for key in results], axis=0)))
+    # run1axis leaves self.trackerdict whole, and each key matches the
+    # gendaylit1axis / makeScene1axis / makeOct1axis / analysis1axis steps
+    assert demo.trackerdict is trackerdict
+    for key in results:
+        assert results[key]['scene'].sceneDict['tilt'] == \
+            trackerdict[key]['surf_tilt']
+    key = sorted(results)[1]
+    reference = demo.set1axis(metdata, cumulativesky=False)
+    demo.gendaylit1axis()
+    demo.makeScene1axis(reference, module='test-module', sceneDict=sceneDict)
+    demo.makeOct1axis(singleindex=key)
+    reference = demo.analysis1axis(singleindex=key, sensorsy=2)
+    assert results[key]['Wm2Front'] == pytest.approx(
+        reference[key]['Wm2Front'], rel=1e-3)
+    assert results[key]['Wm2Back'] == pytest.approx(
+        reference[key]['Wm2Back'], rel=0.01)
+
+
+def test_analysisDaylightMtx():
+    # daylight coefficient results should be close to gendaylit + rtrace
+    name = "_test_analysisDaylightMtx"
+    demo, metdata, module = _setupDemo(name, '2001-06-17_1100',
+                                       '2001-06-17_1400')
+    scene = demo.makeScene(module, dict(SCENEDICT))
+    daylightmtx = demo.genDaylightMtx(mf=1)
+    assert daylightmtx['sky'].shape == (146, 4, 3)
+    results = demo.analysisDaylightMtx(scene=scene, sensorsy=3)
+    assert list(results.index) == ['2001-06-17_1100', '2001-06-17_1200',
+                                   '2001-06-17_1300', '2001-06-17_1400']
+    assert len(results['Wm2Front'].iloc[0]) == 3
+    assert list(demo.Wm2Front) == pytest.approx(list(np.sum(list(results['Wm2Front']), axis=0)))
+    # one solar disc per timestamp with the sun up
+    sunup = (daylightmtx['sunalt'] > 0) & (daylightmtx['dni'] > 0)
+    with open(os.path.join('skies', 'dcsuns_DaylightMtx_fixed.mod')) as f:
+        assert len(f.read().split()) == sunup.sum()
+    demo.gendaylit(metdata.datetime.index(pd.to_datetime('2001-06-17 13:00:00 -7')))
+    octfile = demo.makeOct(demo.getfilelist())
+    analysis = bifacial_radiance.AnalysisObj(octfile, name)
+    frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=3)
+    analysis.analysis(octfile, name, frontscan, backscan)
+    assert np.mean(results['Wm2Front'].iloc[2]) == pytest.approx(np.mean(analysis.Wm2Front), rel=0.05)
+    assert np.mean(results['Wm2Back'].iloc[2]) == pytest.approx(np.mean(analysis.Wm2Back), rel=0.15)
+
 def test_1axis_gencumSky():
     name = "test_1axis_gencumSky"
     # Takes 20 seconds for 2-sensor scan
@@ -240,6 +548,24 @@ def test_1axis_gencumSky():
     trackerdict = demo.analysis1axis(trackerdict=trackerdict, modWanted=7, rowWanted=3, sensorsy=2, modscanfront=modscanfront ) 
     assert trackerdict[-5.0]['AnalysisObj'].x[0] == -5
 
+def test_makeTrackerCSV():
+    # each hour's irradiance lands in the file of its tracker angle only
+    demo = bifacial_radiance.RadianceObj("_test_makeTrackerCSV")
+    metdata = demo.readWeatherFile(MET_FILENAME, starttime='2001-06-20_0500',
+                                   endtime='2001-06-21_2000', coerce_year=2001)
+    trackerdict = demo.set1axis(metdata, cumulativesky=True, angledelta=10)
+    total = 0
+    for theta in trackerdict:
+        data = pd.read_csv(trackerdict[theta]['csvfile'], sep=' ',
+                           header=None, names=['GHI', 'DHI'])
+        assert len(data) == 8760
+        assert (data.GHI > 0).sum() == trackerdict[theta]['count']
+        total += data.GHI.sum()
+    tracked = ~np.isnan(metdata.tracker_theta)
+    assert sum(trackerdict[theta]['count'] for theta in trackerdict) == \
+        tracked.sum()
+    assert total == pytest.approx(metdata.ghi[tracked].sum())
+
 
 
 
@@ -314,6 +640,74 @@ def test_SceneObj_makeSceneNxR_hightilt():
                             'sx_xinc': 0.0, 'sx_yinc':0.0, 'sx_zinc':0.0})
     #assert scene.text == '!xform -rz -90 -t -0.795 0.475 0 -rx 65 -t 0 0 0.2 -a 20 -t 1.6 0 0 -a 7 -t 0 1.5 0 -i 1 -t -15.9 -4.5 0 -rz 91 objects\\simple_panel.rad'
     assert scene.text[0:118] == '!xform -rx 65 -t 0 0 0.6304961988424087 -a 20 -t 1.6 0 0 -a 7 -t 0 1.5 0 -i 1 -t -14.4 -4.5 0 -rz 91 -t 0 0 0 "objects'
+
+def test_expandmodule():
+    # scenes can reference the module pre-expanded to static primitives
+    name = "_test_expandmodule"
+    demo, metdata, module = _setupDemo(name)
+    demo.gendaylit(4020)
+    module.addTorquetube(tubetype='round')
+    scene = demo.makeScene(module, dict(SCENEDICT), expandmodule=True)
+    expandedfile = module._expandModule()
+    assert expandedfile != module.modulefile
+    assert expandedfile in scene.text
+    with open(expandedfile) as f:
+        assert '!' not in f.read()
+    octfile = demo.makeOct(demo.getfilelist())
+    analysis = bifacial_radiance.AnalysisObj(octfile, name)
+    frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=1)
+    front, back = analysis.analyzeScans(octfile, [frontscan, backscan])
+    assert front['mattype'][0] == 'a1.1.a0.test-module.6457'
+    assert back['Wm2'][0] > 0
+
+
+def test_instanceScene():
+    # module octree placed with instances matches the xform -a array
+    name = "_test_instanceScene"
+    demo, metdata, module = _setupDemo(name)
+    demo.gendaylit(4020)
+    sceneDict = {'tilt':20, 'pitch':5, 'clearance_height':1, 'azimuth':150,
+                 'nMods':4, 'nRows':3}
+    scene = demo.makeScene(module, dict(sceneDict), radname='array')
+    octfile = demo.makeOct(demo.getfilelist(), name+'_array')
+    scene2 = demo.makeScene(module, dict(sceneDict), radname='instance',
+                            instance=True)
+    assert scene2.text.count('void instance') == 12
+    octfile2 = demo.makeOct(demo.getfilelist(), name+'_instance')
+    analysis = bifacial_radiance.AnalysisObj(octfile, name)
+    frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=2,
+                                                  modWanted=4, rowWanted=1)
+    array = analysis.analyzeScans(octfile, [frontscan, backscan])
+    instance = analysis.analyzeScans(octfile2, [frontscan, backscan])
+    assert array[0]['mattype'][0] == 'a3.0.a0.test-module.6457'
+    assert instance[0]['mattype'][0] == 'a0.test-module.6457'
+    assert np.mean(instance[0]['Wm2']) == pytest.approx(np.mean(array[0]['Wm2']), rel=0.02)
+    assert np.mean(instance[1]['Wm2']) == pytest.approx(np.mean(array[1]['Wm2']), rel=0.1)
+
+
+def test_cullScene():
+    # far modules dropped or replaced by row proxies in the analysis scene
+    name = "_test_cullScene"
+    sceneDict = {'tilt':20, 'pitch':5, 'clearance_height':1, 'azimuth':180,
+                 'nMods':10, 'nRows':5}
+    demo, scene, octfile = _setupScene(name, sceneDict)
+    radfile = scene.cullScene(radius=6, proxy=False)
+    # center row whole, 7 modules of the next rows, outer rows culled
+    assert scene.cullReport['modules'] == 10 + 2*7
+    assert scene.cullReport['culled'] == 50 - 24
+    assert 0 < scene.cullReport['viewfactor'] < 0.2
+    radfile_proxy = scene.cullScene(radius=6)
+    with open(radfile_proxy) as f:
+        assert f.read().count('genbox') == 2*2 + 2
+    results = []
+    for filelist in ([scene.radfiles], [radfile], [radfile_proxy]):
+        octfile = demo.makeOct(demo.getfilelist()[:-1] + filelist)
+        analysis = bifacial_radiance.AnalysisObj(octfile, demo.name)
+        frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=1)
+        analysis.analysis(octfile, demo.name, frontscan, backscan)
+        results.append(analysis.Wm2Front[0])
+    assert results[1] == pytest.approx(results[0], rel=0.05)
+    assert results[2] == pytest.approx(results[0], rel=0.05)
     
 
  
@@ -325,6 +719,165 @@ def test_AnalysisObj_linePtsMake3D():
     #assert linepts == '0 0 0 0 1 0 \r0 1 0 0 1 0 \r0 0 1 0 1 0 \r0 1 1 0 1 0 \r0 0 2 0 1 0 \r0 1 2 0 1 0 \r'
     assert str(analysis)[-5:-1]=='None' # this depends on the order of the dict. but generally aligns with 'octfile' in alphabetical order..
 
+def test_analyzeScans():
+    # several scans traced in one rtrace call are split back per scan
+    name = "_test_analyzeScans"
+    demo, scene, octfile = _setupScene(name)
+    analysis = bifacial_radiance.AnalysisObj(octfile, name)
+    frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=[4, 2], sensorsx=[1, 2])
+    groundscan = backscan.copy()
+    groundscan.update({'zstart': 0.05, 'zinc': 0, 'orient': '0 0 -1'})
+    results = analysis.analyzeScans(octfile, [frontscan, backscan, groundscan],
+                                    titles=['front', 'back', 'ground'])
+    assert [r['title'] for r in results] == ['front', 'back', 'ground']
+    assert [len(r['Wm2']) for r in results] == [4, 4, 4]
+    assert results[0]['mattype'][0][:12] == 'a1.1.a0.test'
+    assert results[2]['mattype'][0] == 'groundplane'
+    assert results[2]['z'] == [0.05]*4
+    assert results[1]['x'] == pytest.approx(analysis._linePtsArray(backscan)[0])
+
+
+def test_persistentRtrace():
+    # persistent rtrace worker should be reused for front and back scans and
+    # give the same answer as one rtrace call per scan.
+    name = "_test_persistentRtrace"
+    demo, scene, octfile = _setupScene(name)
+    analysis = bifacial_radiance.AnalysisObj(octfile, name)
+    frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=3)
+    analysis.analysis(octfile, name, frontscan, backscan)
+    with bifacial_radiance.AnalysisObj(octfile, name, persistent=True) as analysis2:
+        analysis2.analysis(octfile, name, frontscan, backscan)
+        assert len(bifacial_radiance.main._RTRACE_WORKERS) == 1
+        worker = list(bifacial_radiance.main._RTRACE_WORKERS.values())[0]
+        analysis2.analysis(octfile, name, frontscan, backscan)
+        assert list(bifacial_radiance.main._RTRACE_WORKERS.values())[0] is worker
+    assert len(bifacial_radiance.main._RTRACE_WORKERS) == 0
+    assert analysis2.mattype == analysis.mattype
+    assert analysis2.x == analysis.x
+    assert np.mean(analysis2.Wm2Front) == pytest.approx(np.mean(analysis.Wm2Front), rel=0.02)
+    assert np.mean(analysis2.Wm2Back) == pytest.approx(np.mean(analysis.Wm2Back), rel=0.1)
+
+
+def test_binaryRtrace():
+    # binary rtrace I/O should match the text output, as numpy arrays
+    name = "_test_binaryRtrace"
+    demo, scene, octfile = _setupScene(name)
+    analysis = bifacial_radiance.AnalysisObj(octfile, name)
+    frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=3, sensorsx=[1, 2])
+    pts = analysis._linePtsMakeArray(backscan)
+    assert pts.shape == (6, 6)
+    assert pts.ravel() == pytest.approx(np.array(
+        analysis._linePtsMakeDict(backscan).split(), dtype=float))
+    analysis.analysis(octfile, name, frontscan, backscan)
+    for binary in [True, 'float32']:
+        analysis2 = bifacial_radiance.AnalysisObj(octfile, name, binary=binary)
+        front, back = analysis2.analysis(octfile, name, frontscan, backscan)
+        assert type(front['Wm2']) == np.ndarray
+        assert list(front['mattype']) == analysis.mattype
+        assert analysis2.rearMat == analysis.rearMat
+        assert analysis2.x == pytest.approx(analysis.x, abs=1e-5)
+        assert np.mean(analysis2.Wm2Front) == pytest.approx(np.mean(analysis.Wm2Front), rel=0.02)
+        assert np.mean(analysis2.Wm2Back) == pytest.approx(np.mean(analysis.Wm2Back), rel=0.1)
+    with pytest.raises(ValueError):
+        bifacial_radiance.AnalysisObj(octfile, name, binary='int')
+
+
+def test_ambientCache():
+    # ambient file is reused by later scans and replaced when the octree changes
+    name = "_test_ambientCache"
+    demo, scene, octfile = _setupScene(name)
+    bifacial_radiance.main.ambientCacheStats(reset=True)
+    analysis = bifacial_radiance.AnalysisObj(octfile, name, ambientcache=True)
+    frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=3)
+    analysis.analysis(octfile, name, frontscan, backscan)
+    frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=3, modWanted=1)
+    analysis.analysis(octfile, name, frontscan, backscan)
+    stats = bifacial_radiance.main.ambientCacheStats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    ambfiles = os.listdir('ambient')
+    assert len(ambfiles) == 1 and ambfiles[0].startswith(name)
+    # the octree hash is kept until the octree or its scene files change
+    octhash = bifacial_radiance.main._OCTHASHES[os.path.abspath(octfile)][2]
+    assert ambfiles[0].startswith('%s_%s' % (name, octhash[:12]))
+    demo.gendaylit2manual(dni=500, dhi=150, sunalt=40, sunaz=30)
+    octfile = demo.makeOct(demo.getfilelist())
+    analysis.analysis(octfile, name, frontscan, backscan)
+    assert len(os.listdir('ambient')) == 1
+    assert os.listdir('ambient') != ambfiles
+    stats = bifacial_radiance.main.ambientCacheStats(reset=True)
+    assert stats['hitrate'] == pytest.approx(1/3)
+
+
+def test_adaptiveAccuracy():
+    # adaptive accuracy escalates sensors until they converge
+    name = "_test_adaptiveAccuracy"
+    demo, scene, octfile = _setupScene(name)
+    for binary in [False, True]:
+        analysis = bifacial_radiance.AnalysisObj(octfile, name, binary=binary,
+                                                 tolerance=0.05)
+        frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=4)
+        front, back = analysis.analyzeScans(octfile, [frontscan, backscan],
+                                            accuracy='adaptive')
+        assert len(front['accuracy']) == 4
+        assert front['accuracy'][0] == bifacial_radiance.main._ADAPTIVE_ACCURACY[1]
+        assert sum(analysis.adaptiveLevels.values()) == 8
+    low = analysis.analyzeScans(octfile, [backscan], accuracy='low')[0]
+    assert np.mean(back['Wm2']) == pytest.approx(np.mean(low['Wm2']), rel=0.1)
+
+
+def test_artifactCache():
+    # re-running the same octree and scans reads them from the cache
+    from bifacial_radiance.main import artifactCacheStats, pruneArtifactCache
+    name = "_test_artifactCache"
+    demo, metdata, module = _setupDemo(name, artifactcache=True)
+    scene = demo.makeScene(module, dict(SCENEDICT))
+    demo.gendaylit2manual(800, 100, 50, 0)
+    pruneArtifactCache(maxsize=0)  # drop the weather file entry
+    artifactCacheStats(reset=True)
+    results = []
+    for i in range(2):
+        octfile = demo.makeOct(octname=name)
+        analysis = bifacial_radiance.AnalysisObj(octfile, name,
+                                                 artifactcache=True)
+        frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=3)
+        results.append(analysis.analyzeScans(octfile, [frontscan, backscan]))
+    stats = artifactCacheStats()
+    assert (stats['hits'], stats['misses']) == (2, 2)
+    assert stats['files'] == 2
+    assert results[1][0]['Wm2'] == results[0][0]['Wm2']
+    assert results[1][1]['title'] == results[0][1]['title']
+    # scans are keyed by the memoized octree hash
+    assert os.path.abspath(octfile) in bifacial_radiance.main._OCTHASHES
+    assert pruneArtifactCache(maxsize=0) == 2
+    assert artifactCacheStats()['size'] == 0
+
+
+def test_moduleAnalysisArray():
+    # sensors of many tracker angles at once match moduleAnalysis per angle
+    name = "_test_moduleAnalysisArray"
+    sceneDict = {'tilt':10, 'gcr':0.35, 'hub_height':1.5, 'azimuth':90,
+                 'nMods':5, 'nRows':3}
+    demo, scene, octfile = _setupScene(name, sceneDict)
+    analysis = bifacial_radiance.AnalysisObj()
+    tilts = [-50, -10, 0, 35]
+    frontpts, backpts = analysis.moduleAnalysisArray(scene, tilt=tilts,
+                                                     sensorsy=[4, 3],
+                                                     sensorsx=[1, 2])
+    assert frontpts.shape == (4, 4, 6)
+    assert backpts.shape == (4, 6, 6)
+    for k, tilt in enumerate(tilts):
+        scene.sceneDict['tilt'] = tilt
+        frontscan, backscan = analysis.moduleAnalysis(scene, sensorsy=[4, 3],
+                                                      sensorsx=[1, 2])
+        assert frontpts[k] == pytest.approx(
+            analysis._linePtsMakeArray(frontscan), abs=1e-9)
+        assert backpts[k] == pytest.approx(
+            analysis._linePtsMakeArray(backscan), abs=1e-9)
+    # arrays trace like the scan dictionaries
+    results = analysis.analyzeScans(octfile, [frontpts[-1], frontscan])
+    assert list(results[0]['Wm2']) == pytest.approx(list(results[1]['Wm2']),
+                                                    rel=1e-3)
+
 
 def test_gendaylit2manual():
     name = "_test_gendaylit2manual"
@@ -427,6 +980,53 @@ def test_analyzeRow():
     # Assert Y is different for two different modules
     assert rowscan[rowscan.keys()[1]][0][0]+2 == rowscan[rowscan.keys()[1]][1][0]
     assert (analysis.__printval__('x')[1] == 0) & (analysis.x[1] != 0)
+    # one results file per module by default
+    for i in range(nMods):
+        assert os.path.isfile(os.path.join('results', 
+                                           'irr_%s_Module_%s.csv' % (name, i)))
+    assert not os.path.isfile(os.path.join('results', 'irr_%s_Row1.csv' % name))
+    # tidy output, same values in one line per module, side and sensor
+    rowtidy = analysis.analyzeRow(octfile = octfile, scene = scene, name = name, 
+                                  rowWanted = 1, sensorsy = [3,3], tidy=True,
+                                  rowfile=True)
+    assert len(rowtidy) == 12
+    assert list(rowtidy.columns[:3]) == ['module', 'side', 'sensor']
+    front2 = rowtidy[(rowtidy.module == 2) & (rowtidy.side == 'Front')]
+    assert list(front2.y) == rowscan['y'][1]
+    assert os.path.isfile(os.path.join('results', 'irr_%s_Row1.csv' % name))
+
+def test_fieldAnalysis():
+    # every module of the field in one cube, at the moduleAnalysis positions
+    name = "_test_fieldAnalysis"
+    demo, metdata, module = _setupDemo(name, '2001-06-17_1100',
+                                       '2001-06-17_1300')
+    sceneDict = {'tilt':20, 'pitch':5, 'clearance_height':1, 'azimuth':150,
+                 'nMods':4, 'nRows':3}
+    scene = demo.makeScene('test-module', sceneDict)
+    demo.gendaylit(0)
+    octfile = demo.makeOct(demo.getfilelist())
+    analysis = bifacial_radiance.AnalysisObj(octfile, name)
+    field = analysis.fieldAnalysis(octfile, scene, sensorsy=[3,2])
+    assert field['Wm2'].shape == (3, 4, 2, 3)
+    assert np.isnan(field['Wm2'][0, 0, 1, 2])
+    frontscan, backscan = analysis.moduleAnalysis(scene, modWanted=3,
+                                                  rowWanted=2, sensorsy=[3,2])
+    x, y, z = analysis._linePtsArray(frontscan)
+    assert list(field['y'][1, 2, 0]) == pytest.approx(y, abs=1e-4)
+    assert list(field['z'][1, 2, 0]) == pytest.approx(z, abs=1e-4)
+    # through analysis1axis: (index, row, module, side, sensor)
+    sceneDict = dict(TRACKERSCENEDICT, nRows=2)
+    trackerdict = demo.set1axis(metdata, cumulativesky=False)
+    trackerdict = demo.gendaylit1axis()
+    trackerdict = demo.makeScene1axis(trackerdict, module='test-module',
+                                      sceneDict=sceneDict)
+    trackerdict = demo.makeOct1axis()
+    trackerdict = demo.analysis1axis(trackerdict, sensorsy=2, fieldscan=True,
+                                     rowWanted=[2])
+    assert demo.fieldWm2.shape == (3, 1, 3, 2, 2)
+    assert demo.fieldCoords['index'] == sorted(trackerdict)
+    assert list(demo.Wm2Front) == pytest.approx(
+        list(demo.fieldWm2[:, :, :, 0].mean(axis=(1, 2)).sum(axis=0)))
 
     
 def test_addMaterialGroundRad():  
@@ -578,6 +1178,78 @@ def test_readWeatherFile_subhourly():
     leapday = (metdata2.tmydata.index.month == 2) & (metdata2.tmydata.index.day == 29)
     assert leapday.sum() == 0
 
+def test_readWeatherFile_cache():
+    # a second read of the same file and options loads the cached MetObj
+    from bifacial_radiance.main import artifactCacheStats, pruneArtifactCache
+    demo = bifacial_radiance.RadianceObj("_test_readWeatherFile_cache")
+    cache = 'weathercache'
+    pruneArtifactCache(cache, maxsize=0)
+    artifactCacheStats(reset=True)
+    metdata = demo.readWeatherFile(MET_FILENAME3, label='center', cache=cache)
+    metfiles = demo.gencumsky_metfile
+    with open(metfiles[0], 'rb') as f:
+        metfile = f.read()
+    os.remove(metfiles[0])
+    metdata2 = demo.readWeatherFile(MET_FILENAME3, label='center', cache=cache)
+    stats = artifactCacheStats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert demo.gencumsky_metfile == metfiles
+    with open(metfiles[0], 'rb') as f:
+        assert f.read() == metfile
+    assert metdata2.datetime == metdata.datetime
+    assert metdata2.timezone == metdata.timezone
+    assert (metdata2.ghi == metdata.ghi).all()
+    pd.testing.assert_frame_equal(metdata2.solpos, metdata.solpos)
+    pd.testing.assert_frame_equal(metdata2.sunrisesetdata,
+                                  metdata.sunrisesetdata)
+    # other options are another cache entry
+    metdata3 = demo.readWeatherFile(MET_FILENAME3, label='center', cache=cache,
+                                    starttime='2020-06-01_0000',
+                                    endtime='2020-06-30_2300')
+    assert artifactCacheStats()['misses'] == 2
+    assert len(metdata3.datetime) < len(metdata.datetime)
+
+
+def test_sunRiseSetTransit():
+    # once per day and broadcast is the same as pvlib on every timestamp
+    import pvlib
+    from bifacial_radiance.main import _sunRiseSetTransit
+    times = pd.date_range('2021-06-19 05:00', '2021-06-22 20:00', freq='15min',
+                          tz='Etc/GMT+7')
+    sunup = _sunRiseSetTransit(times, 39.742, -105.179)
+    expected = pvlib.solarposition.sun_rise_set_transit_spa(times, 39.742,
+                                                            -105.179)
+    pd.testing.assert_frame_equal(sunup, expected)
+
+
+def test_solposmethod():
+    # solar positions are reused per site, other methods agree with SPA
+    from bifacial_radiance.main import solposCacheStats
+    demo = bifacial_radiance.RadianceObj("_test_solposmethod")
+    solposCacheStats(reset=True, clear=True)
+    metdata = demo.readWeatherFile(MET_FILENAME, coerce_year=2001)
+    assert solposCacheStats()['hits'] == 0
+    metdata2 = demo.readWeatherFile(MET_FILENAME, coerce_year=2001,
+                                    starttime='2001-06-01_0000',
+                                    endtime='2001-06-30_2300')
+    stats = solposCacheStats()
+    assert stats['hits'] == len(metdata2.datetime)
+    assert stats['rows'] == len(metdata.datetime)
+    pd.testing.assert_frame_equal(metdata2.solpos,
+                                  metdata.solpos.loc[metdata2.solpos.index])
+    metdata3 = demo.readWeatherFile(MET_FILENAME, coerce_year=2001,
+                                    solposmethod='ephemeris')
+    assert solposCacheStats()['sites'] == 2
+    up = metdata.solpos.elevation > 0
+    for col in ['zenith', 'elevation']:
+        diff = metdata3.solpos[col] - metdata.solpos[col]
+        assert np.abs(diff[up]).max() < 0.02
+    diff = (metdata3.solpos.azimuth - metdata.solpos.azimuth) * \
+        np.sin(np.radians(metdata.solpos.zenith))
+    assert np.abs(diff[up]).max() < 0.02
+    with pytest.raises(ValueError):
+        demo.readWeatherFile(MET_FILENAME, solposmethod='spa')
+
     
 def test_customTrackerAngles():
     # TODO: I think with the end test on this function the 
@@ -618,6 +1290,3 @@ def test_GH256_nomodule_error():
     with pytest.raises(Exception):
         foodict = demo.makeScene1axis(trackerdict=foodict, module=moduletype, 
                                       sceneDict=sceneDict, cumulativesky=False)
-    
-
-    
\ No newline at end of file